@@ -1,5 +1,7 @@
-from .expression import Variable, Expression
+from .expression import Variable, Expression, grad, value_and_grad, jacobian
 
 from .dual import Dual
+from .dtype import get_dtype, set_dtype, precision
 
-__all__ = ['Expression', 'Variable', 'Dual']
+__all__ = ['Expression', 'Variable', 'Dual', 'grad', 'value_and_grad', 'jacobian', 'get_dtype', 'set_dtype',
+           'precision']
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : dtype.py
+# Description: floating point precision policy
+# Copyright 2022 Harvard University. All Rights Reserved.
+from contextlib import contextmanager
+
+import numpy as np
+
+"""
+This module holds the dtype policy of the computations. By default the dtype is the one NumPy infers from the
+inputs, typically float64. With a policy, e.g. set_dtype(np.float32), the numeric inputs and seeds of the variables,
+the values and Dual numbers of the functions, and the adjoints of the reverse mode are all converted to that dtype.
+Arrays which already have the dtype are used as they are, without any copy.
+"""
+
+_policy = {'dtype': None}
+
+
+def get_dtype():
+    """Get the dtype of the current policy
+
+    :return: np.dtype, or None when the dtype is inferred by NumPy
+    """
+    return _policy['dtype']
+
+
+def set_dtype(dtype):
+    """Set the global dtype policy
+
+    :param dtype: floating point dtype, e.g. np.float32 or 'float32', or None to let NumPy infer it
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError(f"The dtype policy should be a floating point dtype, found {dtype}.")
+    _policy['dtype'] = dtype
+
+
+@contextmanager
+def precision(dtype):
+    """Context manager applying a dtype policy to the computations inside the block, e.g.
+
+        with precision(np.float32):
+            y, grad = f(inputs)
+
+    :param dtype: floating point dtype, or None to keep the current policy
+    """
+    previous = get_dtype()
+    if dtype is not None:
+        set_dtype(dtype)
+    try:
+        yield
+    finally:
+        _policy['dtype'] = previous
+
+
+def cast(x, dtype=None):
+    """Convert a value to the dtype of the policy. Values which already have the dtype, and values which are not
+    numbers, arrays or Dual numbers, are returned as they are.
+
+    :param x: int, float, NumPy scalar, list, np.array or Dual number
+    :param dtype: dtype to convert to, the one of the current policy by default
+    :return: value of the dtype
+    """
+    if dtype is None:
+        dtype = _policy['dtype']
+        if dtype is None:
+            return x
+    if isinstance(x, np.ndarray):
+        return x if x.dtype == dtype or x.dtype.kind not in 'iuf' else x.astype(dtype)
+    if isinstance(x, (int, float, np.integer, np.floating)) and not isinstance(x, bool):
+        return x if type(x) is dtype.type else dtype.type(x)
+    if isinstance(x, list):
+        return np.asarray(x, dtype=dtype)
+    if hasattr(x, 'astype'):
+        return x.astype(dtype)
+    return x
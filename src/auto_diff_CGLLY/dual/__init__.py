@@ -1,3 +1,4 @@
 from .dual import Dual, DualVector
+from .sparse import SparseDual, SparseSeed
 
-__all__ = ['Dual', 'DualVector']
+__all__ = ['Dual', 'DualVector', 'SparseDual', 'SparseSeed']
@@ -4,45 +4,126 @@
 # Description: Dual number
 # Copyright 2022 Harvard University. All Rights Reserved.
 
+import functools
 
 import numpy as np
 
+from ..dtype import cast
+
 """This module implements dual numbers and provides mathematical operations on dual numbers
 Dual number is the underlying data structure for forward mode AutoDiff
 """
 
-def vec_dec(op):
-    """Dual vector decorator
+# scalar types handled by the fast paths of the Dual number operators
+_SCALARS = frozenset((int, float, np.float64, np.float32, np.int64, np.int32))
+
+
+def _is_const(x):
+    """Check whether the input is a constant supported by Dual number operations
 
-    :param op: The function to decorate
-    :return: Decorated function
+    :param x: any input
+    :return: Boolean
     """
-    def func(d1, d2=None):
-        if isinstance(d1, DualVector):
-            if d2 is not None and type(d2) in [int, float, Dual]:
-                res_list = [op(x, d2) for x in d1.dual_vec]
-            elif d2 is not None:
-                assert len(d1) == len(d2), f'operands length mismatch, found {len(d1)} and {len(d2)}.'
-                res_list = [op(x1, x2) for x1, x2 in zip(d1, d2)]
-            else:
-                res_list = [op(x) for x in d1.dual_vec]
-            res = DualVector(vec=res_list)
-        else:
-            res = op(d1, d2) if d2 is not None else op(d1)
-
-        return res
+    return type(x) in _SCALARS or isinstance(x, (np.number, np.ndarray))
 
-    return func
+
+# differentiation rules on the real and dual parts of both operands, used on whole arrays
+def _add(a, da, b, db):
+    return a + b, da + db
+
+
+def _sub(a, da, b, db):
+    return a - b, da - db
+
+
+def _mul(a, da, b, db):
+    return a * b, a * db + da * b
+
+
+def _div(a, da, b, db):
+    return a / b, (da * b - a * db) / b ** 2
+
+
+def _pow(a, da, c, dc):
+    real = a ** c
+    dual = c * a ** (c - 1) * da
+    if np.any(dc):
+        dual = dual + real * np.log(a) * dc
+    return real, dual
+
+
+def _as_operand(x):
+    """Convert a sequence or an object array operand to an array, or to a DualVector when it holds Dual numbers
+
+    :param x: any input
+    :return: the input, np.array or DualVector
+    """
+    if isinstance(x, (list, tuple)) or (isinstance(x, np.ndarray) and x.dtype == object):
+        items = np.asarray(x, dtype=object)
+        if not any(isinstance(v, Dual) for v in items.flat):
+            return np.asarray(x, dtype=float)
+        real, dual = zip(*map(_parts, items.flat))
+        return DualVector(np.reshape(real, items.shape), np.reshape(dual, items.shape))
+    return x
+
+
+def _vector(rule, x, y, name):
+    """Apply the differentiation rule of a binary operation on whole arrays, when one of
+    the operands is a DualVector or a np.array
+
+    :param rule: function of the real and dual parts of both operands
+    :param x: left operand
+    :param y: right operand
+    :param name: operation name used in the error message
+    :return: Dual number or DualVector
+    :raises TypeError
+    """
+    x, y = _as_operand(x), _as_operand(y)
+    for v in (x, y):
+        if not (isinstance(v, Dual) or _is_const(v)):
+            raise TypeError("{} operation not supported for type {} and {}".format(name, type(x), type(y)))
+    (a, da), (b, db) = _parts(x), _parts(y)
+    return _pack(*rule(a, da, b, db))
+
+
+class _elementary:
+    """Elementary function of Dual numbers, called as Dual.sin(x) or as the method x.sin(), which is how the
+    NumPy ufuncs evaluate object arrays of Dual numbers
+    """
+    def __init__(self, f):
+        functools.update_wrapper(self, f)
+        self.f = f
+
+    def __get__(self, obj, objtype=None):
+        return self.f if obj is None else functools.partial(self.f, obj)
+
+
+def _like(x, real, dual):
+    """Build the result of an elementwise function of x, Dual number for a Dual number input
+    and DualVector for a DualVector input
+
+    :param x: Dual number or DualVector
+    :param real: real part of the result
+    :param dual: dual part of the result
+    :return: Dual number or DualVector
+    """
+    if type(x) is Dual:
+        return Dual(real, dual)
+    return DualVector(*np.broadcast_arrays(real, dual))
 
 
 class Dual:
     """Dual number object
+
+    The operators have fast paths for Python and NumPy scalars and for other Dual numbers;
+    DualVector and np.array operands fall back to the vectorized rules.
     """
+    __slots__ = ('real', 'dual')
+
     def __init__(self, real=0, dual=0):
         self.real = real
         self.dual = dual
 
-    @vec_dec
     def __add__(self, other):
         """
         This allows for addition with Dual Number instances or scalar numbers. 
@@ -50,16 +131,13 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-    
-        if type(other) in [int, float]:
+        t = type(other)
+        if t in _SCALARS:
             return Dual(self.real + other, self.dual)
-        elif type(other) == Dual:
+        if t is Dual:
             return Dual(self.real + other.real, self.dual + other.dual)
-        else:
-            raise TypeError("Addition operation not supported for type DualNumber and {}".format(type(other)))
-
+        return _vector(_add, self, other, "Addition")
 
-    @vec_dec
     def __mul__(self, other):
         """
         This allows for multiplication with Dual Number instances or scalar numbers. 
@@ -67,15 +145,13 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-        if type(other) in [int, float]:
+        t = type(other)
+        if t in _SCALARS:
             return Dual(self.real * other, self.dual * other)
-        elif type(other) == Dual:
-            return Dual(self.real * other.real,
-                        self.real * other.dual + self.dual * other.real)
-        else:
-            raise TypeError("Multiplication operation not supported for type DualNumber and {}".format(type(other)))
+        if t is Dual:
+            return Dual(self.real * other.real, self.real * other.dual + self.dual * other.real)
+        return _vector(_mul, self, other, "Multiplication")
 
-    @vec_dec
     def __sub__(self, other):
         """
         This allows for substraction with Dual Number instances or scalar numbers. 
@@ -83,19 +159,24 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-        return self.__add__(-other)
+        t = type(other)
+        if t in _SCALARS:
+            return Dual(self.real - other, self.dual)
+        if t is Dual:
+            return Dual(self.real - other.real, self.dual - other.dual)
+        return _vector(_sub, self, other, "Substraction")
 
-    @vec_dec
     def __rsub__(self, other):
         """
         This will be called when int/float - Dual Number instance. 
         :param other: int/float
         :return: Dual number object
+        :raises TypeError
         """
-        if type(other) in [int, float]:
+        if type(other) in _SCALARS:
             return Dual(other - self.real, - self.dual)
+        return _vector(_sub, other, self, "Substraction")
 
-    @vec_dec
     def __neg__(self):
         """
         This allows for negation of Dual number instance 
@@ -103,7 +184,6 @@ class Dual:
         """
         return Dual(-self.real, -self.dual)
 
-    @vec_dec
     def __truediv__(self, other):
         """
         This allows for true division between Dual Number instances and scalar numbers. 
@@ -111,26 +191,25 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-        if type(other) in [int, float]:
+        t = type(other)
+        if t in _SCALARS:
             return Dual(self.real / other, self.dual / other)
-        elif type(other) == Dual:
+        if t is Dual:
             return Dual(self.real / other.real,
                         (self.dual * other.real - self.real * other.dual) / other.real ** 2)
-        else:
-            raise TypeError("True Division operation not supported for type DualNumber and {}".format(type(other)))
-            
-    @vec_dec
+        return _vector(_div, self, other, "True Division")
+
     def __rtruediv__(self, other):
         """
         This will be called when (int/float) / Dual Number instance. 
         :param other: int/float
         :return: Dual number object
+        :raises TypeError
         """
-        assert type(other) in [int, float]
-
-        return Dual(other / self.real, - other * self.dual / self.real ** 2)
+        if type(other) in _SCALARS:
+            return Dual(other / self.real, - other * self.dual / self.real ** 2)
+        return _vector(_div, other, self, "True Division")
 
-    @vec_dec
     def __pow__(self, power, modulo=None):
         """
         This allows for power operation between Dual Number instances and scalar numbers. 
@@ -138,17 +217,15 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-        if type(power) in [float, int]:
-            c, d = power, 0
-        elif type(power) == Dual:
-            c, d = power.real, power.dual
-        else:
-            raise TypeError("Power operation not supported for type DualNumber and {}".format(type(power)))
+        if type(power) in _SCALARS:
+            a = self.real
+            return Dual(a ** power, power * a ** (power - 1) * self.dual)
+        if type(power) is Dual:
+            a, c = self.real, power.real
+            real = a ** c
+            return Dual(real, c * a ** (c - 1) * self.dual + real * np.log(a) * power.dual)
+        return _vector(_pow, self, power, "Power")
 
-        a, b = self.real, self.dual
-        return Dual(a ** c, a ** c * (d * np.log(a) + b * c / a))
-    
-    @vec_dec
     def __rpow__(self, other, modulo=None):
         """
         This will be called when (int/float) ** Dual Number instance. 
@@ -156,22 +233,47 @@ class Dual:
         :return: Dual number object
         :raises TypeError
         """
-        if type(other) in [float, int]:
-            c = other
-        else:
-            raise TypeError("Power operation not supported for type DualNumber and {}".format(type(other)))
-        a, b = self.real, self.dual
-        return Dual(c ** a, np.log(c) * c ** a * b)
+        if type(other) in _SCALARS:
+            real = other ** self.real
+            return Dual(real, np.log(other) * real * self.dual)
+        return _vector(_pow, other, self, "Power")
 
     __radd__ = __add__
     __rmul__ = __mul__
 
+    def __abs__(self):
+        """
+        This allows for abs() of a Dual Number instance.
+        :return: Dual Number
+        """
+        return _abs(self)
+
     def __len__(self):
         return 1
 
     def __iter__(self):
         yield self
 
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        NumPy ufunc protocol, so that e.g. np.exp(x) or np.add(a, x) dispatches to the
+        Dual number implementation, vectorized over DualVector.
+        :return: Dual number or DualVector, NotImplemented for unsupported ufuncs
+        """
+        if method != '__call__' or kwargs or ufunc not in _UFUNCS:
+            return NotImplemented
+        return _UFUNCS[ufunc](*inputs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        NumPy array function protocol, so that e.g. np.where or np.sum dispatches to the
+        Dual number implementation.
+        :return: Dual number or DualVector, NotImplemented for unsupported functions
+        """
+        if func not in _FUNCTIONS:
+            return NotImplemented
+        return _FUNCTIONS[func](*args, **kwargs)
+
     def __str__(self):
         return "real {}, dual {}".format(self.real, self.dual)
 
@@ -191,6 +293,17 @@ class Dual:
         """
         return type(other) != Dual or not np.isclose(self.real, other.real) or not np.isclose(self.dual, other.dual)
 
+    def astype(self, dtype):
+        """Convert the real and dual parts to a dtype, without copy when they already have it
+
+        :param dtype: NumPy dtype
+        :return: Dual number or DualVector
+        """
+        real, dual = cast(self.real, dtype), cast(self.dual, dtype)
+        if real is self.real and dual is self.dual:
+            return self
+        return type(self)(real, dual)
+
     def get_real(self):
         """Get the real part of Dual number
         """
@@ -201,28 +314,25 @@ class Dual:
         """
         return self.dual
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def exp(x):
         """Calculate the exponential operation of input
 
         :param x: Dual number
         :return: Dual number
         """
-        return Dual(np.exp(x.real), x.dual * np.exp(x.real))
+        return _like(x, np.exp(x.real), x.dual * np.exp(x.real))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def log(x):
         """Calculate the natural logarithmic operation of input
 
         :param x: Dual number
         :return: Dual number
         """
-        return Dual(np.log(x.real), x.dual / x.real)
+        return _like(x, np.log(x.real), x.dual / x.real)
     
-    @staticmethod
-    @vec_dec
+    @_elementary
     def log_base(x, base):
         """Calculate the logarithm of input with a chosen base (positive, not equal to 1)
 
@@ -230,100 +340,90 @@ class Dual:
         :param base: positive real number
         :return: Dual number
         """
-        return Dual(np.log(x.real) / np.log(base), x.dual / (x.real * np.log(base)))
+        return _like(x, np.log(x.real) / np.log(base), x.dual / (x.real * np.log(base)))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def sin(x):
         """Calculate the sine operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.sin(x.real), x.dual * np.cos(x.real))
+        return _like(x, np.sin(x.real), x.dual * np.cos(x.real))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def cos(x):
         """Calculate the cosine operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.cos(x.real), - x.dual * np.sin(x.real))
+        return _like(x, np.cos(x.real), - x.dual * np.sin(x.real))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def tan(x):
         """Calculate the tangent operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.tan(x.real), x.dual / np.power(np.cos(x.real), 2))
+        return _like(x, np.tan(x.real), x.dual / np.power(np.cos(x.real), 2))
     
-    @staticmethod
-    @vec_dec
+    @_elementary
     def arcsin(x):
         """Calculate the inverse of sine operation of input
 
         :param x: Dual Number, and the real part domain:[-1,1]
         :return: Dual Number
         """
-        return Dual(np.arcsin(x.real), x.dual /np.power(1 - x.real * x.real,0.5))
+        return _like(x, np.arcsin(x.real), x.dual /np.power(1 - x.real * x.real,0.5))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def arccos(x):
         """Calculate the inverse of cosine operation of input
 
         :param x: Dual Number, and the real part domain:[-1,1]
         :return: Dual Number
         """
-        return Dual(np.arccos(x.real), - x.dual /np.power(1 - x.real * x.real,0.5))
+        return _like(x, np.arccos(x.real), - x.dual /np.power(1 - x.real * x.real,0.5))
 
-    @staticmethod
-    @vec_dec
+    @_elementary
     def arctan(x):
         """Calculate the inverse of tangent operation of input
 
         :param x: Dual Number
         :return: Dual Number, and the real part domain is all real numbers
         """
-        return Dual(np.arctan(x.real), x.dual /(1 + x.real * x.real))
+        return _like(x, np.arctan(x.real), x.dual /(1 + x.real * x.real))
 
-    @staticmethod #(sinh, cosh, tanh)
-    @vec_dec
+    @_elementary #(sinh, cosh, tanh)
     def sinh(x):
         """Calculate the hyperbolic sine operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.sinh(x.real), x.dual * np.cosh(x.real))
+        return _like(x, np.sinh(x.real), x.dual * np.cosh(x.real))
     
-    @staticmethod 
-    @vec_dec
+    @_elementary
     def cosh(x):
         """Calculate the hyperbolic cosine operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.cosh(x.real), x.dual * np.sinh(x.real))
+        return _like(x, np.cosh(x.real), x.dual * np.sinh(x.real))
     
-    @staticmethod 
-    @vec_dec
+    @_elementary
     def tanh(x):
         """Calculate the hyperbolic tangent operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.tanh(x.real), x.dual * (1 - np.power(np.tanh(x.real),2)))
+        return _like(x, np.tanh(x.real), x.dual * (1 - np.power(np.tanh(x.real),2)))
 
-    @staticmethod 
-    @vec_dec
+    @_elementary
     def sigmoid(x):
         """Calculate the sigmoid operation of input
 
@@ -331,37 +431,112 @@ class Dual:
         :return: Dual Number
         """
         sig = 1/(1 + np.exp(-x.real))
-        return Dual(sig, x.dual * (sig * (1-sig)))
+        return _like(x, sig, x.dual * (sig * (1-sig)))
+
+    @_elementary
+    def log1p(x):
+        """Calculate log(1 + x) of input, accurate for small x
+
+        :param x: Dual Number
+        :return: Dual Number
+        """
+        return _like(x, np.log1p(x.real), x.dual / (1 + x.real))
+
+    @_elementary
+    def expm1(x):
+        """Calculate exp(x) - 1 of input, accurate for small x
 
-    @staticmethod 
-    @vec_dec
+        :param x: Dual Number
+        :return: Dual Number
+        """
+        real = np.expm1(x.real)
+        return _like(x, real, x.dual * (real + 1))
+
+    @_elementary
+    def relu(x):
+        """Calculate the rectified linear unit max(x, 0) of input, with derivative 0 at 0
+
+        :param x: Dual Number
+        :return: Dual Number
+        """
+        return _like(x, np.maximum(x.real, 0), x.dual * (x.real > 0))
+
+    @_elementary
     def sqrt(x):
         """Calculate the square root operation of input
 
         :param x: Dual Number
         :return: Dual Number
         """
-        return Dual(np.sqrt(x.real), x.dual * (0.5 * np.power(x.real,-0.5)))
+        return _like(x, np.sqrt(x.real), x.dual * (0.5 * np.power(x.real,-0.5)))
 
 class DualVector(Dual):
+    """Vector of Dual numbers, stored as one array of real parts and one array of dual parts
+    so that every operation is vectorized over the whole vector.
+    """
+    __slots__ = ('len',)
+
     def __init__(self, real=[], dual=[], vec=None):
         if vec is not None:
-            self.dual_vec = vec
-        else:
-            assert len(real) == len(dual), f"real {real}, dual {dual}"
-            self.dual_vec = [Dual(r, d) for r, d in zip(real, dual)]
-        self.len = len(self.dual_vec)
+            real, dual = [d.real for d in vec], [d.dual for d in vec]
+        self.real, self.dual = np.asarray(real), np.asarray(dual)
+        assert self.real.shape == self.dual.shape, f"real {real}, dual {dual}"
+        self.len = len(self.real)
+
+    def __add__(self, other):
+        return _vector(_add, self, other, "Addition")
+
+    def __mul__(self, other):
+        return _vector(_mul, self, other, "Multiplication")
+
+    def __sub__(self, other):
+        return _vector(_sub, self, other, "Substraction")
+
+    def __rsub__(self, other):
+        return _vector(_sub, other, self, "Substraction")
+
+    def __neg__(self):
+        return DualVector(-self.real, -self.dual)
+
+    def __truediv__(self, other):
+        return _vector(_div, self, other, "True Division")
+
+    def __rtruediv__(self, other):
+        return _vector(_div, other, self, "True Division")
+
+    def __pow__(self, power, modulo=None):
+        return _vector(_pow, self, power, "Power")
+
+    def __rpow__(self, other, modulo=None):
+        return _vector(_pow, other, self, "Power")
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    @property
+    def dual_vec(self):
+        """List of the Dual numbers of the vector
+        """
+        return list(self)
 
     def __len__(self):
         return self.len
 
     def __iter__(self):
-        for d in self.dual_vec:
-            yield d
+        for r, d in zip(self.real, self.dual):
+            yield Dual(r, d) if np.ndim(r) == 0 else DualVector(r, d)
+
+    def __getitem__(self, index):
+        real, dual = self.real[index], self.dual[index]
+        return Dual(real, dual) if np.ndim(real) == 0 else DualVector(real, dual)
+
+    @property
+    def shape(self):
+        return self.real.shape
 
     def __str__(self):
         ret = ""
-        for s in self.dual_vec:
+        for s in self:
             ret += str(s) + "\n"
         return ret
     
@@ -371,17 +546,192 @@ class DualVector(Dual):
         :param other 
         :return: Boolean
         """
-        return type(other) == DualVector and \
-            all([self.dual_vec[i] == other.dual_vec[i] for i in range(len(self.dual_vec))])
+        return type(other) == DualVector and self.shape == other.shape and \
+            np.allclose(self.real, other.real) and np.allclose(self.dual, other.dual)
+
+    def __ne__(self, other):
+        return not self == other
 
     def get_real(self):
         """Return the real part of Dual vector as a list
         """
-        return [d.real for d in self.dual_vec]
+        return self.real.tolist()
 
     def get_dual(self):
         """Return the dual part of Dual vector as a list
         """
-        return [d.dual for d in self.dual_vec]
+        return self.dual.tolist()
+
+
+def _parts(x):
+    """Split the input into its real and dual parts
+
+    :param x: Real, Dual Number or DualVector
+    :return: Tuple of real and dual part
+    """
+    return (x.real, x.dual) if isinstance(x, Dual) else (x, 0)
+
+
+def _pack(real, dual):
+    """Build a Dual Number or DualVector from its real and dual parts
+
+    :param real: number or np.array
+    :param dual: number or np.array, broadcastable to real
+    :return: Dual Number if real is a scalar, else DualVector
+    """
+    if np.ndim(real) == 0:
+        return Dual(real, dual)
+    return DualVector(*np.broadcast_arrays(real, dual))
+
+
+def _binary(name, rname):
+    """Build the implementation of a binary ufunc from the Dual operator and its reflection
 
+    :param name: Dual operator name
+    :param rname: reflected Dual operator name
+    :return: function of two inputs
+    """
+    def func(x, y):
+        return getattr(x, name)(y) if isinstance(x, Dual) else getattr(y, rname)(x)
+    return func
+
+
+def _matmul(x, y):
+    """Matrix product of Dual numbers (1-D or 2-D)
+
+    :return: Dual Number or DualVector
+    """
+    (a, da), (b, db) = _parts(x), _parts(y)
+    dual = 0
+    if np.ndim(da) > 0:
+        dual = dual + np.matmul(da, b)
+    if np.ndim(db) > 0:
+        dual = dual + np.matmul(a, db)
+    return _pack(np.matmul(a, b), dual)
 
+
+def _where(cond, x, y):
+    """Select elementwise from x where cond holds, else from y
+
+    :return: Dual Number or DualVector
+    """
+    (a, da), (b, db) = _parts(x), _parts(y)
+    return _pack(np.where(cond, a, b), np.where(cond, da, db))
+
+
+def _abs(x):
+    """Absolute value of Dual numbers, with derivative sign(x), i.e. 0 at 0
+
+    :return: Dual Number or DualVector
+    """
+    return _like(x, np.abs(x.real), x.dual * np.sign(x.real))
+
+
+def _maximum(x, y):
+    """Elementwise maximum of Dual numbers. At ties, the tangent is the mean of both tangents
+
+    :return: Dual Number or DualVector
+    """
+    (a, da), (b, db) = _parts(x), _parts(y)
+    w = (a > b) + 0.5 * (a == b)
+    return _pack(np.maximum(a, b), w * da + (1 - w) * db)
+
+
+def _minimum(x, y):
+    """Elementwise minimum of Dual numbers. At ties, the tangent is the mean of both tangents
+
+    :return: Dual Number or DualVector
+    """
+    (a, da), (b, db) = _parts(x), _parts(y)
+    w = (a < b) + 0.5 * (a == b)
+    return _pack(np.minimum(a, b), w * da + (1 - w) * db)
+
+
+def _clip(x, a_min, a_max):
+    """Clip Dual numbers to the constant interval [a_min, a_max], the tangent is kept inside the closed
+    interval and 0 outside
+
+    :return: Dual Number or DualVector
+    """
+    a, da = _parts(x)
+    inside = (a >= (-np.inf if a_min is None else a_min)) & (a <= (np.inf if a_max is None else a_max))
+    return _pack(np.clip(a, a_min, a_max), da * inside)
+
+
+def _sum(x, axis=None):
+    """Sum of Dual numbers over an axis
+
+    :return: Dual Number or DualVector
+    """
+    a, da = _parts(x)
+    return _pack(np.sum(a, axis=axis), np.sum(np.broadcast_to(da, np.shape(a)), axis=axis))
+
+
+def _mean(x, axis=None):
+    """Mean of Dual numbers over an axis
+
+    :return: Dual Number or DualVector
+    """
+    a, da = _parts(x)
+    return _pack(np.mean(a, axis=axis), np.mean(np.broadcast_to(da, np.shape(a)), axis=axis))
+
+
+def _trace(x):
+    """Trace of a Dual matrix
+
+    :return: Dual Number
+    """
+    a, da = _parts(x)
+    return Dual(np.trace(a), np.trace(da))
+
+
+def _norm(x):
+    """Euclidean (Frobenius for matrices) norm of Dual numbers, with a zero derivative where the norm is zero
+
+    :return: Dual Number
+    """
+    a, da = _parts(x)
+    n = np.linalg.norm(a)
+    return Dual(n, np.sum(a * da) / n if n != 0 else 0. * np.sum(da))
+
+
+_UFUNCS = {
+    np.add: _binary('__add__', '__radd__'),
+    np.subtract: _binary('__sub__', '__rsub__'),
+    np.multiply: _binary('__mul__', '__rmul__'),
+    np.true_divide: _binary('__truediv__', '__rtruediv__'),
+    np.power: _binary('__pow__', '__rpow__'),
+    np.negative: lambda x: -x,
+    np.positive: lambda x: x,
+    np.matmul: _matmul,
+    np.exp: Dual.exp,
+    np.log: Dual.log,
+    np.sqrt: Dual.sqrt,
+    np.sin: Dual.sin,
+    np.cos: Dual.cos,
+    np.tan: Dual.tan,
+    np.arcsin: Dual.arcsin,
+    np.arccos: Dual.arccos,
+    np.arctan: Dual.arctan,
+    np.sinh: Dual.sinh,
+    np.cosh: Dual.cosh,
+    np.tanh: Dual.tanh,
+    np.log1p: Dual.log1p,
+    np.expm1: Dual.expm1,
+    np.absolute: _abs,
+    np.maximum: _maximum,
+    np.minimum: _minimum,
+}
+
+_FUNCTIONS = {
+    np.where: _where,
+    np.clip: _clip,
+    np.sum: _sum,
+    np.mean: _mean,
+    np.dot: _matmul,
+    np.trace: _trace,
+    np.linalg.norm: _norm,
+    np.shape: lambda x: np.shape(_parts(x)[0]),
+    np.ndim: lambda x: np.ndim(_parts(x)[0]),
+    np.size: lambda x: np.size(_parts(x)[0]),
+}
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : sparse.py
+# Description: Dual number with a sparse tangent
+# Copyright 2022 Harvard University. All Rights Reserved.
+
+
+import numpy as np
+
+try:
+    from scipy import sparse as _sp
+except ImportError:  # scipy is optional, it is only needed for the sparse Jacobian matrices
+    _sp = None
+
+from .dual import _SCALARS
+
+"""This module implements dual numbers whose dual part is a sparse map from input index to value.
+A single forward pass over SparseDual numbers gives the whole gradient with respect to every input,
+at a cost proportional to the number of nonzero tangent entries rather than to the input dimension.
+Vectors are represented by NumPy object arrays of SparseDual numbers, on which NumPy applies the
+operators and the elementary functions (np.sin, np.exp, ...) elementwise. The piecewise functions
+(maximum, minimum, clip, relu) are given as functions of object arrays, with the same subgradients
+at the kinks as the Dual numbers.
+"""
+
+
+def _scale(d, a):
+    """Multiply a sparse tangent by a scalar
+
+    :param d: dictionary of input index and value
+    :param a: scalar
+    :return: dictionary of input index and value
+    """
+    return {k: a * v for k, v in d.items()}
+
+
+def _combine(d1, a, d2, b):
+    """Linear combination a * d1 + b * d2 of two sparse tangents
+
+    :param d1: dictionary of input index and value
+    :param a: scalar
+    :param d2: dictionary of input index and value
+    :param b: scalar
+    :return: dictionary of input index and value
+    """
+    if len(d1) < len(d2):
+        d1, a, d2, b = d2, b, d1, a
+    res = _scale(d1, a) if a != 1 else dict(d1)
+    for k, v in d2.items():
+        res[k] = res.get(k, 0) + b * v
+    return res
+
+
+def _is_const(x):
+    """Check whether the input is a scalar constant
+
+    :param x: any input
+    :return: Boolean
+    """
+    return type(x) in _SCALARS or isinstance(x, np.number)
+
+
+class SparseDual:
+    """Dual number with a sparse dual part, a dictionary of input index and partial derivative
+    """
+    __slots__ = ('real', 'dual')
+
+    def __init__(self, real=0, dual=None):
+        self.real = real
+        self.dual = {} if dual is None else dual
+
+    @classmethod
+    def variable(cls, value, offset=0):
+        """Seed an input with unit tangents, numbering its elements from offset on
+
+        :param value: int, float, list or np.array
+        :param offset: index of the first element of the input
+        :return: SparseDual, or np.array of SparseDual of the input shape
+        """
+        if isinstance(value, (list, np.ndarray)):
+            value = np.asarray(value)
+            res = np.empty(value.shape, dtype=object)
+            for i, v in enumerate(value.flat):
+                res.flat[i] = cls(v, {offset + i: 1.})
+            return res
+        return cls(value, {offset: 1.})
+
+    def _chain(self, real, deriv):
+        """Result of an elementwise function, from its value and its derivative at the real part
+
+        :param real: function value
+        :param deriv: function derivative
+        :return: SparseDual
+        """
+        return SparseDual(real, _scale(self.dual, deriv))
+
+    def __add__(self, other):
+        """
+        This allows for addition with SparseDual instances or scalar numbers.
+        :param other: SparseDual or scalar number
+        :return: SparseDual
+        """
+        if _is_const(other):
+            return SparseDual(self.real + other, self.dual)
+        if type(other) is SparseDual:
+            return SparseDual(self.real + other.real, _combine(self.dual, 1, other.dual, 1))
+        return NotImplemented
+
+    def __sub__(self, other):
+        """
+        This allows for substraction with SparseDual instances or scalar numbers.
+        :param other: SparseDual or scalar number
+        :return: SparseDual
+        """
+        if _is_const(other):
+            return SparseDual(self.real - other, self.dual)
+        if type(other) is SparseDual:
+            return SparseDual(self.real - other.real, _combine(self.dual, 1, other.dual, -1))
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if _is_const(other):
+            return SparseDual(other - self.real, _scale(self.dual, -1))
+        return NotImplemented
+
+    def __mul__(self, other):
+        """
+        This allows for multiplication with SparseDual instances or scalar numbers.
+        :param other: SparseDual or scalar number
+        :return: SparseDual
+        """
+        if _is_const(other):
+            return SparseDual(self.real * other, _scale(self.dual, other))
+        if type(other) is SparseDual:
+            return SparseDual(self.real * other.real, _combine(self.dual, other.real, other.dual, self.real))
+        return NotImplemented
+
+    def __truediv__(self, other):
+        """
+        This allows for true division with SparseDual instances or scalar numbers.
+        :param other: SparseDual or scalar number
+        :return: SparseDual
+        """
+        if _is_const(other):
+            return SparseDual(self.real / other, _scale(self.dual, 1 / other))
+        if type(other) is SparseDual:
+            real = self.real / other.real
+            return SparseDual(real, _combine(self.dual, 1 / other.real, other.dual, -real / other.real))
+        return NotImplemented
+
+    def __rtruediv__(self, other):
+        if _is_const(other):
+            real = other / self.real
+            return self._chain(real, -real / self.real)
+        return NotImplemented
+
+    def __pow__(self, power, modulo=None):
+        """
+        This allows for power operation with SparseDual instances or scalar numbers.
+        :param power: SparseDual or scalar number
+        :return: SparseDual
+        """
+        a = self.real
+        if _is_const(power):
+            return self._chain(a ** power, power * a ** (power - 1))
+        if type(power) is SparseDual:
+            real = a ** power.real
+            return SparseDual(real, _combine(self.dual, power.real * a ** (power.real - 1),
+                                             power.dual, real * np.log(a)))
+        return NotImplemented
+
+    def __rpow__(self, other, modulo=None):
+        if _is_const(other):
+            real = other ** self.real
+            return self._chain(real, real * np.log(other))
+        return NotImplemented
+
+    def __neg__(self):
+        return SparseDual(-self.real, _scale(self.dual, -1))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        """Absolute value, with derivative sign(x), i.e. 0 at 0
+        :return: SparseDual
+        """
+        return self._chain(abs(self.real), np.sign(self.real))
+
+    # comparisons and truth value of the real parts, used by the piecewise functions and where
+    def __lt__(self, other):
+        return self.real < _real(other)
+
+    def __le__(self, other):
+        return self.real <= _real(other)
+
+    def __gt__(self, other):
+        return self.real > _real(other)
+
+    def __ge__(self, other):
+        return self.real >= _real(other)
+
+    def __bool__(self):
+        return bool(self.real)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    # elementary functions, called by NumPy ufuncs on SparseDual numbers and object arrays of them
+    def sin(self):
+        return self._chain(np.sin(self.real), np.cos(self.real))
+
+    def cos(self):
+        return self._chain(np.cos(self.real), -np.sin(self.real))
+
+    def tan(self):
+        return self._chain(np.tan(self.real), 1 / np.cos(self.real) ** 2)
+
+    def arcsin(self):
+        return self._chain(np.arcsin(self.real), 1 / np.sqrt(1 - self.real ** 2))
+
+    def arccos(self):
+        return self._chain(np.arccos(self.real), -1 / np.sqrt(1 - self.real ** 2))
+
+    def arctan(self):
+        return self._chain(np.arctan(self.real), 1 / (1 + self.real ** 2))
+
+    def sinh(self):
+        return self._chain(np.sinh(self.real), np.cosh(self.real))
+
+    def cosh(self):
+        return self._chain(np.cosh(self.real), np.sinh(self.real))
+
+    def tanh(self):
+        t = np.tanh(self.real)
+        return self._chain(t, 1 - t ** 2)
+
+    def exp(self):
+        e = np.exp(self.real)
+        return self._chain(e, e)
+
+    def log(self):
+        return self._chain(np.log(self.real), 1 / self.real)
+
+    def sqrt(self):
+        s = np.sqrt(self.real)
+        return self._chain(s, 0.5 / s)
+
+    def log1p(self):
+        return self._chain(np.log1p(self.real), 1 / (1 + self.real))
+
+    def expm1(self):
+        e = np.expm1(self.real)
+        return self._chain(e, e + 1)
+
+    def __str__(self):
+        return "real {}, dual {}".format(self.real, self.dual)
+
+    def __eq__(self, other):
+        """
+        This allows for == operation between SparseDual instance and other class instance.
+        :param other
+        :return: Boolean
+        """
+        if type(other) != SparseDual or not np.isclose(self.real, other.real):
+            return False
+        return all(np.isclose(self.dual.get(k, 0), other.dual.get(k, 0)) for k in self.dual.keys() | other.dual.keys())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def get_real(self):
+        """Get the real part of SparseDual number
+        """
+        return self.real
+
+    def get_dual(self):
+        """Get the sparse dual part of SparseDual number
+        """
+        return self.dual
+
+
+def _real(x):
+    """Real part of a SparseDual number, constants are returned as they are
+
+    :param x: SparseDual or constant
+    :return: constant
+    """
+    return x.real if type(x) is SparseDual else x
+
+
+# real parts of an object array of SparseDual numbers and constants
+_reals = np.frompyfunc(_real, 1, 1)
+
+
+def _select(x, y, w):
+    """Piecewise selection of two SparseDual numbers or constants: x where w = 1, y where w = 0, and at ties
+    (w = 1/2) the common real part with the mean of both tangents
+
+    :param x: SparseDual or constant
+    :param y: SparseDual or constant
+    :param w: weight of x, 0, 1/2 or 1
+    :return: SparseDual
+    """
+    dx = x.dual if type(x) is SparseDual else {}
+    dy = y.dual if type(y) is SparseDual else {}
+    if w == 1:
+        return SparseDual(_real(x), dx)
+    if w == 0:
+        return SparseDual(_real(y), dy)
+    return SparseDual(_real(x), _combine(dx, w, dy, 1 - w))
+
+
+def _max1(x, y):
+    """Maximum of two SparseDual numbers or constants
+
+    :return: SparseDual
+    """
+    a, b = _real(x), _real(y)
+    return _select(x, y, (a > b) + 0.5 * (a == b))
+
+
+def _min1(x, y):
+    """Minimum of two SparseDual numbers or constants
+
+    :return: SparseDual
+    """
+    a, b = _real(x), _real(y)
+    return _select(x, y, (a < b) + 0.5 * (a == b))
+
+
+def _clip1(x, a_min, a_max):
+    """SparseDual number clipped to the constant interval [a_min, a_max], the tangent is kept inside the closed
+    interval and 0 outside
+
+    :return: SparseDual
+    """
+    a = _real(x)
+    if a_min is not None and a < a_min:
+        return SparseDual(a_min)
+    if a_max is not None and a > a_max:
+        return SparseDual(a_max)
+    return x
+
+
+def _relu1(x):
+    """Rectified linear unit of a SparseDual number, with derivative 0 at 0
+
+    :return: SparseDual
+    """
+    return x if _real(x) > 0 else SparseDual(0 * _real(x))
+
+
+# elementwise over SparseDual numbers, constants and object arrays of them, see Dual for the subgradients
+_maximum = np.frompyfunc(_max1, 2, 1)
+_minimum = np.frompyfunc(_min1, 2, 1)
+_clip = np.frompyfunc(_clip1, 3, 1)
+_relu = np.frompyfunc(_relu1, 1, 1)
+
+
+def _is_sparse(x):
+    """Check whether the input is a SparseDual number or an object array of them
+
+    :param x: any input
+    :return: Boolean
+    """
+    return type(x) is SparseDual or (isinstance(x, np.ndarray) and x.dtype == object)
+
+
+class SparseSeed(dict):
+    """Seed of a sparse forward pass: dictionary of variable name and index of its first element,
+    the elements of all the inputs being numbered one after the other.
+    """
+    def __init__(self, inputs):
+        """Number the elements of the inputs
+
+        :param inputs: dictionary of variable name and value
+        """
+        super().__init__()
+        self.sizes = {}
+        offset = 0
+        for k, v in inputs.items():
+            self[k] = offset
+            self.sizes[k] = int(np.size(v))
+            offset += self.sizes[k]
+        self.size = offset
+
+    def jacobian(self, res, sparse=False):
+        """Split the sparse tangents of the outputs into one Jacobian per variable
+
+        :param res: SparseDual or np.array of SparseDual
+        :param sparse: return scipy.sparse csr matrices instead of np.arrays
+        :return: dictionary of variable name and Jacobian of shape (outputs, variable size), np.array, or
+                 scipy.sparse csr matrix when sparse
+        :raises ImportError: for sparse matrices when scipy is not installed
+        """
+        outs = res.flat if isinstance(res, np.ndarray) else [res]
+        rows, cols, vals = [], [], []
+        n = 0
+        for n, out in enumerate(outs, 1):
+            dual = out.dual if type(out) is SparseDual else {}
+            rows.extend([n - 1] * len(dual))
+            cols.extend(dual.keys())
+            vals.extend(dual.values())
+
+        if sparse:
+            if _sp is None:
+                raise ImportError("Sparse Jacobians require scipy, install auto_diff_CGLLY[scipy].")
+            jac = _sp.csr_matrix((vals, (rows, cols)), shape=(n, self.size))
+        else:
+            jac = np.zeros((n, self.size))
+            np.add.at(jac, (np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)), vals)
+        return {k: jac[:, off:off + self.sizes[k]] for k, off in self.items()}
@@ -1,5 +1,14 @@
 from . import ops
 from .node import Node
-from .expression import Expression, Variable, Function, Compose
+from .expression import Expression, Variable, Function, Compose, ParameterVector
+from .transform import grad, value_and_grad, jacobian
+from .chunked import evaluate_chunked
+from .blocks import JacobianBlocks, jacobian_blocks
+from .scan import scan
+from .custom import CustomPrimitive, custom_primitive
+from .symbolic import diff, gradient_graph
 
-__all__ = ['ops', 'Expression', 'Variable', 'Function', 'Compose', 'Node']
+__all__ = ['ops', 'Expression', 'Variable', 'Function', 'Compose', 'ParameterVector', 'Node',
+           'grad', 'value_and_grad', 'jacobian', 'evaluate_chunked',
+           'JacobianBlocks', 'jacobian_blocks', 'scan', 'CustomPrimitive', 'custom_primitive',
+           'diff', 'gradient_graph']
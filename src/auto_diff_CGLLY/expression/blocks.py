@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : blocks.py
+# Description: Jacobian computed and stored block by block
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from .chunked import _output
+from .expression import Expression, _generate_base, _load
+
+try:
+    from scipy import sparse as _sparse
+except ImportError:  # scipy is optional, it is only needed for the sparse Jacobian matrices
+    _sparse = None
+
+"""
+This module computes large Jacobians block by block, without building them as nested lists. The rows of the
+Jacobian are the flattened values of the expressions, the columns the flattened inputs, in the order of the input
+dictionary. In forward mode, the blocks are groups of columns, one forward pass per column. In reverse mode, they
+are groups of rows: the expressions are propagated once and then one backward pass is run per row, from a unit
+adjoint of the output, reusing the values of the forward pass.
+
+The blocks can be consumed as a generator of NumPy arrays, or written into a preallocated array, a memory-mapped
+.npy file, or a sparse matrix keeping only the nonzero entries.
+"""
+
+
+class JacobianBlocks:
+    """Iterable of the blocks of the Jacobian of one or several expressions, e.g.
+
+        for index, block in JacobianBlocks(f, inputs, block_size=512):
+            ...  # block is J[:, index] in forward mode, J[index, :] in reverse mode
+    """
+    def __init__(self, f, inputs, block_size=256):
+        """Initialize the blocks
+
+        :param f: Expression, or Compose or list of Expressions in the same mode
+        :param inputs: dictionary of variable name and value. Arrays may be np.memmap or .npy file paths
+        :param block_size: number of columns (forward mode) or rows (reverse mode) of a block
+        """
+        self.funcs = [f] if isinstance(f, Expression) else list(f)
+        modes = {g.mode for g in self.funcs}
+        assert len(modes) == 1, 'Please build all the expressions in the same mode.'
+        self.mode = modes.pop()
+        self.inputs = {k: _load(v) for k, v in inputs.items()}
+        self.block_size = block_size
+        self.sizes = [int(np.size(g.value(self.inputs))) for g in self.funcs]
+        self.shape = (sum(self.sizes), sum(int(np.size(v)) for v in self.inputs.values()))
+        # blocks of columns in forward mode, of rows in reverse mode
+        self.axis = 1 if self.mode == 'f' else 0
+
+    def __iter__(self):
+        """Generate the blocks
+
+        :return: generator of the index slice along self.axis and the block as np.array
+        """
+        return self._columns() if self.mode == 'f' else self._rows()
+
+    def _columns(self):
+        """Generate the blocks of columns in forward mode
+
+        :return: generator of the column slice and the block
+        """
+        n = self.shape[1]
+        block = np.empty((self.shape[0], min(self.block_size, n)))
+        start, j = 0, 0
+        for seed, k in _generate_base(self.inputs):
+            row = 0
+            for g, size in zip(self.funcs, self.sizes):
+                res = g.forward(self.inputs, seed)
+                g.clear()
+                block[row:row + size, j] = np.reshape(np.broadcast_to(res.dual, np.shape(res.real)), -1)
+                row += size
+            j += 1
+            if j == len(block[0]) or start + j == n:
+                yield slice(start, start + j), block[:, :j]
+                start, j = start + j, 0
+                block = np.empty((self.shape[0], min(self.block_size, n - start)))
+
+    def _rows(self):
+        """Generate the blocks of rows in reverse mode
+
+        :return: generator of the row slice and the block
+        """
+        m = self.shape[0]
+        block = np.empty((min(self.block_size, m), self.shape[1]))
+        start, i = 0, 0
+        for g in self.funcs:
+            y = g.propagate(self.inputs)
+            for e in range(int(np.size(y))):
+                # a new unit adjoint for every row, as the nodes may keep the adjoint of a backward pass
+                adjoint = np.zeros(np.shape(y))
+                adjoint.flat[e] = 1
+                grad = g.backward(adjoint=adjoint if adjoint.ndim else 1.)
+                col = 0
+                for k, v in self.inputs.items():
+                    size = int(np.size(v))
+                    block[i, col:col + size] = np.reshape(np.broadcast_to(grad[k], np.shape(v)), -1) \
+                        if k in grad else 0
+                    col += size
+                g.reset_adjoint()
+                i += 1
+                if i == len(block) or start + i == m:
+                    yield slice(start, start + i), block[:i]
+                    start, i = start + i, 0
+                    block = np.empty((min(self.block_size, m - start), self.shape[1]))
+            g.clear()
+
+    def write(self, out=None, sparse=False):
+        """Compute the whole Jacobian block by block into a sink
+
+        :param out: None for a new array, path of a new .npy file to map, or preallocated np.array or np.memmap
+        :param sparse: accumulate the nonzero entries of the blocks into a scipy.sparse csr matrix instead
+        :return: np.array, np.memmap or scipy.sparse.csr_matrix of shape (size of the values, size of the inputs)
+        :raises ImportError: for a sparse matrix when scipy is not installed
+        """
+        if sparse:
+            if _sparse is None:
+                raise ImportError("Sparse Jacobians require scipy, install auto_diff_CGLLY[scipy].")
+            rows, cols, vals = [], [], []
+            for index, block in self:
+                r, c = np.nonzero(block)
+                rows.append(r + index.start if self.axis == 0 else r)
+                cols.append(c + index.start if self.axis == 1 else c)
+                vals.append(block[r, c])
+            return _sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                      shape=self.shape)
+
+        jac = _output(out, self.shape, float)
+        for index, block in self:
+            if self.axis == 0:
+                jac[index] = block
+            else:
+                jac[:, index] = block
+        if isinstance(jac, np.memmap):
+            jac.flush()
+        return jac
+
+
+def jacobian_blocks(f, inputs, block_size=256):
+    """Compute the Jacobian of one or several expressions block by block
+
+    :param f: Expression, or Compose or list of Expressions in the same mode
+    :param inputs: dictionary of variable name and value
+    :param block_size: number of columns (forward mode) or rows (reverse mode) of a block
+    :return: JacobianBlocks, iterable of the index slice and the block
+    """
+    return JacobianBlocks(f, inputs, block_size)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : chunked.py
+# Description: chunked evaluation of expressions over large, memory-mapped datasets
+# Copyright 2022 Harvard University. All Rights Reserved.
+import os
+
+import numpy as np
+
+from .expression import _load
+
+"""
+This module evaluates an expression over datasets larger than the memory. The data arrays may be np.memmap or
+paths of .npy files, which are opened as read-only memory maps. They are split into chunks of rows along their
+first axis, and each chunk is evaluated in one vectorized pass, so that only one chunk is in memory at a time.
+The values and the gradients are written into preallocated arrays, or into memory-mapped .npy output files.
+
+The expression has to act independently on the rows of the data: row i of the value may only depend on row i of
+the data arrays, like an elementwise expression or a model applied to each sample.
+"""
+
+
+def _output(out, shape, dtype):
+    """Allocate an output array
+
+    :param out: None for a new array, path of a new .npy file to map, or preallocated np.array or np.memmap
+    :param shape: shape of the output
+    :param dtype: dtype of the output
+    :return: np.array or np.memmap
+    """
+    if out is None:
+        return np.empty(shape, dtype)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+    if np.shape(out) != shape:
+        raise ValueError(f"Output of shape {np.shape(out)} given for a result of shape {shape}.")
+    return out
+
+
+def evaluate_chunked(f, inputs, chunk_size=65536, data=None, out=None, grad=False, grad_out=None):
+    """Evaluate an expression chunk by chunk over the rows of its data arrays
+
+    :param f: Expression, in reverse mode to compute the gradients
+    :param inputs: dictionary of variable name and value. Arrays may be np.memmap or .npy file paths
+    :param chunk_size: number of rows evaluated in one pass
+    :param data: names of the variables split into chunks. By default, the array inputs with the largest first
+                 dimension. The other inputs are passed whole to every chunk
+    :param out: None, path of a .npy file, or preallocated array to write the value into
+    :param grad: compute the gradient of the sum of the value in reverse mode
+    :param grad_out: dictionary of data variable name and None, path of a .npy file, or preallocated array to write
+                     its gradient into
+    :return: value, of first dimension the number of rows. With grad, also a dictionary of variable name and
+             gradient: the gradient of each row of the value with respect to the same row of a data variable,
+             and the gradient of the sum of the value with respect to the other variables
+    """
+    if grad and f.mode != 'r':
+        raise ValueError('Please build the expression in reverse mode to compute the gradients.')
+    inputs = {k: _load(v) for k, v in inputs.items()}
+    if data is None:
+        lengths = {k: len(v) for k, v in inputs.items() if np.ndim(v) > 0}
+        if not lengths:
+            raise ValueError('No array input to split into chunks.')
+        n = max(lengths.values())
+        data = [k for k, length in lengths.items() if length == n]
+    else:
+        n = len(inputs[data[0]])
+        if any(len(inputs[k]) != n for k in data):
+            raise ValueError('The data arrays should have the same first dimension.')
+    grad_out = grad_out or {}
+
+    value, grads = None, {}
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        chunk = {k: np.asarray(v[start:stop]) if k in data else v for k, v in inputs.items()}
+        if grad:
+            y = np.asarray(f.propagate(chunk))
+            res = f.backward()
+            f.clear()
+        else:
+            y = np.asarray(f.value(chunk))
+        if np.ndim(y) == 0 or len(y) != stop - start:
+            raise ValueError(f"The value of a chunk of {stop - start} rows has shape {np.shape(y)}, "
+                             f"the expression should act on each row of the data.")
+
+        if value is None:
+            value = _output(out, (n,) + y.shape[1:], y.dtype)
+        value[start:stop] = y
+
+        if grad:
+            for k, v in inputs.items():
+                g = np.broadcast_to(res.get(k, 0), np.shape(chunk[k]))
+                if k in data:
+                    if k not in grads:
+                        grads[k] = _output(grad_out.get(k), np.shape(v), np.result_type(g, float))
+                    grads[k][start:stop] = g
+                else:
+                    grads[k] = grads.get(k, 0) + g
+
+    for v in [value, *grads.values()]:
+        if isinstance(v, np.memmap):
+            v.flush()
+    return (value, grads) if grad else value
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : custom.py
+# Description: user-defined primitives with vectorized derivative rules
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from ..dual import Dual
+from ..dual.dual import _parts, _pack
+from .expression import Expression, Function
+from .node import Cache
+from .primitive import Primitive
+
+"""
+This module lets users define their own primitive operations from a vectorized value function and derivative
+rules, so that a composite function such as softplus or erf becomes one node of the graph instead of a subgraph of
+elementary operations. The rules receive the value of the output along with the inputs, so that the derivatives
+reuse the work of the value, e.g. sigmoid'(x) = y (1 - y):
+
+    y = f(*args)
+    tangent = jvp(tangents, y, *args)      tangent of the output from the tangents of the inputs, forward mode
+    adjoints = vjp(g, y, *args)            tuple of the adjoints of the inputs from the adjoint g, reverse mode
+
+The arguments may be Expressions, Dual numbers or constants. Constants get a tangent of 0 and their adjoint is
+ignored. For elementwise primitives one rule is enough, the other one is derived from it.
+"""
+
+
+class CustomPrimitive:
+    """A user-defined primitive operation, callable on Expressions, Dual numbers and arrays, e.g.
+
+        softplus = custom_primitive('softplus', lambda x: np.logaddexp(0, x),
+                                    jvp=lambda t, y, x: t[0] * (1 - np.exp(-y)), elementwise=True)
+        f = Expression.sum(softplus(x))
+    """
+    def __init__(self, name, f, jvp=None, vjp=None, elementwise=False):
+        """Initialize the primitive
+
+        :param name: primitive name
+        :param f: vectorized value function of the arguments
+        :param jvp: function (tangents, y, *args) of the tuple of tangents of the arguments, the output value and
+                    the arguments, returning the tangent of the output
+        :param vjp: function (g, y, *args) of the adjoint of the output, the output value and the arguments,
+                    returning a tuple of the adjoints of the arguments
+        :param elementwise: whether each output element only depends on the same element of the arguments
+        """
+        if jvp is None and vjp is None:
+            raise ValueError('Please give a jvp or a vjp rule.')
+        if not elementwise and (jvp is None or vjp is None):
+            raise ValueError('Please give both the jvp and the vjp rules of a primitive which is not elementwise.')
+        self.name = name
+        self.fun = f
+        self.jvp_rule = jvp
+        self.vjp_rule = vjp
+        self.elementwise = elementwise
+        # one graph primitive for each number of Expression operands of a Function
+        self.ops = {n: Primitive(name, lambda *args, n=n: self._apply(n, *args), (), elementwise,
+                                 vjp=lambda *args, n=n: self._vjp(n, *args), cache=1) for n in (1, 2)}
+
+    def __repr__(self):
+        return f"CustomPrimitive {self.name}"
+
+    def jvp(self, tangents, y, *args):
+        """Tangent of the output. For an elementwise primitive without jvp rule, it is the sum of the vjp of the
+        tangents, as the adjoints are then the adjoint times the local derivatives
+
+        :param tangents: tuple of the tangents of the arguments, 0 for constants
+        :param y: output value
+        :param args: arguments
+        :return: tangent of the output
+        """
+        if self.jvp_rule is not None:
+            return self.jvp_rule(tangents, y, *args)
+        res = 0
+        for i, t in enumerate(tangents):
+            if np.ndim(t) > 0 or t != 0:
+                res = res + self.vjp_rule(np.broadcast_to(t, np.shape(y)), y, *args)[i]
+        return res
+
+    def adjoints(self, g, y, args, positions):
+        """Adjoints of some of the arguments. For an elementwise primitive without vjp rule, the adjoint of one
+        argument is the jvp of the adjoint as the tangent of this argument
+
+        :param g: adjoint of the output
+        :param y: output value
+        :param args: arguments
+        :param positions: indices of the arguments
+        :return: list of the adjoints of the arguments at the positions
+        """
+        if self.vjp_rule is not None:
+            res = self.vjp_rule(g, y, *args)
+            return [res[p] for p in positions]
+        return [self.jvp_rule(tuple(g if j == p else 0 for j in range(len(args))), y, *args) for p in positions]
+
+    def _evaluate(self, args, cache=None):
+        """Evaluate the primitive on its arguments
+
+        :param args: list of the arguments, numbers, arrays or Dual numbers
+        :param cache: Cache keeping the arguments and the value for the vjp, or None
+        :return: value, Dual number or DualVector when an argument is a Dual number
+        """
+        if any(isinstance(a, Dual) for a in args):
+            reals, tangents = zip(*map(_parts, args))
+            y = self.fun(*reals)
+            return _pack(y, self.jvp(tangents, y, *reals))
+        y = self.fun(*args)
+        if cache is not None:
+            cache['args'], cache['y'] = args, y
+        return y
+
+    def _apply(self, n, *args):
+        """Value function of the graph primitive with n operands, called as f(*operands, positions, cache,
+        *constants)
+
+        :param n: number of operands
+        :param args: operand values followed by the parameters of the node
+        :return: value
+        """
+        positions, cache = args[n], args[n + 1]
+        full = list(args[n + 2:])
+        for p, v in zip(positions, args[:n]):
+            full.insert(p, v)
+        return self._evaluate(full, cache)
+
+    def _vjp(self, n, *args):
+        """Joint vector-Jacobian product of the graph primitive with n operands, so that the vjp rule is evaluated
+        once per adjoint for all the operands
+
+        :param n: number of operands
+        :param args: operand values followed by the parameters of the node
+        :return: function of the adjoint returning the list of the adjoints of the operands
+        """
+        positions, cache = args[n], args[n + 1]
+        return lambda g: self.adjoints(g, cache['y'], cache['args'], positions)
+
+    def __call__(self, *args):
+        """Apply the primitive. With Expression arguments, a Function node is created, with Dual arguments the
+        value and tangent are computed, and with constants the value only.
+
+        :param args: Expressions, Dual numbers or constants, at most two Expressions
+        :return: Function, Dual number, DualVector or value
+        """
+        positions = tuple(i for i, a in enumerate(args) if isinstance(a, Expression))
+        if not positions:
+            return self._evaluate(list(args))
+        if len(positions) > 2:
+            raise ValueError(f"A primitive takes at most two Expression arguments, found {len(positions)}.")
+        operands = [args[i] for i in positions]
+        consts = tuple(a for i, a in enumerate(args) if i not in positions)
+        return Function(*operands, mode=operands[0].mode, op=self.ops[len(operands)],
+                        params=(positions, Cache()) + consts)
+
+
+def custom_primitive(name, f, jvp=None, vjp=None, elementwise=False):
+    """Define a primitive operation from a vectorized value function and its derivative rules. The primitive is
+    one node of the graph in reverse mode, and is applied to Dual numbers in forward mode.
+
+    :param name: primitive name
+    :param f: vectorized value function f(*args)
+    :param jvp: forward rule jvp(tangents, y, *args), the tangent of the output y = f(*args) from the tuple of
+                tangents of the arguments, 0 for the constants
+    :param vjp: reverse rule vjp(g, y, *args), the tuple of the adjoints of the arguments from the adjoint g of
+                the output
+    :param elementwise: whether each output element only depends on the same element of the arguments. One rule
+                        is then enough, the other one is derived from it
+    :return: CustomPrimitive, callable on Expressions, Dual numbers and constants
+    """
+    return CustomPrimitive(name, f, jvp, vjp, elementwise)
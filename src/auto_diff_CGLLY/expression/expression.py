@@ -3,32 +3,96 @@
 # File       : expression.py
 # Description: autodiff functional expressions
 # Copyright 2022 Harvard University. All Rights Reserved.
+import os
+
 import numpy as np
 
-from ..dual import Dual, DualVector
+from ..dtype import cast, precision, _policy
+from ..dual import Dual, DualVector, SparseDual, SparseSeed
 from . import ops
-from .node import Node
+from .node import Node, BufferNode, IndexNode, Cache
+from .primitive import PRIMITIVES as _P
+
+
+# scalar inputs of the variables: Python and NumPy numbers
+_NUMBERS = (int, float, np.integer, np.floating)
 
 
-def _generate_base(inputs):
+def _generate_base(inputs, keys=None):
     """Function to generate zero vector for forward evaluation process
 
     :param inputs: Dictionary input
+    :param keys: variables to generate the unit seeds of, all of them by default
     :return: A list of int, float, or list.
     """
     assert isinstance(inputs, dict)
 
-    zero_vec = {k: 0 if type(v) in [int, float] else np.zeros_like(v) for k, v in inputs.items()}
+    zero_vec = {k: 0 if isinstance(v, _NUMBERS) else np.zeros_like(v) for k, v in inputs.items()}
     for k, v in inputs.items():
-        if type(v) in (int, float):
+        if keys is not None and k not in keys:
+            continue
+        if isinstance(v, _NUMBERS):
             zero_vec[k] = 1
             yield zero_vec, k
             zero_vec[k] = 0
         else:
-            for i in range(len(v)):
-                zero_vec[k][i] = 1
+            for i in range(np.size(v)):
+                zero_vec[k].flat[i] = 1
                 yield zero_vec, k
-                zero_vec[k][i] = 0
+                zero_vec[k].flat[i] = 0
+
+
+def _rows(diag):
+    """Function to expand the diagonal of an elementwise Jacobian to the derivatives of the output with respect
+    to each input element, as computed by one forward pass per element.
+
+    :param diag: Diagonal array, of the input and output shape
+    :return: A list of nested lists.
+    """
+    n = diag.size
+    rows = np.zeros((n,) + diag.shape, dtype=diag.dtype)
+    rows.reshape(n, n)[np.arange(n), np.arange(n)] = diag.ravel()
+    return rows.tolist()
+
+
+def _generate_ones(inputs):
+    """Function to generate one seed per variable, all ones for that variable and zero for the others.
+    For an expression built from elementwise operations only, the dual part of the result is then the
+    diagonal of the Jacobian.
+
+    :param inputs: Dictionary input
+    :return: A seed dictionary and the variable name.
+    """
+    assert isinstance(inputs, dict)
+
+    zero_vec = {k: 0 if isinstance(v, _NUMBERS) else np.zeros_like(v) for k, v in inputs.items()}
+    for k, v in inputs.items():
+        zero_vec[k] = 1 if isinstance(v, _NUMBERS) else np.ones_like(v)
+        yield zero_vec, k
+        zero_vec[k] = 0 if isinstance(v, _NUMBERS) else np.zeros_like(v)
+
+
+def _load(inputs):
+    """Open a .npy file path as a read-only memory map, other inputs are returned as they are
+
+    :param inputs: int, float, list, np.array, np.memmap, or path of a .npy file
+    :return: int, float, list, np.array or np.memmap
+    """
+    if isinstance(inputs, (str, os.PathLike)):
+        return np.load(inputs, mmap_mode='r')
+    return inputs
+
+
+def _same_params(p1, p2):
+    """Compare the constant parameters of two Functions, which may hold arrays.
+
+    :param p1: tuple of parameters
+    :param p2: tuple of parameters
+    :return: Boolean
+    """
+    return len(p1) == len(p2) and all(
+        np.array_equal(a, b) if isinstance(a, np.ndarray) or isinstance(b, np.ndarray) else a == b
+        for a, b in zip(p1, p2))
 
 
 class Compose:
@@ -48,6 +112,10 @@ class Compose:
         if self.mode == 'f':
             if seed is not None:
                 res = [f(inputs, seed, keep_graph=True) for f in self.funcs]
+            elif all(f.is_elementwise() for f in self.funcs) and \
+                    not all(isinstance(v, _NUMBERS) for v in inputs.values()):
+                # one pass per variable and function instead of one per input element
+                res = [self.wrap(*f(inputs, **kwargs)) for f in self.funcs]
             else:
                 res_dict = {k: [] for k in inputs.keys()}
                 for sd, k in _generate_base(inputs):
@@ -58,6 +126,18 @@ class Compose:
         else:
             return [f(inputs, seed) for f in self.funcs]
 
+    @staticmethod
+    def wrap(y, dy):
+        """Wrap the derivatives of a scalar output in lists, as the derivatives of the outputs are listed
+        for each seed in a seeded evaluation.
+
+        :param y: Evaluation result
+        :param dy: Dictionary of derivatives
+        :return: Evaluation result and dictionary of derivatives
+        """
+        return y, {k: [d if isinstance(d, list) else [d] for d in v] if isinstance(v, list) else v
+                   for k, v in dy.items()}
+
     def merge(self, res_dict):
         """Merge the evaluation results from a dictionary to a single list.
 
@@ -95,19 +175,60 @@ class Expression:
     """Base class for Function and Variable. Defines the underlying common functions
     shared by both classes.
     """
+    __slots__ = ('val', 'mode', '_varname')
+    # make NumPy arrays defer to the reflected operators, e.g. np.array * Expression
+    __array_ufunc__ = None
+
     def __init__(self, mode='f', name=None):
         self.val = None
         self.mode = mode
-        self.varname = set()
+        self._varname = {name} if name is not None else None
 
-    def __call__(self, inputs, seed=None, keep_graph=False):
-        if isinstance(inputs, (float, int)):
+    @property
+    def varname(self):
+        """Set of the names of the variables the expression depends on
+        """
+        if self._varname is None:
+            self._varname = set()
+        return self._varname
+
+    def __call__(self, inputs, seed=None, keep_graph=False, sparse=False, dtype=None, diagonal=False):
+        """Evaluate the expression and its derivatives.
+
+        :param inputs: int, float, or dictionary input. Arrays may be np.memmap or .npy file paths
+        :param seed: int, float, or dictionary seed vector, forward mode only
+        :param keep_graph: keep the evaluation results after the call
+        :param sparse: forward mode only, compute the whole Jacobian in a single pass with sparse
+                       tangents instead of one pass per input element, as scipy.sparse csr matrices. It
+                       requires scipy and is not supported by solve, inv, logdet and cholesky
+        :param dtype: floating point dtype of the computation, the global policy by default (see set_dtype)
+        :param diagonal: forward mode without seed only, return the derivative with respect to an array
+                         variable of the output shape as the diagonal of the Jacobian, an array of the
+                         variable shape, when the expression is built from elementwise operations only
+        :return: evaluation result and derivatives. In forward mode without seed, when the expression
+                 is built from elementwise operations only, the derivatives are computed in one pass
+                 per variable instead of one per input element.
+        """
+        if dtype is not None:
+            with precision(dtype):
+                return self(inputs, seed, keep_graph, sparse, diagonal=diagonal)
+        if isinstance(inputs, _NUMBERS):
             inputs = {k: inputs for k in self.varname}
+        inputs = {k: _load(v) for k, v in inputs.items()}
 
         if self.mode == 'f':
             print(f'Now in Forward mode!')
-            if seed:
-                if isinstance(seed, (float, int)):
+            if sparse:
+                seed = SparseSeed(inputs)
+                res = self.forward(inputs, seed)
+                y = [v.get_real() if isinstance(v, SparseDual) else v
+                     for v in (res.flat if isinstance(res, np.ndarray) else [res])]
+                dy = seed.jacobian(res, sparse=True)
+                if not keep_graph:
+                    self.clear()
+                return y, dy
+            elif seed:
+                if isinstance(seed, _NUMBERS):
                     seed = {k: seed for k in self.varname}
 
                 res = self.forward(inputs, seed)
@@ -121,16 +242,29 @@ class Expression:
                 return y, dy
             else:
                 res = {k: [] for k in inputs.keys()}
-
-                for sd, k in _generate_base(inputs):
-                    res[k].append(self.forward(inputs, sd))
+                diag = {}
+                dense = list(inputs.keys())
+                out = None
+
+                if self.is_elementwise():
+                    dense = []
+                    for sd, k in _generate_ones(inputs):
+                        out = self.forward(inputs, sd)
+                        self.clear()
+                        if isinstance(inputs[k], _NUMBERS):
+                            res[k].append(out)
+                        elif isinstance(out, DualVector) and out.shape == np.shape(inputs[k]):
+                            diag[k] = out.dual if diagonal else _rows(out.dual)
+                        else:
+                            dense.append(k)
+
+                for sd, k in _generate_base(inputs, dense):
+                    out = self.forward(inputs, sd)
+                    res[k].append(out)
                     self.clear()
 
-                k, val = res.popitem()
-                y = [v.get_real() for v in val]
-                dy = {k: [v.get_dual() for v in val]}
-                for k, val in res.items():
-                    dy[k] = [v.get_dual() for v in val]
+                y = [v.get_real() for v in out]
+                dy = {k: diag[k] if k in diag else [v.get_dual() for v in val] for k, val in res.items()}
                 return y, dy
 
         else:
@@ -140,6 +274,67 @@ class Expression:
                 self.clear()
             return y, grad
 
+    def is_elementwise(self):
+        """Check whether every output element only depends on the same element of the inputs
+
+        :return: Boolean
+        """
+        return True
+
+    def reset_adjoint(self):
+        """Reset the adjoints of the graph after a backward pass. The values of the forward pass are kept,
+        so that several backward passes can follow a single propagate, e.g. one for each output element.
+        """
+        stack, seen = [self], set()
+        while stack:
+            e = stack.pop()
+            if id(e) in seen:
+                continue
+            seen.add(id(e))
+            if getattr(e, 'node', None) is not None:
+                e.node.reset_adjoint()
+            if isinstance(e, Function):
+                stack.append(e.e1)
+                if e.e2 is not None:
+                    stack.append(e.e2)
+
+    def diff(self, name):
+        """Differentiate the expression into a new Expression, the derivative graph with respect to one
+        variable. It is the gradient of the sum of the elements of the expression, built once from the primitive
+        operations, which can be evaluated like any expression, in any mode, and differentiated again.
+
+        :param name: variable name
+        :return: Expression of the shape of the variable
+        """
+        # imported here, the symbolic rules are built on the Expression classes of this module
+        from .symbolic import diff
+        return diff(self, name)
+
+    def gradient_graph(self):
+        """Differentiate the expression into new Expressions with respect to all its variables, sharing the
+        nodes of the expression and of each other
+
+        :return: dictionary of variable name and derivative Expression
+        """
+        from .symbolic import gradient_graph
+        return gradient_graph(self)
+
+    def value(self, inputs, dtype=None):
+        """Evaluate the expression without any derivative bookkeeping. Only plain numbers
+        and arrays are computed: no Dual number is built, no seed is needed, and the graph
+        nodes are left untouched.
+
+        :param inputs: int, float, or dictionary input
+        :param dtype: floating point dtype of the computation, the global policy by default (see set_dtype)
+        :return: evaluation result -> int, float, or np.array
+        """
+        if dtype is not None:
+            with precision(dtype):
+                return self.value(inputs)
+        if isinstance(inputs, _NUMBERS):
+            inputs = {k: inputs for k in self.varname}
+        return self._value(inputs, {})
+
     def __eq__(self, other) -> bool:
         return isinstance(other, Expression) and self.val == other.val and \
                self.mode == other.mode and self.val == other.val and \
@@ -152,10 +347,8 @@ class Expression:
         :return: Function
         """
         if isinstance(other, Expression):
-            return Function(self, other, (lambda x, y: x + y), self.mode,
-                            Node([self.node, other.node], [(lambda x, y: 1), (lambda x, y: 1)]))
-
-        return Function(self, f=(lambda x: x + other), mode=self.mode, node=Node([self.node], [(lambda x: 1)]))
+            return Function(self, other, mode=self.mode, op=_P['add'])
+        return Function(self, mode=self.mode, op=_P['add_c'], params=(other,))
 
     def __mul__(self, other):
         """
@@ -164,9 +357,8 @@ class Expression:
         :return: Function
         """
         if isinstance(other, Expression):
-            return Function(self, other, (lambda x, y: x * y), self.mode,
-                            Node([self.node, other.node], [(lambda x, y: y), (lambda x, y: x)]))
-        return Function(self, f=(lambda x: x * other), mode=self.mode, node=Node([self.node], [(lambda x: other)]))
+            return Function(self, other, mode=self.mode, op=_P['mul'])
+        return Function(self, mode=self.mode, op=_P['mul_c'], params=(other,))
 
     __radd__ = __add__
     __rmul__ = __mul__
@@ -177,11 +369,9 @@ class Expression:
         :param other: Expression instance or scalar number
         :return: Function
         """
-
         if isinstance(other, Expression):
-            return Function(self, other, (lambda x, y: x - y), self.mode,
-                            Node([self.node, other.node], [(lambda x, y: 1), (lambda x, y: -1)]))
-        return Function(self, f=(lambda x: x - other), mode=self.mode, node=Node([self.node], [(lambda x: 1)]))
+            return Function(self, other, mode=self.mode, op=_P['sub'])
+        return Function(self, mode=self.mode, op=_P['sub_c'], params=(other,))
 
     def __rsub__(self, other):
         """
@@ -189,7 +379,7 @@ class Expression:
         :param other: scalar number
         :return: Function
         """
-        return Function(self, f=(lambda x: other - x), mode=self.mode, node=Node([self.node], [(lambda x: -1)]))
+        return Function(self, mode=self.mode, op=_P['rsub_c'], params=(other,))
 
     def __truediv__(self, other):
         """
@@ -198,9 +388,8 @@ class Expression:
         :return: Function
         """
         if isinstance(other, Expression):
-            return Function(self, other, (lambda x, y: x / y), self.mode,
-                            Node([self.node, other.node], [(lambda x, y: 1 / y), (lambda x, y: -x / y ** 2)]))
-        return Function(self, f=(lambda x: x / other), mode=self.mode, node=Node([self.node], [(lambda x: x / other)]))
+            return Function(self, other, mode=self.mode, op=_P['div'])
+        return Function(self, mode=self.mode, op=_P['div_c'], params=(other,))
 
     def __rtruediv__(self, other):
         """
@@ -208,8 +397,7 @@ class Expression:
         :param other: scalar number
         :return: Function
         """
-        return Function(self, f=(lambda x: other / x), mode=self.mode,
-                        node=Node([self.node], [(lambda x: -other / x ** 2)]))
+        return Function(self, mode=self.mode, op=_P['rdiv_c'], params=(other,))
 
     def __pow__(self, power, modulo=None):
         """
@@ -217,13 +405,9 @@ class Expression:
         :param other: Expression instance or scalar number
         :return: Function
         """
-        
         if isinstance(power, Expression):
-            return Function(self, power, (lambda a, x: a ** x), self.mode,
-                            Node([self.node, power.node],
-                                 [(lambda x, y: y * x ** (y - 1)), (lambda x, y: x ** y * np.log(x))]))
-        return Function(self, f=(lambda a: a ** power), mode=self.mode,
-                        node=Node([self.node], [(lambda x: power * x ** (power - 1))]))
+            return Function(self, power, mode=self.mode, op=_P['pow'])
+        return Function(self, mode=self.mode, op=_P['pow_c'], params=(power,))
 
     def __rpow__(self, other, modulo=None):
         """
@@ -231,15 +415,154 @@ class Expression:
         :param other: scalar number
         :return: Function
         """
-        return Function(self, f=(lambda a: other ** a), mode=self.mode,
-                        node=Node([self.node], [(lambda x: other ** x * np.log(other))]))
+        return Function(self, mode=self.mode, op=_P['rpow_c'], params=(other,))
 
     def __neg__(self):
         """
         This allows for negation of an Expression instance.
         :return: Function
         """
-        return Function(self, f=(lambda x: -x), mode=self.mode, node=Node([self.node], [(lambda x: -1)]))
+        return Function(self, mode=self.mode, op=_P['neg'])
+
+    def __abs__(self):
+        """
+        This allows for abs() of an Expression instance.
+        :return: Function
+        """
+        return Expression.abs(self)
+
+    def __matmul__(self, other):
+        """
+        This allows for matrix product with Expression instances or arrays.
+        :param other: Expression instance or array
+        :return: Function
+        """
+        return Expression.matmul(self, other)
+
+    def __rmatmul__(self, other):
+        """
+        This is called when array @ Expression
+        :param other: array
+        :return: Function
+        """
+        return Expression.matmul(other, self)
+
+    @staticmethod
+    def sum(x, axis=None):
+        """Create a Function object for the sum of input elements over an axis
+
+        :param x: Expression
+        :param axis: axis to sum over, all elements by default
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['sum'], params=(axis,))
+
+    @staticmethod
+    def mean(x, axis=None):
+        """Create a Function object for the mean of input elements over an axis
+
+        :param x: Expression
+        :param axis: axis to average over, all elements by default
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['mean'], params=(axis,))
+
+    @staticmethod
+    def matmul(x, y):
+        """Create a Function object for the matrix product of two inputs (1-D or 2-D).
+        One of the inputs may be a constant array.
+
+        :param x: Expression or array
+        :param y: Expression or array
+        :return: Function
+        """
+        assert isinstance(x, Expression) or isinstance(y, Expression)
+        if not isinstance(x, Expression):
+            return Function(y, mode=y.mode, op=_P['rmatmul_c'], params=(x,))
+        if not isinstance(y, Expression):
+            return Function(x, mode=x.mode, op=_P['matmul_c'], params=(y,))
+        return Function(x, y, mode=x.mode, op=_P['matmul'])
+
+    @staticmethod
+    def dot(x, y):
+        """Create a Function object for the dot product of two vectors. Same as matmul
+        for 1-D and 2-D inputs.
+
+        :param x: Expression or array
+        :param y: Expression or array
+        :return: Function
+        """
+        return Expression.matmul(x, y)
+
+    @staticmethod
+    def norm(x):
+        """Create a Function object for the Euclidean norm (Frobenius norm for matrices) of input
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['norm'])
+
+    @staticmethod
+    def solve(a, b):
+        """Create a Function object for the solution x of the linear system a x = b.
+        One of the inputs may be a constant array. The factorization of a is computed once
+        and reused by the reverse mode.
+
+        :param a: Expression or array, square matrix
+        :param b: Expression or array, vector or matrix
+        :return: Function
+        """
+        assert isinstance(a, Expression) or isinstance(b, Expression)
+        if not isinstance(a, Expression):
+            return Function(b, mode=b.mode, op=_P['rsolve_c'], params=(a, Cache()))
+        if not isinstance(b, Expression):
+            return Function(a, mode=a.mode, op=_P['solve_c'], params=(b, Cache()))
+        return Function(a, b, mode=a.mode, op=_P['solve'], params=(Cache(),))
+
+    @staticmethod
+    def inv(x):
+        """Create a Function object for the inverse of a square matrix
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['inv'], params=(Cache(),))
+
+    @staticmethod
+    def logdet(x):
+        """Create a Function object for the log of the absolute determinant of a square matrix
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['logdet'], params=(Cache(),))
+
+    @staticmethod
+    def cholesky(x):
+        """Create a Function object for the lower triangular Cholesky factor of a symmetric
+        positive definite matrix
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['cholesky'], params=(Cache(),))
+
+    @staticmethod
+    def trace(x):
+        """Create a Function object for the trace of a square matrix
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['trace'])
 
     @staticmethod
     def sin(x):
@@ -249,7 +572,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._sin, mode=x.mode, node=Node([x.node], [(lambda x: np.cos(x))]))
+        return Function(x, mode=x.mode, op=_P['sin'])
 
     @staticmethod
     def cos(x):
@@ -259,7 +582,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._cos, mode=x.mode, node=Node([x.node], [(lambda x: -np.sin(x))]))
+        return Function(x, mode=x.mode, op=_P['cos'])
 
     @staticmethod
     def tan(x):
@@ -269,7 +592,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._tan, mode=x.mode, node=Node([x.node], [(lambda x: 1 / np.cos(x) ** 2)]))
+        return Function(x, mode=x.mode, op=_P['tan'])
 
     @staticmethod
     def arcsin(x):
@@ -279,7 +602,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._arcsin, mode=x.mode, node=Node([x.node], [(lambda x: 1 / (1 - x * x) ** 0.5)]))
+        return Function(x, mode=x.mode, op=_P['arcsin'])
 
     @staticmethod
     def arccos(x):
@@ -289,7 +612,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._arccos, mode=x.mode, node=Node([x.node], [(lambda x: -1 / (1 - x * x) ** 0.5)]))
+        return Function(x, mode=x.mode, op=_P['arccos'])
 
     @staticmethod
     def arctan(x):
@@ -299,7 +622,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._arctan, mode=x.mode, node=Node([x.node], [(lambda x: 1 / (1 + x * x))]))
+        return Function(x, mode=x.mode, op=_P['arctan'])
 
     @staticmethod
     def sinh(x):
@@ -309,7 +632,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._sinh, mode=x.mode, node=Node([x.node], [(lambda x: (np.cosh(x)))]))
+        return Function(x, mode=x.mode, op=_P['sinh'])
 
     @staticmethod
     def cosh(x):
@@ -319,7 +642,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._cosh, mode=x.mode, node=Node([x.node], [(lambda x: (np.sinh(x)))]))
+        return Function(x, mode=x.mode, op=_P['cosh'])
 
     @staticmethod
     def tanh(x):
@@ -329,7 +652,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._tanh, mode=x.mode, node=Node([x.node], [(lambda x: 1 - (np.tanh(x)) ** 2)]))
+        return Function(x, mode=x.mode, op=_P['tanh'])
 
     @staticmethod
     def sigmoid(x):
@@ -339,8 +662,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        sig = 1 / (1 + Expression.exp(-x))
-        return Function(x, f=ops._sigmoid, mode=x.mode, node=Node([x.node], [(lambda x: sig * (1 - sig))]))
+        return Function(x, mode=x.mode, op=_P['sigmoid'])
 
     @staticmethod
     def exp(x):
@@ -350,7 +672,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._exp, mode=x.mode, node=Node([x.node], [(lambda x: np.exp(x))]))
+        return Function(x, mode=x.mode, op=_P['exp'])
 
     @staticmethod
     def log(x):
@@ -360,7 +682,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._log, mode=x.mode, node=Node([x.node], [(lambda x: 1 / x)]))
+        return Function(x, mode=x.mode, op=_P['log'])
 
     @staticmethod
     def log_base(x, base):
@@ -370,7 +692,7 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f= (lambda x : ops._log_base(x, base)), mode=x.mode, node=Node([x.node], [(lambda x: 1 / (x * np.log(base)))]))
+        return Function(x, mode=x.mode, op=_P['log_base'], params=(base,))
 
     @staticmethod
     def sqrt(x):
@@ -380,7 +702,164 @@ class Expression:
         :return: Function
         """
         assert isinstance(x, Expression)
-        return Function(x, f=ops._sqrt, mode=x.mode, node=Node([x.node], [(lambda x: 0.5 * (x ** -0.5))]))
+        return Function(x, mode=x.mode, op=_P['sqrt'])
+
+    @staticmethod
+    def log1p(x):
+        """Create a Function object for log(1 + x) of input, accurate for small x
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['log1p'])
+
+    @staticmethod
+    def expm1(x):
+        """Create a Function object for exp(x) - 1 of input, accurate for small x
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['expm1'])
+
+    @staticmethod
+    def softplus(x):
+        """Create a Function object for softplus log(1 + exp(x)) of input, as one node which does not overflow
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['softplus'], params=(Cache(),))
+
+    @staticmethod
+    def log_sigmoid(x):
+        """Create a Function object for log(sigmoid(x)) of input, as one node which does not overflow
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['log_sigmoid'], params=(Cache(),))
+
+    @staticmethod
+    def logsumexp(x, axis=None):
+        """Create a Function object for log(sum(exp(x))) of input over an axis, as one node which does not
+        overflow
+
+        :param x: Expression
+        :param axis: axis to reduce, all elements by default
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['logsumexp'], params=(axis, Cache()))
+
+    @staticmethod
+    def softmax(x, axis=-1):
+        """Create a Function object for the softmax exp(x) / sum(exp(x)) of input over an axis, as one node
+        which does not overflow
+
+        :param x: Expression
+        :param axis: axis to normalize over, the last one by default, None for all the elements
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['softmax'], params=(axis, Cache()))
+
+    @staticmethod
+    def where(cond, x, y):
+        """Create a Function object selecting elementwise from x where the condition holds, else from y. Both
+        branches are evaluated on the whole arrays and the derivatives are masked, so that piecewise functions
+        stay vectorized. The condition has no derivative. The unselected elements of a branch get a zero
+        adjoint, which still gives nan where the local derivative of that branch is infinite, e.g. log at 0.
+
+        :param cond: boolean array, or Expression whose nonzero elements select x, e.g. a mask variable
+        :param x: Expression or constant
+        :param y: Expression or constant
+        :return: Function
+        """
+        assert isinstance(x, Expression) or isinstance(y, Expression)
+        if isinstance(cond, Expression):
+            if not isinstance(y, Expression):
+                return Function(cond, x, mode=x.mode, op=_P['where_e'], params=(y,))
+            if not isinstance(x, Expression):
+                return Function(cond, y, mode=y.mode, op=_P['rwhere_e'], params=(x,))
+            # one node per branch, each keeping the selected elements of its branch and 0 elsewhere
+            return Function(cond, x, mode=x.mode, op=_P['where_e'], params=(0.,)) + \
+                Function(cond, y, mode=y.mode, op=_P['rwhere_e'], params=(0.,))
+        cond = np.asarray(cond, dtype=bool)
+        if not isinstance(y, Expression):
+            return Function(x, mode=x.mode, op=_P['where_c'], params=(cond, y))
+        if not isinstance(x, Expression):
+            return Function(y, mode=y.mode, op=_P['rwhere_c'], params=(cond, x))
+        return Function(x, y, mode=x.mode, op=_P['where'], params=(cond,))
+
+    @staticmethod
+    def abs(x):
+        """Create a Function object for the absolute value of input, with derivative 0 at 0
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['abs'])
+
+    @staticmethod
+    def maximum(x, y):
+        """Create a Function object for the elementwise maximum of two inputs. One of the inputs may be a
+        constant. At ties, the adjoint is split evenly between both inputs.
+
+        :param x: Expression or constant
+        :param y: Expression or constant
+        :return: Function
+        """
+        assert isinstance(x, Expression) or isinstance(y, Expression)
+        if not isinstance(x, Expression):
+            x, y = y, x
+        if not isinstance(y, Expression):
+            return Function(x, mode=x.mode, op=_P['maximum_c'], params=(y,))
+        return Function(x, y, mode=x.mode, op=_P['maximum'])
+
+    @staticmethod
+    def minimum(x, y):
+        """Create a Function object for the elementwise minimum of two inputs. One of the inputs may be a
+        constant. At ties, the adjoint is split evenly between both inputs.
+
+        :param x: Expression or constant
+        :param y: Expression or constant
+        :return: Function
+        """
+        assert isinstance(x, Expression) or isinstance(y, Expression)
+        if not isinstance(x, Expression):
+            x, y = y, x
+        if not isinstance(y, Expression):
+            return Function(x, mode=x.mode, op=_P['minimum_c'], params=(y,))
+        return Function(x, y, mode=x.mode, op=_P['minimum'])
+
+    @staticmethod
+    def clip(x, a_min=None, a_max=None):
+        """Create a Function object clipping input to the constant interval [a_min, a_max], with derivative 1
+        on the closed interval and 0 outside
+
+        :param x: Expression
+        :param a_min: lower bound, or None
+        :param a_max: upper bound, or None
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['clip'], params=(a_min, a_max))
+
+    @staticmethod
+    def relu(x):
+        """Create a Function object for the rectified linear unit max(x, 0) of input, with derivative 0 at 0
+
+        :param x: Expression
+        :return: Function
+        """
+        assert isinstance(x, Expression)
+        return Function(x, mode=x.mode, op=_P['relu'])
 
 
 class Function(Expression):
@@ -388,15 +867,77 @@ class Function(Expression):
     and evaluating in both forward mode and backward mode.
     """
 
-    def __init__(self, e1, e2=None, f=None, mode='f', node=None):
+    __slots__ = ('e1', 'e2', 'f', 'op', 'params', 'node')
+
+    def __init__(self, e1, e2=None, f=None, mode='f', node=None, op=None, params=()):
+        """Initialize the Function either from a registered primitive op, or from a value function f
+        and a node.
+
+        :param e1: first operand, Expression
+        :param e2: second operand, Expression
+        :param f: value function
+        :param mode: 'f' for forward mode, 'r' for reverse mode
+        :param node: graph node, created from op when not given
+        :param op: Primitive
+        :param params: constant parameters of the op, passed to f after the operands
+        """
         super(Function, self).__init__(mode=mode)
         self.e1 = e1
         self.e2 = e2
-        self.f = f
-        self.varname = e1.varname
+        self.op = op
+        self.params = params
+        self.f = op.f if op is not None else f
+        if node is None and op is not None:
+            node = Node((e1.node,) if e2 is None else (e1.node, e2.node), op=op, params=params)
         self.node = node
-        if e2:
-            self.varname.update(e2.varname)
+
+    @property
+    def varname(self):
+        """Set of the names of the variables the function depends on. It is computed by one
+        traversal of the graph the first time it is needed.
+        """
+        if self._varname is None:
+            names, stack, seen = set(), [self], set()
+            while stack:
+                e = stack.pop()
+                if id(e) in seen:
+                    continue
+                seen.add(id(e))
+                if isinstance(e, Function):
+                    stack.append(e.e1)
+                    if e.e2 is not None:
+                        stack.append(e.e2)
+                else:
+                    names.update(e.varname)
+            self._varname = names
+        return self._varname
+
+    def is_elementwise(self):
+        """Check whether the function is built from elementwise primitives only, by one traversal of the graph
+
+        :return: Boolean
+        """
+        stack, seen = [self], set()
+        while stack:
+            e = stack.pop()
+            if id(e) in seen or not isinstance(e, Function):
+                continue
+            seen.add(id(e))
+            if e.op is None or not e.op.elementwise:
+                return False
+            stack.append(e.e1)
+            if e.e2 is not None:
+                stack.append(e.e2)
+        return True
+
+    def _free_params(self):
+        """Constant parameters for the evaluations outside the reverse mode, with None instead of the Cache of the
+        node, so that they leave the intermediate results recorded by propagate untouched
+
+        :return: tuple
+        """
+        cache = self.node.cache if self.node is not None else None
+        return self.params if cache is None else tuple(None if p is cache else p for p in self.params)
 
     def forward(self, inputs, seed):
         """Forward mode differentiation for a Function.
@@ -405,27 +946,59 @@ class Function(Expression):
         :param seed: dictionary
         :return: Dual or DualVector
         """
-        if self.val:
+        if self.val is not None:
             return self.val
 
         res1 = self.e1.forward(inputs, seed)
-        if self.e2:
+        if self.e2 is not None:
             res2 = self.e2.forward(inputs, seed)
-            self.val = self.f(res1, res2)
+            self.val = self.f(res1, res2, *self._free_params())
         else:
-            self.val = self.f(res1)
+            self.val = self.f(res1, *self._free_params())
+        if _policy['dtype'] is not None:
+            self.val = cast(self.val)
 
         return self.val
 
+    def _value(self, inputs, cache):
+        """Value-only evaluation of a Function.
+
+        :param inputs: input dictionary
+        :param cache: dictionary of already evaluated sub-expressions, keyed by id
+        :return: evaluation result -> int, float, or np.array
+        """
+        if id(self) in cache:
+            return cache[id(self)]
+
+        args = [self.e1._value(inputs, cache)]
+        if self.e2 is not None:
+            args.append(self.e2._value(inputs, cache))
+        res = self.f(*args, *self._free_params())
+        if _policy['dtype'] is not None:
+            res = cast(res)
+        cache[id(self)] = res
+
+        return res
+
     def clear(self):
-        """Clear the previous evaluation result, and clears the expressions and node.
+        """Clear the previous evaluation result, and clears the expressions and node. Each shared
+        sub-expression is visited once, by one traversal of the graph.
         """
-        self.e1.clear()
-        if self.e2:
-            self.e2.clear()
-        self.val = None
-        if self.node:
-            self.node.clear()
+        stack, seen = [self], set()
+        while stack:
+            e = stack.pop()
+            if id(e) in seen:
+                continue
+            seen.add(id(e))
+            if not isinstance(e, Function):
+                e.clear()
+                continue
+            e.val = None
+            if e.node:
+                e.node.clear()
+            stack.append(e.e1)
+            if e.e2 is not None:
+                stack.append(e.e2)
 
     def propagate(self, inputs, child=None):
         """Forward pass of the reverse mode differentiation.
@@ -435,7 +1008,7 @@ class Function(Expression):
         :return: evaluation result -> int, float, or np.array 
         """
         if child is not None:
-            self.node.child.append(child)
+            self.node.add_child(child)
 
         if self.val is not None:
             return self.val
@@ -443,27 +1016,38 @@ class Function(Expression):
         args = [self.e1.propagate(inputs, self.node.id)]
         if self.e2 is not None:
             args.append(self.e2.propagate(inputs, self.node.id))
-        self.val = self.f(*args)
-        self.node.update(*args)
+        self.val = self.f(*args, *self.params)
+        if _policy['dtype'] is not None:
+            self.val = cast(self.val)
+        self.node.update(*args, out=self.val)
 
         return self.val
 
-    def backward(self):
+    def backward(self, res=None, adjoint=None):
         """Backward pass of the reverse mode differentiation.
-        :return: derivative result -> int, float, or np.array 
+
+        :param res: result dictionary to fill in, a new one is created if not given
+        :param adjoint: adjoint of the value of the expression, ones by default. The result is then the
+                        vector-Jacobian product of the adjoint
+        :return: derivative result -> dictionary of int, float, or np.array
         """
-        res = {}
+        if res is None:
+            res = {}
+        if adjoint is not None:
+            self.node.adjoint = adjoint
         if self.node.compute():
-            res = res | (self.e1.backward())
+            self.e1.backward(res)
             if self.e2 is not None:
-                res = res | self.e2.backward()
+                self.e2.backward(res)
         return res
 
     def __eq__(self, other):
         if type(other) != Function:
             return False
-        e_same = self.e1 == other.e1 and self.e1 == other.e1
-        if self.f or other.f:
+        e_same = self.e1 == other.e1 and self.e2 == other.e2
+        if self.op is not None and other.op is not None:
+            func_same = self.op is other.op and _same_params(self.params, other.params)
+        elif self.f or other.f:
             func_same = self.f.__code__.co_code == other.f.__code__.co_code
         else:
             func_same = True
@@ -478,11 +1062,11 @@ class Function(Expression):
 class Variable(Expression):
     """A class represents a mathematical variable.
     """
+    __slots__ = ('name', 'node')
 
     def __init__(self, name, mode='f'):
         super(Variable, self).__init__(mode=mode, name=name)
         self.name = name
-        self.varname.add(name)
         self.node = Node()
 
     @classmethod
@@ -499,20 +1083,29 @@ class Variable(Expression):
     def forward(self, inputs, seed):
         """Forward mode differentiation for a variable.
 
-        :param inputs:
-        :param seed:
-        :return:
+        :param inputs: dictionary, int, float or list
+        :param seed: dictionary, int, float or list, or SparseSeed for sparse tangents
+        :return: Dual, DualVector, SparseDual or np.array of SparseDual
         """
-        if self.val:
+        if self.val is not None:
             return self.val
 
         assert seed is not None, 'Please provide a seed vector'
 
+        if type(seed) == SparseSeed:
+            if type(inputs) == dict:
+                inputs = inputs.get(self.name, 0)
+            self.val = SparseDual.variable(inputs, seed[self.name]) if self.name in seed else SparseDual(inputs)
+            return self.val
+
         if type(inputs) == dict and type(seed) == dict:
             inputs, seed = inputs.get(self.name, 0), seed.get(self.name, 0)
-        if type(inputs) in [list, np.ndarray] and type(seed) in [list, np.ndarray]:
+        inputs = _load(inputs)
+        if _policy['dtype'] is not None:
+            inputs, seed = cast(inputs), cast(seed)
+        if isinstance(inputs, (list, np.ndarray)) and isinstance(seed, (list, np.ndarray)):
             self.val = DualVector(inputs, seed)
-        elif type(inputs) in [int, float] and type(seed) in [int, float]:
+        elif isinstance(inputs, _NUMBERS) and isinstance(seed, _NUMBERS):
             self.val = Dual(inputs, seed)
         else:
             raise ValueError(
@@ -520,6 +1113,27 @@ class Variable(Expression):
 
         return self.val
 
+    def _value(self, inputs, cache):
+        """Value-only evaluation of a variable.
+
+        :param inputs: input dictionary
+        :param cache: dictionary of already evaluated sub-expressions, keyed by id
+        :return: evaluation result -> int, float, or np.array
+        """
+        if type(inputs) == dict:
+            inputs = inputs.get(self.name, 0)
+        inputs = _load(inputs)
+        if _policy['dtype'] is not None:
+            inputs = cast(inputs)
+
+        if isinstance(inputs, (list, np.ndarray)):
+            return np.asarray(inputs)
+        elif isinstance(inputs, _NUMBERS):
+            return inputs
+        else:
+            raise ValueError(
+                f"Unsupported type {type(inputs)} for variable inputs.")
+
     def clear(self):
         """Clear the previous differentiation results.
         """
@@ -535,17 +1149,21 @@ class Variable(Expression):
         :return: evaluation result -> int, float, or np.array 
         """
         if child is not None:
-            self.node.child.append(child)
+            self.node.add_child(child)
 
         if self.val is not None:
             return self.val
 
         if type(inputs) == dict:
             inputs = inputs.get(self.name, 0)
-        
-        if type(inputs) in [list, np.ndarray]:
-            self.val = np.array(inputs)
-        elif type(inputs) in [int, float]:
+        inputs = _load(inputs)
+        if _policy['dtype'] is not None:
+            inputs = cast(inputs)
+
+        if isinstance(inputs, (list, np.ndarray)):
+            # arrays are used without copy, memory maps are read lazily
+            self.val = np.asarray(inputs)
+        elif isinstance(inputs, _NUMBERS):
             self.val = inputs
         else:
             raise ValueError(
@@ -553,14 +1171,20 @@ class Variable(Expression):
 
         return self.val
 
-    def backward(self):
+    def backward(self, res=None, adjoint=None):
         """Backward pass of the reverse mode differentiation for a variable.
-        :return: derivative result -> int, float, or np.array 
+
+        :param res: result dictionary to fill in, a new one is created if not given
+        :param adjoint: adjoint of the value of the variable, ones by default
+        :return: derivative result -> dictionary of int, float, or np.array
         """
+        if res is None:
+            res = {}
+        if adjoint is not None:
+            self.node.adjoint = adjoint
         if self.node.compute():
-            return {self.name: self.node.adjoint}
-        else:
-            return {}
+            res[self.name] = self.node.adjoint
+        return res
 
     def __eq__(self, other):
         """
@@ -575,3 +1199,150 @@ class Variable(Expression):
 
     def __str__(self):
         return f"Variable object, name {self.name}"
+
+
+class ParameterVector(Variable):
+    """A variable owning a contiguous vector of parameters, which is split into named slices.
+    Each slice is used as an Expression through ``pv[name]``. In reverse mode the gradient
+    of all the slices is accumulated in place into the preallocated flat array ``grad``,
+    which can be fed to NumPy based optimizers without any repacking.
+    """
+    __slots__ = ('slices', 'size', 'data', 'grad')
+
+    def __init__(self, name, layout, mode='r'):
+        """Initialize the parameter vector.
+
+        :param name: variable name
+        :param layout: dictionary of slice name and shape (int or tuple), or list of slice names of size 1
+        :param mode: variable mode
+        """
+        super(ParameterVector, self).__init__(name, mode=mode)
+        if isinstance(layout, (list, tuple)):
+            layout = {k: () for k in layout}
+        assert isinstance(layout, dict), 'Please provide a dictionary of slice names and shapes.'
+
+        self.slices = {}
+        start = 0
+        for k, shape in layout.items():
+            shape = (shape,) if isinstance(shape, int) else tuple(shape)
+            size = int(np.prod(shape))
+            index = start if shape == () else slice(start, start + size)
+            self.slices[k] = (index, shape)
+            start += size
+
+        self.size = start
+        self.data = np.zeros(self.size)
+        self.grad = np.zeros(self.size)
+        self.node = BufferNode(self.grad)
+
+    def __getitem__(self, key):
+        """Create a Function object selecting one named slice of the vector.
+
+        :param key: slice name
+        :return: Function
+        """
+        index, shape = self.slices[key]
+        return Function(self, mode=self.mode, op=_P['take'], params=(index, shape),
+                        node=IndexNode(self.node, index, shape))
+
+    def __len__(self):
+        return self.size
+
+    def get(self, key, flat=None):
+        """Get a view of one named slice, reshaped to its shape.
+
+        :param key: slice name
+        :param flat: flat array to take the slice from, the parameters by default
+        :return: int, float, or np.array
+        """
+        index, shape = self.slices[key]
+        flat = self.data if flat is None else flat
+        return flat[index] if shape == () else flat[index].reshape(shape)
+
+    def set(self, values):
+        """Set the parameters in place.
+
+        :param values: flat array, or dictionary of slice name and value
+        """
+        if isinstance(values, dict):
+            for k, v in values.items():
+                self.data[self.slices[k][0]] = np.reshape(v, -1) if self.slices[k][1] else v
+        else:
+            self.data[:] = values
+
+    def _flat(self, inputs):
+        """Get the flat parameter array, from the inputs when given there, else the owned one.
+
+        :param inputs: input dictionary or array
+        :return: np.array
+        """
+        if type(inputs) == dict:
+            inputs = inputs.get(self.name, self.data)
+        if type(inputs) not in [list, np.ndarray]:
+            raise ValueError(
+                f"Unsupported type {type(inputs)} for parameter vector inputs.")
+        inputs = np.asarray(inputs)
+        assert inputs.shape == (self.size,), f'expect {self.size} parameters, found shape {inputs.shape}.'
+        return inputs
+
+    def forward(self, inputs, seed):
+        """Forward mode differentiation for a parameter vector.
+
+        :param inputs: input dictionary or flat array
+        :param seed: seed dictionary or flat array, or SparseSeed for sparse tangents
+        :return: DualVector, or np.array of SparseDual
+        """
+        if self.val is not None:
+            return self.val
+
+        assert seed is not None, 'Please provide a seed vector'
+        if type(seed) == SparseSeed:
+            self.val = SparseDual.variable(self._flat(inputs), seed[self.name])
+            return self.val
+        if type(seed) == dict:
+            seed = seed.get(self.name, np.zeros(self.size))
+        self.val = DualVector(self._flat(inputs), seed)
+
+        return self.val
+
+    def _value(self, inputs, cache):
+        """Value-only evaluation of a parameter vector.
+
+        :param inputs: input dictionary or flat array
+        :param cache: dictionary of already evaluated sub-expressions, keyed by id
+        :return: np.array
+        """
+        return self._flat(inputs)
+
+    def propagate(self, inputs, child=None):
+        """Forward pass of the reverse mode differentiation for a parameter vector. The
+        gradient buffer is reset here, when the parameters are first evaluated.
+
+        :param inputs: input dictionary or flat array
+        :param child: node
+        :return: np.array
+        """
+        if child is not None:
+            self.node.add_child(child)
+
+        if self.val is not None:
+            return self.val
+
+        self.val = self._flat(inputs)
+        self.grad.fill(0)
+
+        return self.val
+
+    def __eq__(self, other):
+        """
+        This allows for == operation between ParameterVector instance and other class instance. 
+        :param other 
+        :return: Boolean
+        """
+        if type(other) != ParameterVector:
+            return False
+
+        return Expression.__eq__(self, other) and self.name == other.name and self.slices == other.slices
+
+    def __str__(self):
+        return f"ParameterVector object, name {self.name}, slices {list(self.slices)}"
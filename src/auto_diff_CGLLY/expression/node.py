@@ -5,32 +5,100 @@
 # Copyright 2022 Harvard University. All Rights Reserved.
 import numpy as np
 
+from ..dtype import cast, _policy
+
+
+def _unbroadcast(val, shape):
+    """Sum a broadcasted adjoint back to the shape of the operand it belongs to.
+
+    :param val: adjoint value
+    :param shape: shape of the operand
+    :return: adjoint value with the operand shape, or a scalar broadcastable to it
+    """
+    if np.ndim(val) <= len(shape) and all(n == m or n == 1 for n, m in
+                                          zip(np.shape(val)[::-1], shape[::-1])):
+        return val
+    val = np.asarray(val)
+    while val.ndim > len(shape):
+        val = val.sum(axis=0)
+    for i, n in enumerate(shape):
+        if n == 1 and val.shape[i] != 1:
+            val = val.sum(axis=i, keepdims=True)
+    return val
+
+
+class Cache(dict):
+    """Intermediate results of the value of a node which its derivatives reuse, e.g. a matrix factorization.
+    It is a constant parameter of the node, at the position given by its primitive, filled by the forward pass
+    of the reverse mode only and emptied when the node is cleared, so that it always belongs to the last
+    recorded input.
+    """
+    __slots__ = ()
+
+
 class Node:
     """A class represents one single node in the computational graph. In reverse mode, 
     every object of Expression class would be paired up with one Node object, which stores 
-    the parents and children nodes of the current node. 
+    the parents of the current node and counts its children. 
     """
+    __slots__ = ('id', 'parent', 'partial_func', 'vjp', 'params', 'cache', 'partial_val', 'args', 'out',
+                 'n_child', 'n_received', 'adjoint', 'done')
     num_node = 0
 
-    def __init__(self, p=[], ddp=[]):
+    def __init__(self, p=(), ddp=(), op=None, params=()):
         self.id = Node.num_node
         Node.num_node += 1
         self.parent = p
-        self.partial_func = ddp #DF/DX
+        self.partial_func = op.partials if op is not None else ddp #DF/DX
         # EX. F=X**2 ddp=lambda x: 2x (function)
         # x= 2, val = ddp(2) = 4
-        self.partial_val = []
-        self.child = []
-        self.received = set()
+        # A partial value can also be a function of the adjoint, i.e. a vector-Jacobian
+        # product, for the operations that are not elementwise.
+        # EX. F=sum(X) ddp=lambda x: (lambda g: g * np.ones_like(x))
+        # With a primitive op, the partial functions are shared by all nodes of the op
+        # and are called with the constant parameters of the node after the input.
+        # A primitive may instead give one vjp function returning the adjoints of all the
+        # parents at once, when they share work, e.g. the factorization of a linear solve.
+        self.vjp = op.vjp if op is not None else None
+        self.params = params
+        self.cache = params[op.cache] if op is not None and op.cache is not None else None
+        self.partial_val = None
+        self.args = ()
+        self.out = None
+        self.n_child = 0
+        self.n_received = 0
         self.adjoint = None
+        self.done = False
 
-    def update(self, *args):
-        """Update the partial value based on the input and partial derivative function.
+    def update(self, *args, out=None):
+        """Record the input of the current node. The partial values are evaluated lazily
+        from these inputs the first time they are needed by the backward pass.
 
         :param args: input list of the current node.
+        :param out: output of the current node.
+        """
+        self.args = args
+        self.out = out
+
+    def partials(self):
+        """Evaluate the partial derivative functions on the recorded input.
+
+        :return: list of partial values, one for each parent, or the joint vector-Jacobian
+                 product function of the primitive.
         """
-        for ddp in self.partial_func:
-            self.partial_val.append(ddp(*args))
+        if self.partial_val is None:
+            if self.vjp is not None:
+                self.partial_val = self.vjp(*self.args, *self.params)
+            else:
+                self.partial_val = [ddp(*self.args, *self.params) for ddp in self.partial_func]
+        return self.partial_val
+
+    def add_child(self, id):
+        """Register one child of the current node, i.e. one use of its value.
+
+        :param id: child id
+        """
+        self.n_child += 1
 
     def notify(self, id, val):
         """Function to notify the partent after finishing computing.
@@ -38,36 +106,129 @@ class Node:
         :param id: child id
         :param val: computed value by child
         """
-        assert id in self.child, 'Informed by unknown child'
+        assert self.n_received < self.n_child, 'Informed by unknown child'
         if self.adjoint is None:
             self.adjoint = val
         else:
             self.adjoint = self.adjoint + val
-        self.received.add(id)
+        self.n_received += 1
+
+    def ready(self):
+        """Check whether every child has notified the current node and the adjoint is
+        not yet propagated to the parents.
+
+        :return: boolean
+        """
+        return not self.done and self.n_received == self.n_child
 
     def compute(self):
         """Aggregate the results to get the adjoint of the current node and return the adjoint. 
 
         :return: boolean of whether the compute succeded.
         """
-        if len(self.received) == len(self.child):
+        if self.ready():
+            partial_val = self.partials()
+            joint = callable(partial_val)
             if self.adjoint is None:
-                self.adjoint =np.ones_like(self.partial_val[0])
-            for p, dp in zip(self.parent, self.partial_val):
-                p.notify(self.id, dp * self.adjoint)
+                self.adjoint = np.ones_like(self.out if joint or callable(partial_val[0]) else partial_val[0])
+            if joint:
+                vals = partial_val(self.adjoint)
+            else:
+                vals = [dp(self.adjoint) if callable(dp) else dp * self.adjoint for dp in partial_val]
+            for p, val, arg in zip(self.parent, vals, self.args):
+                val = _unbroadcast(val, np.shape(arg))
+                p.notify(self.id, cast(val) if _policy['dtype'] is not None else val)
+            self.done = True
             return True
         else:
             return False
 
+    def reset_adjoint(self):
+        """Reset the adjoint of the node after a backward pass, keeping the recorded inputs and the
+        partial values, so that another backward pass can be run from a new output adjoint.
+        """
+        self.n_received = 0
+        self.adjoint = None
+        self.done = False
+
     def clear(self):
         """Clear the calculated result of the node.
         """
-        self.partial_val = []
-        self.received = set()
+        if self.cache is not None:
+            self.cache.clear()
+        self.partial_val = None
+        self.args = ()
+        self.out = None
+        self.n_received = 0
         self.adjoint = None
-        self.child = []
+        self.n_child = 0
+        self.done = False
 
 
+class BufferNode(Node):
+    """A leaf node whose adjoint is accumulated in place into a preallocated buffer,
+    instead of being allocated anew on every notification. Children may notify only a
+    part of the buffer by giving an index.
+    """
+    __slots__ = ('buffer',)
 
+    def __init__(self, buffer):
+        super(BufferNode, self).__init__()
+        self.buffer = buffer
 
+    def notify(self, id, val, index=slice(None)):
+        """Accumulate the value computed by a child into the buffer.
 
+        :param id: child id
+        :param val: computed value by child
+        :param index: part of the buffer the value belongs to
+        """
+        assert self.n_received < self.n_child, 'Informed by unknown child'
+        self.buffer[index] += val
+        self.n_received += 1
+
+    def reset_adjoint(self):
+        """Reset the adjoint of the node after a backward pass, and zero the buffer.
+        """
+        super(BufferNode, self).reset_adjoint()
+        self.buffer.fill(0)
+
+    def compute(self):
+        """Mark the buffer as the adjoint of the current node once every child has notified.
+
+        :return: boolean of whether the compute succeded.
+        """
+        if self.ready():
+            self.adjoint = self.buffer
+            self.done = True
+            return True
+        else:
+            return False
+
+
+class IndexNode(Node):
+    """A node selecting the part ``index`` of its single parent, which is a BufferNode.
+    The adjoint is scattered back into the buffer of the parent in place.
+    """
+    __slots__ = ('index', 'shape')
+
+    def __init__(self, p, index, shape=()):
+        super(IndexNode, self).__init__((p,))
+        self.index = index
+        self.shape = shape
+
+    def compute(self):
+        """Send the adjoint of the current node to its part of the parent buffer.
+
+        :return: boolean of whether the compute succeded.
+        """
+        if self.ready():
+            if self.adjoint is None:
+                self.adjoint = 1
+            adjoint = _unbroadcast(self.adjoint, self.shape)
+            self.parent[0].notify(self.id, np.reshape(adjoint, -1) if np.ndim(adjoint) > 1 else adjoint,
+                                  self.index)
+            self.done = True
+            return True
+        else:
+            return False
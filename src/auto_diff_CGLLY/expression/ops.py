@@ -7,12 +7,24 @@
 
 import numpy as np
 
+try:
+    from scipy import linalg as _sla
+except ImportError:  # scipy is optional, numpy fallbacks are used without it
+    _sla = None
+
 from ..dual import Dual
+from ..dual.dual import _parts, _pack
+from ..dual import sparse as _sd
+from .node import _unbroadcast
 
 """
 This module provides mathematical operations for Function evaluation. Operations include elementary functions 
-like exp, log, sqrt, trigonometry functions, inverse trigonometry functions and hyperbolic functions.
-All operators are compatible with Dual numbers.
+like exp, log, sqrt, trigonometry functions, inverse trigonometry functions and hyperbolic functions, 
+piecewise functions (where, abs, maximum, minimum, clip, relu), overflow-safe fused functions (log1p, expm1,
+softplus, log_sigmoid, logsumexp, softmax), reductions and contractions (sum, mean, dot, matmul, norm) and linear algebra (solve, inv, logdet, cholesky, trace).
+All operators are compatible with Dual numbers, which implement the NumPy ufunc and array function protocols.
+Operators that are not elementwise come with a vector-Jacobian product function (suffix _vjp) for reverse mode.
+The linear maps of the reverse mode (suffix _grad) are also operators themselves, used by the derivative graphs.
 """
 
 def _sin(x):
@@ -22,7 +34,7 @@ def _sin(x):
     :return: Corresponding input type
     """
 
-    res = Dual.sin(x) if isinstance(x, Dual) else np.sin(x)
+    res = np.sin(x)
     return res
 
 
@@ -32,7 +44,7 @@ def _cos(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.cos(x) if isinstance(x, Dual) else np.cos(x)
+    res = np.cos(x)
     return res
 
 
@@ -42,7 +54,7 @@ def _tan(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.tan(x) if isinstance(x, Dual) else np.tan(x)
+    res = np.tan(x)
     return res
 
 def _arcsin(x):
@@ -51,7 +63,7 @@ def _arcsin(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.arcsin(x) if isinstance(x, Dual) else np.arcsin(x)
+    res = np.arcsin(x)
     return res
 
 def _arccos(x):
@@ -60,7 +72,7 @@ def _arccos(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.arccos(x) if isinstance(x, Dual) else np.arccos(x)
+    res = np.arccos(x)
     return res
 
 def _arctan(x):
@@ -69,7 +81,7 @@ def _arctan(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.arctan(x) if isinstance(x, Dual) else np.arctan(x)
+    res = np.arctan(x)
     return res
 
 def _sinh(x):
@@ -78,7 +90,7 @@ def _sinh(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.sinh(x) if isinstance(x, Dual) else np.sinh(x)
+    res = np.sinh(x)
     return res
 
 def _cosh(x):
@@ -87,7 +99,7 @@ def _cosh(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.cosh(x) if isinstance(x, Dual) else np.cosh(x)
+    res = np.cosh(x)
     return res
 
 
@@ -97,7 +109,7 @@ def _tanh(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.tanh(x) if isinstance(x, Dual) else np.tanh(x)
+    res = np.tanh(x)
     return res
 
 def _exp(x):
@@ -106,7 +118,7 @@ def _exp(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.exp(x) if isinstance(x, Dual) else np.exp(x)
+    res = np.exp(x)
     return res
 
 
@@ -116,7 +128,7 @@ def _log(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.log(x) if isinstance(x, Dual) else np.log(x)
+    res = np.log(x)
     return res
 
 def _log_base(x, base):
@@ -144,5 +156,715 @@ def _sqrt(x):
     :param x: Real or Dual Number
     :return: Corresponding input type
     """
-    res = Dual.sqrt(x) if isinstance(x, Dual) else np.sqrt(x)
-    return res
\ No newline at end of file
+    res = np.sqrt(x)
+    return res
+
+def _where(cond, x, y):
+    """Select elementwise from x where the condition holds, else from y
+
+    :param cond: boolean array, or Real or Dual array whose nonzero elements select x
+    :param x: Real or Dual number
+    :param y: Real or Dual number
+    :return: Corresponding input type
+    """
+    return np.where(_parts(cond)[0], x, y)
+
+
+def _mask(cond):
+    """Local derivative of the first branch of where, as a float mask
+
+    :param cond: condition of where, Real or Dual array
+    :return: np.array of 1. where the condition holds and 0. elsewhere
+    """
+    return np.where(_parts(cond)[0], 1., 0.)
+
+
+def _abs(x):
+    """Calculate the absolute value of input
+
+    :param x: Real or Dual Number
+    :return: Corresponding input type
+    """
+    res = np.abs(x)
+    return res
+
+
+def _maximum(x, y):
+    """Calculate the elementwise maximum of two inputs
+
+    :param x: Real, Dual or SparseDual Number
+    :param y: Real, Dual or SparseDual Number
+    :return: Corresponding input type
+    """
+    if _sd._is_sparse(x) or _sd._is_sparse(y):
+        return _sd._maximum(x, y)
+    res = np.maximum(x, y)
+    return res
+
+
+def _minimum(x, y):
+    """Calculate the elementwise minimum of two inputs
+
+    :param x: Real, Dual or SparseDual Number
+    :param y: Real, Dual or SparseDual Number
+    :return: Corresponding input type
+    """
+    if _sd._is_sparse(x) or _sd._is_sparse(y):
+        return _sd._minimum(x, y)
+    res = np.minimum(x, y)
+    return res
+
+
+def _select_weight(x, y, greater=True):
+    """Local derivative of maximum (or minimum) with respect to x, in one pass over the inputs: 1 where x is
+    selected, 0 where y is selected and 1/2 at ties, so that maximum(x, x) has derivative 1
+
+    :param x: Real number or np.array
+    :param y: Real number or np.array
+    :param greater: True for maximum, False for minimum
+    :return: np.array of weights, the derivative with respect to y is 1 - weight
+    """
+    return ((x > y) if greater else (x < y)) + 0.5 * (x == y)
+
+
+def _clip(x, a_min, a_max):
+    """Clip input to the interval [a_min, a_max]
+
+    :param x: Real, Dual or SparseDual Number
+    :param a_min: lower bound, or None
+    :param a_max: upper bound, or None
+    :return: Corresponding input type
+    """
+    if _sd._is_sparse(x):
+        return _sd._clip(x, a_min, a_max)
+    res = np.clip(x, a_min, a_max)
+    return res
+
+
+def _clip_grad(x, a_min, a_max):
+    """Local derivative of clip: 1 inside the closed interval [a_min, a_max], 0 outside
+
+    :param x: Real number or np.array
+    :param a_min: lower bound, or None
+    :param a_max: upper bound, or None
+    :return: np.array of 1. and 0.
+    """
+    inside = (x >= (-np.inf if a_min is None else a_min)) & (x <= (np.inf if a_max is None else a_max))
+    return np.where(inside, 1., 0.)
+
+
+def _relu(x):
+    """Calculate the rectified linear unit max(x, 0) of input
+
+    :param x: Real, Dual or SparseDual Number
+    :return: Corresponding input type
+    """
+    if _sd._is_sparse(x):
+        return _sd._relu(x)
+    res = Dual.relu(x) if isinstance(x, Dual) else np.maximum(x, 0)
+    return res
+
+
+def _log1p(x):
+    """Calculate log(1 + x) of input, accurate for small x
+
+    :param x: Real or Dual Number
+    :return: Corresponding input type
+    """
+    res = np.log1p(x)
+    return res
+
+
+def _expm1(x):
+    """Calculate exp(x) - 1 of input, accurate for small x
+
+    :param x: Real or Dual Number
+    :return: Corresponding input type
+    """
+    res = np.expm1(x)
+    return res
+
+
+def _softplus(x, cache=None):
+    """Calculate softplus log(1 + exp(x)) of input as max(x, 0) + log1p(exp(-|x|)), which does not overflow
+
+    :param x: Real or Dual Number
+    :param cache: dictionary keeping exp(-|x|) for the derivative
+    :return: Corresponding input type
+    """
+    a, da = _parts(x)
+    e = np.exp(-np.abs(a))
+    res = _maximum(a, 0) + np.log1p(e)
+    if cache is not None:
+        cache['e'] = e
+    if not isinstance(x, Dual):
+        return res
+    return _pack(res, da * _sigmoid_from(a, e))
+
+
+def _log_sigmoid(x, cache=None):
+    """Calculate log(sigmoid(x)) = -softplus(-x) of input as min(x, 0) - log1p(exp(-|x|)), which does not
+    overflow
+
+    :param x: Real or Dual Number
+    :param cache: dictionary keeping exp(-|x|) for the derivative
+    :return: Corresponding input type
+    """
+    a, da = _parts(x)
+    e = np.exp(-np.abs(a))
+    res = _minimum(a, 0) - np.log1p(e)
+    if cache is not None:
+        cache['e'] = e
+    if not isinstance(x, Dual):
+        return res
+    return _pack(res, da * _sigmoid_from(-a, e))
+
+
+def _sigmoid_from(x, e):
+    """Sigmoid of input from exp(-|x|), without overflow. It is the derivative of softplus(x), and
+    sigmoid(-x) is the derivative of log_sigmoid(x)
+
+    :param x: Real number or np.array
+    :param e: exp(-|x|)
+    :return: sigmoid(x)
+    """
+    return np.where(x >= 0, 1., e) / (1 + e)
+
+
+def _shifted_exp(x, axis):
+    """Exponentials of input shifted by its maximum over an axis, so that they do not overflow
+
+    :param x: Real number or np.array, or SparseDual numbers, shifted by the maximum of their real parts
+    :param axis: axis of the reduction, None for all the elements
+    :return: Tuple of the maximum, the shifted exponentials and their sum, with the axis kept
+    """
+    m = np.max(_sd._reals(x).astype(float) if _sd._is_sparse(x) else x, axis=axis, keepdims=True)
+    m = np.where(np.isfinite(m), m, 0)
+    ex = np.exp(x - m)
+    return m, ex, np.sum(ex, axis=axis, keepdims=True)
+
+
+def _logsumexp(x, axis=None, cache=None):
+    """Calculate log(sum(exp(x))) of input over an axis, shifted by the maximum so that it does not overflow.
+    The derivative is the softmax of the input, computed from the same exponentials
+
+    :param x: Real or Dual Number
+    :param axis: axis to reduce, all elements by default
+    :param cache: dictionary keeping the softmax for the vjp
+    :return: Corresponding input type
+    """
+    a, da = _parts(x)
+    m, ex, s = _shifted_exp(a, axis)
+    res = m + np.log(s)
+    res = np.squeeze(res, axis=axis) if axis is not None else res.reshape(())[()]
+    p = ex / s
+    if cache is not None:
+        cache['p'] = p
+    if not isinstance(x, Dual):
+        return res
+    return _pack(res, np.sum(p * da, axis=axis))
+
+
+def _logsumexp_vjp(g, cache, axis=None):
+    """Vector-Jacobian product of logsumexp, reusing the softmax
+
+    :param g: adjoint of logsumexp
+    :param cache: dictionary filled by _logsumexp
+    :param axis: axis reduced
+    :return: adjoint of the input
+    """
+    p = cache['p']
+    return (np.expand_dims(g, axis) if axis is not None else g) * p
+
+
+def _softmax(x, axis=-1, cache=None):
+    """Calculate the softmax exp(x) / sum(exp(x)) of input over an axis, shifted by the maximum so that it does
+    not overflow. The Jacobian-vector product p (t - sum(p t)) reuses the softmax p
+
+    :param x: Real or Dual Number
+    :param axis: axis to normalize over, the last one by default, None for all the elements
+    :param cache: dictionary keeping the softmax for the vjp
+    :return: Corresponding input type
+    """
+    a, da = _parts(x)
+    if np.ndim(a) == 0:
+        axis = None
+    m, ex, s = _shifted_exp(a, axis)
+    p = ex / s if np.ndim(a) else (ex / s)[()]
+    if cache is not None:
+        cache['p'] = p
+    if not isinstance(x, Dual):
+        return p
+    return _pack(p, p * (da - np.sum(p * da, axis=axis, keepdims=True)))
+
+
+def _softmax_vjp(g, cache, axis=-1):
+    """Vector-Jacobian product of softmax, reusing the softmax
+
+    :param g: adjoint of the softmax
+    :param cache: dictionary filled by _softmax
+    :param axis: axis normalized over
+    :return: adjoint of the input
+    """
+    p = cache['p']
+    if np.ndim(p) == 0:
+        axis = None
+    return p * (g - np.sum(g * p, axis=axis, keepdims=True))
+
+
+def _take(x, index, shape):
+    """Select one part of a flat input and reshape it
+
+    :param x: Real vector or DualVector
+    :param index: int or slice
+    :param shape: shape of the selected part
+    :return: Corresponding input type
+    """
+    if isinstance(x, Dual):
+        real, dual = _parts(x)
+        return _pack(np.reshape(real[index], shape), np.reshape(dual[index], shape))
+    res = x[index] if len(shape) <= 1 else np.reshape(x[index], shape)
+    return res
+
+
+def _take_vjp(g, x, index, shape):
+    """Vector-Jacobian product of take, the adjoint scattered into zeros of the shape of the flat input
+
+    :param g: adjoint of the selected part
+    :param x: flat input, only its shape is used
+    :param index: int or slice
+    :param shape: shape of the selected part
+    :return: adjoint of the input
+    """
+    res = np.zeros(np.shape(x))
+    res[index] = np.reshape(np.broadcast_to(g, shape), np.shape(res[index]))
+    return res
+
+
+def _sum(x, axis=None):
+    """Calculate the sum of input elements over an axis
+
+    :param x: Real or Dual vector
+    :param axis: axis to sum over, all elements by default
+    :return: Corresponding input type
+    """
+    return np.sum(x, axis=axis)
+
+
+def _sum_vjp(g, x, axis=None):
+    """Vector-Jacobian product of the sum operation
+
+    :param g: adjoint of the sum
+    :param x: input of the sum
+    :param axis: axis summed over
+    :return: adjoint of the input
+    """
+    if axis is not None:
+        g = np.expand_dims(g, axis)
+    return np.broadcast_to(g, np.shape(x)).copy()
+
+
+def _mean(x, axis=None):
+    """Calculate the mean of input elements over an axis
+
+    :param x: Real or Dual vector
+    :param axis: axis to average over, all elements by default
+    :return: Corresponding input type
+    """
+    return np.mean(x, axis=axis)
+
+
+def _mean_vjp(g, x, axis=None):
+    """Vector-Jacobian product of the mean operation
+
+    :param g: adjoint of the mean
+    :param x: input of the mean
+    :param axis: axis averaged over
+    :return: adjoint of the input
+    """
+    n = np.size(x) if axis is None else np.shape(x)[axis]
+    return _sum_vjp(g, x, axis) / n
+
+
+def _matmul(x, y):
+    """Calculate the matrix product of two inputs (1-D or 2-D)
+
+    :param x: Real or Dual vector/matrix
+    :param y: Real or Dual vector/matrix
+    :return: Corresponding input type
+    """
+    return np.matmul(x, y)
+
+
+def _matmul_vjp(g, x, y):
+    """Vector-Jacobian product of the matrix product (1-D or 2-D inputs)
+
+    :param g: adjoint of the product
+    :param x: left input of the product
+    :param y: right input of the product
+    :return: Tuple of adjoint of left and right input
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    x2 = x if x.ndim > 1 else x.reshape(1, -1)
+    y2 = y if y.ndim > 1 else y.reshape(-1, 1)
+    g2 = np.broadcast_to(g, np.shape(np.matmul(x, y))).reshape(x2.shape[0], y2.shape[1])
+    return (g2 @ y2.T).reshape(x.shape), (x2.T @ g2).reshape(y.shape)
+
+
+def _norm(x):
+    """Calculate the Euclidean (Frobenius for matrices) norm of input
+
+    :param x: Real or Dual vector
+    :return: Corresponding input type
+    """
+    return np.linalg.norm(x)
+
+
+def _norm_vjp(g, x, n):
+    """Vector-Jacobian product of the norm operation
+
+    :param g: adjoint of the norm
+    :param x: input of the norm
+    :param n: norm of the input
+    :return: adjoint of the input, zero where the norm is zero
+    """
+    x = np.asarray(x)
+    return g * x / n if n != 0 else g * np.zeros_like(x, dtype=float)
+
+
+def _lu(a):
+    """Factorize a square matrix once, so that the factorization can be reused by the value
+    and the derivatives. LU factorization with scipy, the matrix itself without it, which
+    np.linalg.solve then factorizes at each solve.
+
+    :param a: square matrix
+    :return: factorization
+    """
+    return _sla.lu_factor(a) if _sla is not None else np.asarray(a)
+
+
+def _lu_solve(lu, b, trans=0):
+    """Solve a linear system with a factorization from _lu
+
+    :param lu: factorization of matrix A
+    :param b: right hand side
+    :param trans: solve A^T x = b if 1
+    :return: solution x
+    """
+    if _sla is not None:
+        return _sla.lu_solve(lu, b, trans=trans)
+    return np.linalg.solve(lu.T if trans else lu, b)
+
+
+def _tri_solve(l, b, trans=0):
+    """Solve a lower triangular linear system
+
+    :param l: lower triangular matrix L
+    :param b: right hand side
+    :param trans: solve L^T x = b if 1
+    :return: solution x
+    """
+    if _sla is not None:
+        return _sla.solve_triangular(l, b, trans=trans, lower=True)
+    return np.linalg.solve(l.T if trans else l, b)
+
+
+def _phi(a):
+    """Lower triangular part of a matrix, with the diagonal halved
+
+    :param a: square matrix
+    :return: square matrix
+    """
+    res = np.tril(a)
+    res[np.diag_indices_from(res)] *= 0.5
+    return res
+
+
+def _dense_only(name, *args):
+    """Check that the inputs of a linear algebra primitive are not SparseDual numbers, which the factorizations
+    do not support
+
+    :param name: primitive name
+    :param args: inputs
+    :raises TypeError: for SparseDual inputs
+    """
+    if any(_sd._is_sparse(a) for a in args):
+        raise TypeError(f"{name} is not supported with sparse=True, use the forward or reverse mode instead.")
+
+
+def _solve(a, b, cache=None):
+    """Solve the linear system a x = b
+
+    :param a: Real or Dual square matrix
+    :param b: Real or Dual vector/matrix
+    :param cache: dictionary keeping the factorization for the vjp
+    :return: Corresponding input type
+    """
+    _dense_only('solve', a, b)
+    (a, da), (b, db) = _parts(a), _parts(b)
+    lu = _lu(a)
+    x = _lu_solve(lu, b)
+    if cache is not None:
+        cache['lu'], cache['x'] = lu, x
+    if np.ndim(da) == 0 and np.ndim(db) == 0:
+        return x
+    rhs = np.broadcast_to(db, np.shape(b))
+    if np.ndim(da) > 0:
+        rhs = rhs - da @ x
+    return _pack(x, _lu_solve(lu, rhs))
+
+
+def _solve_vjp(g, cache, matrix=True):
+    """Vector-Jacobian product of the linear system solution, reusing the factorization
+
+    :param g: adjoint of the solution
+    :param cache: dictionary filled by _solve
+    :param matrix: whether the adjoint of the matrix is needed
+    :return: Tuple of adjoint of the matrix, or None, and the right hand side
+    """
+    x = cache['x']
+    gb = _lu_solve(cache['lu'], np.broadcast_to(g, np.shape(x)), trans=1)
+    if not matrix:
+        return None, gb
+    return (-np.outer(gb, x) if np.ndim(x) == 1 else -gb @ x.T), gb
+
+
+def _inv(a, cache=None):
+    """Calculate the inverse of a square matrix
+
+    :param a: Real or Dual square matrix
+    :param cache: dictionary keeping the inverse for the vjp
+    :return: Corresponding input type
+    """
+    _dense_only('inv', a)
+    a, da = _parts(a)
+    y = _lu_solve(_lu(a), np.eye(len(a)))
+    if cache is not None:
+        cache['y'] = y
+    if np.ndim(da) == 0:
+        return y
+    return _pack(y, -y @ da @ y)
+
+
+def _inv_vjp(g, cache):
+    """Vector-Jacobian product of the matrix inverse, reusing the inverse
+
+    :param g: adjoint of the inverse
+    :param cache: dictionary filled by _inv
+    :return: adjoint of the matrix
+    """
+    y = cache['y']
+    return -y.T @ np.broadcast_to(g, y.shape) @ y.T
+
+
+def _logdet(a, cache=None):
+    """Calculate the log of the absolute determinant of a square matrix
+
+    :param a: Real or Dual square matrix
+    :param cache: dictionary keeping the factorization for the vjp
+    :return: Corresponding input type
+    """
+    _dense_only('logdet', a)
+    a, da = _parts(a)
+    lu = _lu(a)
+    res = np.sum(np.log(np.abs(np.diag(lu[0])))) if _sla is not None else np.linalg.slogdet(lu)[1]
+    if cache is not None:
+        cache['lu'] = lu
+    if np.ndim(da) == 0:
+        return res
+    return Dual(res, np.trace(_lu_solve(lu, da)))
+
+
+def _logdet_vjp(g, cache):
+    """Vector-Jacobian product of the log determinant, reusing the factorization
+
+    :param g: adjoint of the log determinant
+    :param cache: dictionary filled by _logdet
+    :return: adjoint of the matrix
+    """
+    lu = cache['lu']
+    n = len(lu[0]) if _sla is not None else len(lu)
+    return g * _lu_solve(lu, np.eye(n), trans=1)
+
+
+def _cholesky(a, cache=None):
+    """Calculate the lower triangular Cholesky factor of a symmetric positive definite matrix
+
+    :param a: Real or Dual square matrix
+    :param cache: dictionary keeping the factor for the vjp
+    :return: Corresponding input type
+    """
+    _dense_only('cholesky', a)
+    a, da = _parts(a)
+    l = np.linalg.cholesky(a)
+    if cache is not None:
+        cache['l'] = l
+    if np.ndim(da) == 0:
+        return l
+    da = 0.5 * (da + np.swapaxes(da, -1, -2))
+    s = _tri_solve(l, _tri_solve(l, da).T).T
+    return _pack(l, l @ _phi(s))
+
+
+def _cholesky_vjp(g, cache):
+    """Vector-Jacobian product of the Cholesky factorization, reusing the factor
+
+    :param g: adjoint of the factor
+    :param cache: dictionary filled by _cholesky
+    :return: adjoint of the matrix, symmetrized
+    """
+    l = cache['l']
+    p = _phi(l.T @ np.tril(np.broadcast_to(g, l.shape)))
+    res = _tri_solve(l, _tri_solve(l, p.T, trans=1).T, trans=1)
+    return 0.5 * (res + res.T)
+
+
+def _trace(a):
+    """Calculate the trace of a square matrix
+
+    :param a: Real or Dual square matrix
+    :return: Corresponding input type
+    """
+    return np.trace(a)
+
+
+
+def _linear(f, g, x, *params, bilinear=False):
+    """Apply a map which is linear in g to Real or Dual numbers. The second input x is either a shape reference,
+    whose tangent is ignored, or the other factor of a bilinear map
+
+    :param f: function f(g, x, *params) of real arrays
+    :param g: Real or Dual number
+    :param x: Real or Dual number
+    :param params: constant parameters of f
+    :param bilinear: whether f is also linear in x
+    :return: Corresponding input type
+    """
+    (a, da), (b, db) = _parts(g), _parts(x)
+    res = f(a, b, *params)
+    bilinear = bilinear and isinstance(x, Dual)
+    if not isinstance(g, Dual) and not bilinear:
+        return res
+    dual = f(np.broadcast_to(da, np.shape(a)), b, *params)
+    if bilinear:
+        dual = dual + f(a, np.broadcast_to(db, np.shape(b)), *params)
+    return _pack(res, dual)
+
+
+def _ones_like(x):
+    """Ones of the shape of input, without derivative
+
+    :param x: Real or Dual Number
+    :return: Corresponding input type, of zero tangent
+    """
+    res = np.ones(np.shape(_parts(x)[0]))[()]
+    return _pack(res, 0) if isinstance(x, Dual) else res
+
+
+def _unbroadcast_grad(g, ref):
+    """Sum an adjoint over the axes its operand was broadcast along
+
+    :param g: Real or Dual adjoint
+    :param ref: Real or Dual operand, only its shape is used
+    :return: Corresponding input type
+    """
+    return _linear(lambda a, b: _unbroadcast(a, np.shape(b)), g, ref)
+
+
+def _broadcast_grad(g, ref):
+    """Broadcast an adjoint to the shape of its operand, the transpose of _unbroadcast_grad
+
+    :param g: Real or Dual adjoint
+    :param ref: Real or Dual operand, only its shape is used
+    :return: Corresponding input type
+    """
+    return _linear(lambda a, b: np.broadcast_to(a, np.shape(b)).copy(), g, ref)
+
+
+def _take_grad(g, x, index, shape):
+    """Adjoint of the flat input of a take, the adjoint scattered into zeros
+
+    :param g: Real or Dual adjoint of the selected part
+    :param x: Real or Dual flat input of the take, only its shape is used
+    :param index: int or slice
+    :param shape: shape of the selected part
+    :return: Corresponding input type
+    """
+    return _linear(_take_vjp, g, x, index, shape)
+
+
+def _trace_grad(g, x):
+    """Adjoint of the input of a trace, the adjoint times the identity matrix
+
+    :param g: Real or Dual adjoint of the trace
+    :param x: Real or Dual square matrix, only its shape is used
+    :return: Corresponding input type
+    """
+    return _linear(lambda a, b: a * np.eye(len(b)), g, x)
+
+
+def _sum_grad(g, x, axis=None):
+    """Adjoint of the input of a sum over an axis, the adjoint broadcast along the axis
+
+    :param g: Real or Dual adjoint of the sum
+    :param x: Real or Dual input of the sum, only its shape is used
+    :param axis: axis summed over
+    :return: Corresponding input type
+    """
+    return _linear(_sum_vjp, g, x, axis)
+
+
+def _mean_grad(g, x, axis=None):
+    """Adjoint of the input of a mean over an axis
+
+    :param g: Real or Dual adjoint of the mean
+    :param x: Real or Dual input of the mean, only its shape is used
+    :param axis: axis averaged over
+    :return: Corresponding input type
+    """
+    return _linear(_mean_vjp, g, x, axis)
+
+
+def _matmul_x(g, y):
+    """Adjoint of the left input x of a matrix product x @ y (1-D or 2-D), whose shape follows from the ones
+    of the adjoint and of y
+
+    :param g: adjoint of the product
+    :param y: right input of the product
+    :return: adjoint of x
+    """
+    if np.ndim(y) == 1:
+        return g * y if np.ndim(g) == 0 else np.outer(g, y)
+    return y @ g if np.ndim(g) == 1 else g @ np.swapaxes(y, -1, -2)
+
+
+def _matmul_y(g, x):
+    """Adjoint of the right input y of a matrix product x @ y (1-D or 2-D)
+
+    :param g: adjoint of the product
+    :param x: left input of the product
+    :return: adjoint of y
+    """
+    if np.ndim(x) == 1:
+        return g * x if np.ndim(g) == 0 else np.outer(x, g)
+    return np.swapaxes(x, -1, -2) @ g
+
+
+def _matmul_x_grad(g, y):
+    """Adjoint of the left input of a matrix product, as an operator
+
+    :param g: Real or Dual adjoint of the product
+    :param y: Real or Dual right input
+    :return: Corresponding input type
+    """
+    return _linear(_matmul_x, g, y, bilinear=True)
+
+
+def _matmul_y_grad(g, x):
+    """Adjoint of the right input of a matrix product, as an operator
+
+    :param g: Real or Dual adjoint of the product
+    :param x: Real or Dual left input
+    :return: Corresponding input type
+    """
+    return _linear(_matmul_y, g, x, bilinear=True)
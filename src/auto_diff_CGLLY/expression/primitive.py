@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : primitive.py
+# Description: static registry of the primitive operations of the computational graph
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from . import ops
+
+"""
+This module defines every primitive operation of the computational graph once: its value function and the
+partial derivative functions with respect to each of its operands. Graph nodes only keep a reference to their
+primitive and the constant parameters of the operation, instead of building new closures for every node.
+
+The value function is called as f(*operands, *params). The partial derivative functions are called the same way
+and return either a local derivative, multiplied elementwise with the adjoint in reverse mode, or a
+vector-Jacobian product function of the adjoint. Primitives whose partial derivatives share work give instead one
+vjp function, called the same way, returning a function of the adjoint which gives the adjoints of all the
+operands at once.
+"""
+
+
+class Primitive:
+    """A primitive operation of the computational graph.
+    """
+    __slots__ = ('name', 'f', 'partials', 'elementwise', 'vjp', 'cache')
+
+    def __init__(self, name, f, partials, elementwise=False, vjp=None, cache=None):
+        """Initialize the primitive
+
+        :param name: primitive name
+        :param f: value function
+        :param partials: tuple of partial derivative functions, one for each operand
+        :param elementwise: whether each output element only depends on the same element of the operands
+        :param vjp: joint vector-Jacobian product function of all the operands, used instead of the partials
+        :param cache: position of the Cache among the parameters of the nodes, for the primitives which keep
+                      intermediate results, else None
+        """
+        self.name = name
+        self.f = f
+        self.partials = tuple(partials)
+        self.elementwise = elementwise
+        self.vjp = vjp
+        self.cache = cache
+
+    def __repr__(self):
+        return f"Primitive {self.name}"
+
+
+PRIMITIVES = {}
+
+
+def _sigmoid_grad(s):
+    """Derivative of the sigmoid from its value, evaluated once
+
+    :param s: sigmoid of the input
+    :return: s (1 - s)
+    """
+    return s * (1 - s)
+
+
+def register(name, f, partials, elementwise=False, vjp=None, cache=None):
+    """Register a primitive operation
+
+    :param name: primitive name
+    :param f: value function
+    :param partials: tuple of partial derivative functions, one for each operand
+    :param elementwise: whether each output element only depends on the same element of the operands
+    :param vjp: joint vector-Jacobian product function of all the operands, used instead of the partials
+    :param cache: position of the Cache among the parameters, for the primitives which keep intermediate results
+    :return: Primitive
+    """
+    PRIMITIVES[name] = Primitive(name, f, partials, elementwise, vjp, cache)
+    return PRIMITIVES[name]
+
+
+# arithmetic, the suffix _c marks a constant right operand and the prefix r a constant left operand
+register('add', lambda x, y: x + y, (lambda x, y: 1, lambda x, y: 1), elementwise=True)
+register('add_c', lambda x, c: x + c, (lambda x, c: 1,), elementwise=True)
+register('sub', lambda x, y: x - y, (lambda x, y: 1, lambda x, y: -1), elementwise=True)
+register('sub_c', lambda x, c: x - c, (lambda x, c: 1,), elementwise=True)
+register('rsub_c', lambda x, c: c - x, (lambda x, c: -1,), elementwise=True)
+register('mul', lambda x, y: x * y, (lambda x, y: y, lambda x, y: x), elementwise=True)
+register('mul_c', lambda x, c: x * c, (lambda x, c: c,), elementwise=True)
+register('div', lambda x, y: x / y, (lambda x, y: 1 / y, lambda x, y: -x / y ** 2), elementwise=True)
+register('div_c', lambda x, c: x / c, (lambda x, c: 1 / c,), elementwise=True)
+register('rdiv_c', lambda x, c: c / x, (lambda x, c: -c / x ** 2,), elementwise=True)
+register('pow', lambda x, y: x ** y, (lambda x, y: y * x ** (y - 1), lambda x, y: x ** y * np.log(x)), elementwise=True)
+register('pow_c', lambda x, c: x ** c, (lambda x, c: c * x ** (c - 1),), elementwise=True)
+register('rpow_c', lambda x, c: c ** x, (lambda x, c: c ** x * np.log(c),), elementwise=True)
+register('neg', lambda x: -x, (lambda x: -1,), elementwise=True)
+
+# elementary functions
+register('sin', ops._sin, (lambda x: np.cos(x),), elementwise=True)
+register('cos', ops._cos, (lambda x: -np.sin(x),), elementwise=True)
+register('tan', ops._tan, (lambda x: 1 / np.cos(x) ** 2,), elementwise=True)
+register('arcsin', ops._arcsin, (lambda x: 1 / (1 - x * x) ** 0.5,), elementwise=True)
+register('arccos', ops._arccos, (lambda x: -1 / (1 - x * x) ** 0.5,), elementwise=True)
+register('arctan', ops._arctan, (lambda x: 1 / (1 + x * x),), elementwise=True)
+register('sinh', ops._sinh, (lambda x: np.cosh(x),), elementwise=True)
+register('cosh', ops._cosh, (lambda x: np.sinh(x),), elementwise=True)
+register('tanh', ops._tanh, (lambda x: 1 - np.tanh(x) ** 2,), elementwise=True)
+register('sigmoid', ops._sigmoid, (lambda x: _sigmoid_grad(ops._sigmoid(x)),), elementwise=True)
+register('exp', ops._exp, (lambda x: np.exp(x),), elementwise=True)
+register('log', ops._log, (lambda x: 1 / x,), elementwise=True)
+register('log_base', ops._log_base, (lambda x, base: 1 / (x * np.log(base)),), elementwise=True)
+register('sqrt', ops._sqrt, (lambda x: 0.5 * x ** -0.5,), elementwise=True)
+
+# overflow-safe fused functions, the last parameter is a dictionary keeping the intermediate results of the value
+# which are reused by the derivative: exp(-|x|) for softplus and log_sigmoid, the softmax for logsumexp and softmax
+register('log1p', ops._log1p, (lambda x: 1 / (1 + x),), elementwise=True)
+register('expm1', ops._expm1, (lambda x: np.exp(x),), elementwise=True)
+register('softplus', ops._softplus, (lambda x, cache: ops._sigmoid_from(x, cache['e']),), elementwise=True,
+         cache=-1)
+register('log_sigmoid', ops._log_sigmoid, (lambda x, cache: ops._sigmoid_from(-x, cache['e']),),
+         elementwise=True, cache=-1)
+register('logsumexp', ops._logsumexp, (lambda x, axis, cache: (lambda g: ops._logsumexp_vjp(g, cache, axis)),),
+         cache=-1)
+register('softmax', ops._softmax, (lambda x, axis, cache: (lambda g: ops._softmax_vjp(g, cache, axis)),),
+         cache=-1)
+
+# piecewise functions, the derivatives are computed with masks in one pass and take defined subgradients at the
+# kinks: abs and relu have derivative 0 at 0, maximum and minimum split the adjoint evenly at ties, and clip has
+# derivative 1 on the closed interval. The suffix _e marks a condition given by an expression, without derivative
+register('where', lambda x, y, cond: ops._where(cond, x, y),
+         (lambda x, y, cond: ops._mask(cond), lambda x, y, cond: 1 - ops._mask(cond)), elementwise=True)
+register('where_c', lambda x, cond, c: ops._where(cond, x, c), (lambda x, cond, c: ops._mask(cond),),
+         elementwise=True)
+register('rwhere_c', lambda y, cond, c: ops._where(cond, c, y), (lambda y, cond, c: 1 - ops._mask(cond),),
+         elementwise=True)
+register('where_e', lambda cond, x, c: ops._where(cond, x, c),
+         (lambda cond, x, c: 0., lambda cond, x, c: ops._mask(cond)), elementwise=True)
+register('rwhere_e', lambda cond, y, c: ops._where(cond, c, y),
+         (lambda cond, y, c: 0., lambda cond, y, c: 1 - ops._mask(cond)), elementwise=True)
+register('abs', ops._abs, (lambda x: np.sign(x),), elementwise=True)
+register('maximum', ops._maximum, (lambda x, y: ops._select_weight(x, y), lambda x, y: 1 - ops._select_weight(x, y)),
+         elementwise=True)
+register('maximum_c', ops._maximum, (lambda x, c: ops._select_weight(x, c),), elementwise=True)
+register('minimum', ops._minimum, (lambda x, y: ops._select_weight(x, y, greater=False),
+                                   lambda x, y: 1 - ops._select_weight(x, y, greater=False)), elementwise=True)
+register('minimum_c', ops._minimum, (lambda x, c: ops._select_weight(x, c, greater=False),), elementwise=True)
+register('clip', ops._clip, (ops._clip_grad,), elementwise=True)
+register('relu', ops._relu, (lambda x: np.where(x > 0, 1., 0.),), elementwise=True)
+
+# reductions and contractions
+register('take', ops._take, (lambda x, index, shape: (lambda g: ops._take_vjp(g, x, index, shape)),))
+register('sum', ops._sum, (lambda x, axis: (lambda g: ops._sum_vjp(g, x, axis)),))
+register('mean', ops._mean, (lambda x, axis: (lambda g: ops._mean_vjp(g, x, axis)),))
+register('norm', ops._norm, (lambda x: (lambda g: ops._norm_vjp(g, x, np.linalg.norm(x))),))
+register('matmul', ops._matmul, (lambda x, y: (lambda g: ops._matmul_vjp(g, x, y)[0]),
+                                 lambda x, y: (lambda g: ops._matmul_vjp(g, x, y)[1])))
+register('matmul_c', ops._matmul, (lambda x, c: (lambda g: ops._matmul_vjp(g, x, c)[0]),))
+register('rmatmul_c', lambda x, c: ops._matmul(c, x), (lambda x, c: (lambda g: ops._matmul_vjp(g, c, x)[1]),))
+
+# linear algebra, the last parameter is a Cache keeping the factorization of the node. The adjoints of both
+# operands of solve come from one solve with the transposed factorization
+register('solve', ops._solve, (), vjp=lambda a, b, cache: (lambda g: ops._solve_vjp(g, cache)), cache=-1)
+register('solve_c', ops._solve, (), vjp=lambda a, c, cache: (lambda g: ops._solve_vjp(g, cache)[:1]), cache=-1)
+register('rsolve_c', lambda b, c, cache: ops._solve(c, b, cache), (),
+         vjp=lambda b, c, cache: (lambda g: ops._solve_vjp(g, cache, matrix=False)[1:]), cache=-1)
+register('inv', ops._inv, (lambda x, cache: (lambda g: ops._inv_vjp(g, cache)),), cache=-1)
+register('logdet', ops._logdet, (lambda x, cache: (lambda g: ops._logdet_vjp(g, cache)),), cache=-1)
+register('cholesky', ops._cholesky, (lambda x, cache: (lambda g: ops._cholesky_vjp(g, cache)),), cache=-1)
+register('trace', ops._trace, (lambda x: (lambda g: g * np.eye(len(x))),))
+
+# linear maps of the reverse mode, the building blocks of the derivative graphs, which are differentiable again.
+# The last operand is a shape reference without derivative, or the other factor of the matrix products
+register('ones_like', ops._ones_like, (lambda x: 0.,), elementwise=True)
+register('unbroadcast', ops._unbroadcast_grad, (lambda g, x: (lambda h: np.broadcast_to(h, np.shape(g))),
+                                                lambda g, x: 0.))
+register('broadcast', ops._broadcast_grad, (lambda g, x: (lambda h: ops._unbroadcast(h, np.shape(g))),
+                                            lambda g, x: 0.))
+register('take_grad', ops._take_grad, (lambda g, x, index, shape: (lambda h: ops._take(h, index, shape)),
+                                        lambda g, x, index, shape: 0.))
+register('trace_grad', ops._trace_grad, (lambda g, x: (lambda h: ops._trace(h)), lambda g, x: 0.))
+register('sum_grad', ops._sum_grad, (lambda g, x, axis: (lambda h: ops._sum(h, axis)), lambda g, x, axis: 0.))
+register('mean_grad', ops._mean_grad, (lambda g, x, axis: (lambda h: ops._mean(h, axis)), lambda g, x, axis: 0.))
+register('matmul_x_grad', ops._matmul_x_grad, (lambda g, y: (lambda h: ops._matmul(h, y)),
+                                               lambda g, y: (lambda h: ops._matmul_y(g, h))))
+register('matmul_y_grad', ops._matmul_y_grad, (lambda g, x: (lambda h: ops._matmul(x, h)),
+                                               lambda g, x: (lambda h: ops._matmul_x(g, h))))
+register('matmul_x_grad_c', lambda g, c: ops._matmul_x_grad(g, c), (lambda g, c: (lambda h: ops._matmul(h, c)),))
+register('matmul_y_grad_c', lambda g, c: ops._matmul_y_grad(g, c), (lambda g, c: (lambda h: ops._matmul(c, h)),))
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : scan.py
+# Description: loop primitive iterating one step subgraph
+# Copyright 2022 Harvard University. All Rights Reserved.
+import math
+
+import numpy as np
+
+from ..dual import Dual, DualVector
+from .expression import Expression, Function, Variable
+from .primitive import Primitive
+
+"""
+This module provides scan, a primitive for recurrences c[t + 1] = step(c[t], p) such as explicit time stepping or
+recurrent filters. The step is traced once into a small subgraph, and the whole loop is a single node of the outer
+graph, instead of one node per operation and per step. The subgraph is iterated on plain values, on Dual numbers
+in forward mode, so that the tangents are carried through the loop, and backwards in reverse mode.
+
+The reverse pass needs the state at every step. The forward pass stores a checkpoint every `checkpoint` steps,
+and the backward pass recomputes the states between two checkpoints from the earlier one. The memory is then the
+step subgraph plus n_steps / checkpoint + checkpoint states.
+"""
+
+_CARRY, _PARAM = '_carry', '_param'
+
+
+class Scan:
+    """A loop of n_steps iterations of one traced step subgraph, used as the primitive of a Function.
+    """
+    def __init__(self, step_fn, n_steps, has_param=False, checkpoint=None, trajectory=False):
+        """Trace the step and initialize the loop
+
+        :param step_fn: Python function step_fn(carry) or step_fn(carry, param) returning the next carry, built
+                        from Expression operations on its arguments
+        :param n_steps: number of iterations
+        :param has_param: whether the step takes a parameter
+        :param checkpoint: number of steps between two stored states of the reverse mode, sqrt(n_steps) by default
+        :param trajectory: whether the loop returns the stacked states c[0], ..., c[n_steps] instead of the last one
+        """
+        args = [Variable(_CARRY, mode='r')] + ([Variable(_PARAM, mode='r')] if has_param else [])
+        step = step_fn(*args)
+        if not isinstance(step, Expression):
+            raise TypeError(f"The step should return an Expression, found {type(step)}")
+        if not step.varname <= {_CARRY, _PARAM}:
+            raise ValueError(f"The step should only depend on its arguments, found variables "
+                             f"{sorted(step.varname - {_CARRY, _PARAM})}. Pass them as the parameter.")
+        self.step = step
+        self.n_steps = n_steps
+        self.has_param = has_param
+        self.checkpoint = checkpoint or max(1, math.isqrt(n_steps))
+        self.trajectory = trajectory
+        self.tape = None
+
+    def _inputs(self, carry, param):
+        """Input dictionary of the step
+
+        :param carry: state
+        :param param: parameter, or None
+        :return: dictionary
+        """
+        return {_CARRY: carry, _PARAM: param} if self.has_param else {_CARRY: carry}
+
+    def run(self, carry, param=None):
+        """Value function of the loop. On plain values, the checkpoints of the reverse mode are recorded.
+
+        :param carry: initial state, number, np.array, Dual or DualVector
+        :param param: parameter, same types, or None
+        :return: last state or trajectory
+        """
+        if isinstance(carry, Dual):
+            return self._run_dual(carry, param)
+
+        tape = {0: carry}
+        states = [carry] if self.trajectory else None
+        inputs = self._inputs(carry, param)
+        for t in range(1, self.n_steps + 1):
+            inputs[_CARRY] = self.step.value(inputs)
+            if states is not None:
+                states.append(inputs[_CARRY])
+            elif t % self.checkpoint == 0:
+                tape[t] = inputs[_CARRY]
+        self.tape = (carry, param, states if states is not None else tape)
+        return np.stack(states) if states is not None else inputs[_CARRY]
+
+    def _run_dual(self, carry, param):
+        """Iterate the step in forward mode, carrying the tangents through the loop
+
+        :param carry: initial state, Dual or DualVector
+        :param param: parameter, Dual, DualVector or None
+        :return: Dual or DualVector
+        """
+        inputs, seed = self._inputs(carry.real, None), self._inputs(carry.dual, None)
+        if param is not None:
+            inputs[_PARAM], seed[_PARAM] = param.real, param.dual
+        states = [carry] if self.trajectory else None
+        for t in range(self.n_steps):
+            res = self.step.forward(inputs, seed)
+            self.step.clear()
+            if states is not None:
+                states.append(res)
+            inputs[_CARRY], seed[_CARRY] = res.real, res.dual
+        if states is None:
+            return res if self.n_steps else carry
+        return DualVector(np.stack([np.broadcast_to(s.real, np.shape(carry.real)) for s in states]),
+                          np.stack([np.broadcast_to(s.dual, np.shape(carry.real)) for s in states]))
+
+    def _states(self, carry, param):
+        """States of the loop, from the recorded checkpoints when they belong to this input
+
+        :param carry: initial state
+        :param param: parameter, or None
+        :return: list of all the states, or dictionary of step and checkpointed state
+        """
+        if self.tape is None or self.tape[0] is not carry or self.tape[1] is not param:
+            self.run(carry, param)
+        states = self.tape[2]
+        self.tape = None
+        return states
+
+    def _segment(self, tape, start, stop, param):
+        """Recompute the states of the steps start, ..., stop - 1 from the checkpoint at start
+
+        :param tape: dictionary of step and checkpointed state
+        :param start: checkpointed step
+        :param stop: end of the segment
+        :param param: parameter, or None
+        :return: list of states
+        """
+        inputs = self._inputs(tape[start], param)
+        states = [inputs[_CARRY]]
+        for t in range(start + 1, stop):
+            inputs[_CARRY] = self.step.value(inputs)
+            states.append(inputs[_CARRY])
+        return states
+
+    def vjp(self, adjoint, carry, param=None):
+        """Vector-Jacobian products of the loop with respect to the initial state and the parameter
+
+        :param adjoint: adjoint of the last state or of the trajectory
+        :param carry: initial state
+        :param param: parameter, or None
+        :return: adjoints of the initial state and of the parameter
+        """
+        states = self._states(carry, param)
+        shape = np.shape(carry)
+        g = adjoint[-1] if self.trajectory else adjoint
+        g_param = np.zeros(np.shape(param)) if self.has_param else None
+        inputs = self._inputs(None, param)
+        stop = self.n_steps
+        while stop > 0:
+            start = ((stop - 1) // self.checkpoint) * self.checkpoint
+            segment = states[start:stop] if type(states) == list else self._segment(states, start, stop, param)
+            for t in range(stop - 1, start - 1, -1):
+                inputs[_CARRY] = segment[t - start]
+                out = self.step.propagate(inputs)
+                grad = self.step.backward(adjoint=g if np.shape(g) == np.shape(out) else
+                                          np.broadcast_to(g, np.shape(out)))
+                self.step.clear()
+                g = grad.get(_CARRY, 0)
+                if np.shape(g) != shape:
+                    g = np.broadcast_to(g, shape)
+                if self.trajectory:
+                    g = g + adjoint[t]
+                if g_param is not None and _PARAM in grad:
+                    g_param += grad[_PARAM]
+            stop = start
+
+        return g if shape else float(g), g_param if g_param is None or np.shape(param) else float(g_param)
+
+
+def scan(step_fn, init, n_steps, param=None, checkpoint=None, trajectory=False):
+    """Create a Function object iterating c[t + 1] = step_fn(c[t], param) from c[0] = init, as one node of the
+    graph. The step is traced once with Variable placeholders.
+
+    :param step_fn: Python function step_fn(carry) or step_fn(carry, param) returning the next carry, built
+                    from Expression operations on its arguments only. The carry keeps the shape of init
+    :param init: Expression of the initial state
+    :param n_steps: number of iterations
+    :param param: Expression of a parameter of the step, e.g. a vector of coefficients, or None
+    :param checkpoint: number of steps between two states stored for the reverse mode, sqrt(n_steps) by default.
+                       1 stores every state, larger values recompute the states between two checkpoints
+    :param trajectory: return the stacked states c[0], ..., c[n_steps] instead of the last state
+    :return: Function
+    """
+    assert isinstance(init, Expression) and (param is None or isinstance(param, Expression))
+    loop = Scan(step_fn, n_steps, param is not None, checkpoint, trajectory)
+    # one backward loop gives the adjoints of both the initial state and the parameter
+    if param is None:
+        op = Primitive('scan', loop.run, (), vjp=lambda c: lambda g: loop.vjp(g, c)[:1])
+    else:
+        op = Primitive('scan', loop.run, (), vjp=lambda c, p: lambda g: loop.vjp(g, c, p))
+    return Function(init, param, mode=init.mode, op=op)
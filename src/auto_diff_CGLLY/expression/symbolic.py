@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : symbolic.py
+# Description: derivative graphs built from the primitive operations
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from ..dual import Dual
+from ..dual.dual import _parts, _pack
+from .expression import Expression, Function, Variable
+from .primitive import Primitive, PRIMITIVES as _P
+
+"""
+This module differentiates an Expression into new Expressions. The reverse mode is run once on the graph itself
+instead of on numbers: the adjoint of every node is an Expression built from the primitive operations, starting
+from ones of the shape of the output, and the adjoints of the variables are the derivative graphs. They share the
+nodes of the original graph, so that each intermediate value is computed once, and can be evaluated in any mode
+and differentiated again for higher orders.
+
+Each primitive has a rule rule(g, f) giving the adjoint Expressions of the operands of the Function f from the
+adjoint Expression g of its output, or None for operands without derivative. The adjoints of broadcast operands
+are summed back to their shape by an unbroadcast node, and the linear maps of the reverse mode which are not
+primitives of the forward computation (broadcast, sum_grad, matmul_x_grad, ...) are primitives with rules too, so
+that the set of rules is closed under differentiation, e.g. the adjoint of a take is a scatter take_grad whose
+adjoint is a take again. The local derivatives of the piecewise functions are masks, primitives whose derivative
+is 0.
+
+The primitives without rules are the linear algebra ones (solve, inv, logdet, cholesky), scan, the custom
+primitives and Functions of plain functions: gradient_graph raises NotImplementedError for graphs containing
+them, which are differentiated by the forward and reverse modes instead.
+"""
+
+
+def _op(name, *operands, params=()):
+    """Create a Function object of a registered primitive, in the mode of the first operand
+
+    :param name: primitive name
+    :param operands: one or two Expressions
+    :param params: constant parameters of the primitive
+    :return: Function
+    """
+    return Function(*operands, mode=operands[0].mode, op=_P[name], params=params)
+
+
+def _unbroadcast(g, x):
+    """Sum an adjoint Expression back to the shape of its operand
+
+    :param g: adjoint Expression
+    :param x: operand Expression
+    :return: Function
+    """
+    return _op('unbroadcast', g, x)
+
+
+_MASKS = {}
+
+
+def _mask(f, i):
+    """Local derivative of a piecewise function with respect to its i-th operand, e.g. sign(x) for abs, as a
+    Function whose derivative is 0
+
+    :param f: Function of a piecewise primitive
+    :param i: operand index
+    :return: Function
+    """
+    key = (f.op.name, i)
+    if key not in _MASKS:
+        n, partial = len(f.op.partials), f.op.partials[i]
+
+        def mask(*args):
+            res = partial(*[_parts(a)[0] for a in args[:n]], *args[n:])
+            return _pack(res, 0) if any(isinstance(a, Dual) for a in args[:n]) else res
+        _MASKS[key] = Primitive(f"{f.op.name}_d{i}", mask, (lambda *args: 0.,) * n, elementwise=True)
+    operands = (f.e1,) if f.e2 is None else (f.e1, f.e2)
+    return Function(*operands, mode=f.mode, op=_MASKS[key], params=f.params)
+
+
+def _piecewise(g, f):
+    """Adjoints of the operands of a piecewise function, the adjoint masked by the local derivatives
+
+    :param g: adjoint Expression of the output
+    :param f: Function
+    :return: tuple of adjoint Expressions
+    """
+    operands = (f.e1,) if f.e2 is None else (f.e1, f.e2)
+    return tuple(_unbroadcast(g * _mask(f, i), x) for i, x in enumerate(operands))
+
+
+_RULES = {
+    # arithmetic
+    'add': lambda g, f: (_unbroadcast(g, f.e1), _unbroadcast(g, f.e2)),
+    'add_c': lambda g, f: (_unbroadcast(g, f.e1),),
+    'sub': lambda g, f: (_unbroadcast(g, f.e1), _unbroadcast(-g, f.e2)),
+    'sub_c': lambda g, f: (_unbroadcast(g, f.e1),),
+    'rsub_c': lambda g, f: (_unbroadcast(-g, f.e1),),
+    'mul': lambda g, f: (_unbroadcast(g * f.e2, f.e1), _unbroadcast(g * f.e1, f.e2)),
+    'mul_c': lambda g, f: (_unbroadcast(g * f.params[0], f.e1),),
+    'div': lambda g, f: (_unbroadcast(g / f.e2, f.e1), _unbroadcast(-(g * f) / f.e2, f.e2)),
+    'div_c': lambda g, f: (_unbroadcast(g / f.params[0], f.e1),),
+    'rdiv_c': lambda g, f: (_unbroadcast(-(g * f) / f.e1, f.e1),),
+    'pow': lambda g, f: (_unbroadcast(g * f.e2 * f.e1 ** (f.e2 - 1), f.e1),
+                         _unbroadcast(g * f * Expression.log(f.e1), f.e2)),
+    'pow_c': lambda g, f: (_unbroadcast(g * (f.params[0] * f.e1 ** (f.params[0] - 1)), f.e1),),
+    'rpow_c': lambda g, f: (_unbroadcast(g * f * np.log(f.params[0]), f.e1),),
+    'neg': lambda g, f: (-g,),
+
+    # elementary functions, reusing the output f where the derivative is a function of it
+    'sin': lambda g, f: (g * Expression.cos(f.e1),),
+    'cos': lambda g, f: (-(g * Expression.sin(f.e1)),),
+    'tan': lambda g, f: (g / Expression.cos(f.e1) ** 2,),
+    'arcsin': lambda g, f: (g * (1 - f.e1 * f.e1) ** -0.5,),
+    'arccos': lambda g, f: (-(g * (1 - f.e1 * f.e1) ** -0.5),),
+    'arctan': lambda g, f: (g / (1 + f.e1 * f.e1),),
+    'sinh': lambda g, f: (g * Expression.cosh(f.e1),),
+    'cosh': lambda g, f: (g * Expression.sinh(f.e1),),
+    'tanh': lambda g, f: (g * (1 - f * f),),
+    'sigmoid': lambda g, f: (g * (f * (1 - f)),),
+    'exp': lambda g, f: (g * f,),
+    'log': lambda g, f: (g / f.e1,),
+    'log_base': lambda g, f: (g / (f.e1 * np.log(f.params[0])),),
+    'sqrt': lambda g, f: (0.5 * g / f,),
+    'log1p': lambda g, f: (g / (1 + f.e1),),
+    'expm1': lambda g, f: (g * (f + 1),),
+    'softplus': lambda g, f: (g * Expression.sigmoid(f.e1),),
+    'log_sigmoid': lambda g, f: (g * Expression.sigmoid(-f.e1),),
+
+    # piecewise functions
+    'abs': _piecewise,
+    'relu': _piecewise,
+    'maximum': _piecewise,
+    'maximum_c': _piecewise,
+    'minimum': _piecewise,
+    'minimum_c': _piecewise,
+    'clip': _piecewise,
+    'where': lambda g, f: (_unbroadcast(Expression.where(f.params[0], g, 0.), f.e1),
+                           _unbroadcast(Expression.where(f.params[0], 0., g), f.e2)),
+    'where_c': lambda g, f: (_unbroadcast(Expression.where(f.params[0], g, 0.), f.e1),),
+    'rwhere_c': lambda g, f: (_unbroadcast(Expression.where(f.params[0], 0., g), f.e1),),
+    'where_e': lambda g, f: (None, _unbroadcast(Expression.where(f.e1, g, 0.), f.e2)),
+    'rwhere_e': lambda g, f: (None, _unbroadcast(Expression.where(f.e1, 0., g), f.e2)),
+
+    # reductions and contractions
+    'take': lambda g, f: (_op('take_grad', g, f.e1, params=f.params),),
+    'trace': lambda g, f: (_op('trace_grad', g, f.e1),),
+    'sum': lambda g, f: (_op('sum_grad', g, f.e1, params=f.params),),
+    'mean': lambda g, f: (_op('mean_grad', g, f.e1, params=f.params),),
+    'norm': lambda g, f: (Expression.where(f, g * f.e1 / f, 0.),),
+    'logsumexp': lambda g, f: (_op('sum_grad', g, f.e1, params=f.params[:1]) *
+                               Expression.softmax(f.e1, f.params[0]),),
+    'softmax': lambda g, f: (f * (g - _op('sum_grad', Expression.sum(g * f, f.params[0]), f.e1,
+                                          params=f.params[:1])),),
+    'matmul': lambda g, f: (_op('matmul_x_grad', g, f.e2), _op('matmul_y_grad', g, f.e1)),
+    'matmul_c': lambda g, f: (_op('matmul_x_grad_c', g, params=f.params),),
+    'rmatmul_c': lambda g, f: (_op('matmul_y_grad_c', g, params=f.params),),
+
+    # linear maps of the derivative graphs
+    'ones_like': lambda g, f: (None,),
+    'unbroadcast': lambda g, f: (_op('broadcast', g, f.e1), None),
+    'broadcast': lambda g, f: (_op('unbroadcast', g, f.e1), None),
+    'take_grad': lambda g, f: (_op('take', g, params=f.params), None),
+    'trace_grad': lambda g, f: (Expression.trace(g), None),
+    'sum_grad': lambda g, f: (Expression.sum(g, f.params[0]), None),
+    'mean_grad': lambda g, f: (Expression.mean(g, f.params[0]), None),
+    'matmul_x_grad': lambda g, f: (Expression.matmul(g, f.e2), _op('matmul_y_grad', f.e1, g)),
+    'matmul_y_grad': lambda g, f: (Expression.matmul(f.e2, g), _op('matmul_x_grad', f.e1, g)),
+    'matmul_x_grad_c': lambda g, f: (Expression.matmul(g, f.params[0]),),
+    'matmul_y_grad_c': lambda g, f: (Expression.matmul(f.params[0], g),),
+}
+
+
+def _rule(op):
+    """Derivative rule of a primitive. The masks have no derivative, and the custom primitives have no rule even
+    when they share the name of a builtin primitive
+
+    :param op: Primitive, or None for a Function of a plain function
+    :return: rule function, or None
+    """
+    if op is None:
+        return None
+    if op in _MASKS.values():
+        return lambda g, f: (None, None)
+    return _RULES.get(op.name) if _P.get(op.name) is op else None
+
+
+def _postorder(f):
+    """Sub-expressions of a graph, each one after all the sub-expressions it depends on
+
+    :param f: Expression
+    :return: list of Expressions, without duplicates
+    """
+    order, stack, seen = [], [(f, False)], set()
+    while stack:
+        e, expanded = stack.pop()
+        if expanded:
+            order.append(e)
+            continue
+        if id(e) in seen:
+            continue
+        seen.add(id(e))
+        stack.append((e, True))
+        if isinstance(e, Function):
+            if e.e2 is not None:
+                stack.append((e.e2, False))
+            stack.append((e.e1, False))
+    return order
+
+
+def gradient_graph(f):
+    """Build the derivative graphs of an expression with respect to all its variables. They are the gradients of
+    the sum of the elements of the expression, i.e. the gradient of a scalar expression and the elementwise
+    derivative of an elementwise one
+
+    :param f: Expression
+    :return: dictionary of variable name and Expression, of the shape of the variable
+    :raises NotImplementedError: for a primitive without derivative rule
+    """
+    adjoints = {id(f): _op('ones_like', f)}
+    grads, variables = {}, {}
+    for e in reversed(_postorder(f)):
+        if isinstance(e, Variable):
+            variables.setdefault(e.name, e)
+        g = adjoints.pop(id(e), None)
+        if g is None:
+            continue
+        if isinstance(e, Variable):
+            grads[e.name] = grads[e.name] + g if e.name in grads else g
+            continue
+        rule = _rule(e.op)
+        if rule is None:
+            raise NotImplementedError(f"No derivative rule for the primitive "
+                                      f"{e.op.name if e.op is not None else e.f}.")
+        for x, a in zip((e.e1, e.e2), rule(g, e)):
+            if a is not None:
+                adjoints[id(x)] = adjoints[id(x)] + a if id(x) in adjoints else a
+    for name, v in variables.items():
+        if name not in grads:
+            grads[name] = _op('ones_like', v) * 0.
+    return grads
+
+
+def diff(f, name):
+    """Build the derivative graph of an expression with respect to one variable
+
+    :param f: Expression
+    :param name: variable name
+    :return: Expression
+    :raises ValueError: when the expression does not depend on the variable
+    """
+    if name not in f.varname:
+        raise ValueError(f"The expression does not depend on the variable {name}.")
+    return gradient_graph(f)[name]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : transform.py
+# Description: function transforms tracing Python callables into expressions
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from .expression import Expression, Variable
+
+"""
+This module provides the function transforms grad, value_and_grad and jacobian. The transformed Python function
+is called once with Variable placeholders to trace its Expression graph, and the graph is cached by the shapes and
+dtypes of the arguments. Later calls with the same signature replay the cached graph on the new values.
+
+The traced function has to be built from Expression operations (operators, Expression.sin, Expression.sum, ...).
+Python control flow and constants captured by the function are evaluated once, when the graph is traced.
+"""
+
+
+def _signature(args):
+    """Cache key of the arguments: their shapes and dtypes
+
+    :param args: tuple of int, float, list or np.array
+    :return: tuple
+    """
+    return tuple((np.shape(a), np.result_type(a).str) for a in args)
+
+
+def _as_input(a):
+    """Convert an argument to a Variable input
+
+    :param a: int, float, list or np.array
+    :return: float or np.array
+    """
+    return float(a) if np.ndim(a) == 0 else np.asarray(a)
+
+
+class Transform:
+    """Base class of the function transforms. Traces the function once per argument signature and keeps the
+    traced graphs in a cache.
+    """
+    def __init__(self, fn, argnums=0):
+        """Initialize the transform
+
+        :param fn: Python function of one or more arguments, returning an Expression
+        :param argnums: int or tuple of int, arguments to differentiate with respect to
+        """
+        self.fn = fn
+        self.argnums = argnums
+        self.cache = {}
+        self.__name__ = getattr(fn, '__name__', type(self).__name__)
+        self.__doc__ = getattr(fn, '__doc__', None)
+
+    def trace(self, args):
+        """Get the graph of the function for the signature of the arguments, tracing it on a cache miss
+
+        :param args: tuple of arguments
+        :return: tuple of the variable names and the output Expression
+        """
+        key = _signature(args)
+        if key not in self.cache:
+            names = [f'_arg{i}' for i in range(len(args))]
+            out = self.fn(*[Variable(name, mode='r') for name in names])
+            if not isinstance(out, Expression):
+                raise TypeError(f"Traced function should return an Expression, found {type(out)}")
+            self.cache[key] = (names, out)
+        return self.cache[key]
+
+    def _each(self, values):
+        """Select the results of the differentiated arguments
+
+        :param values: list of results, one for each argument
+        :return: one result for an int argnums, else a tuple
+        """
+        if isinstance(self.argnums, int):
+            return values[self.argnums]
+        return tuple(values[i] for i in self.argnums)
+
+
+class ValueAndGrad(Transform):
+    """Transform computing the value and the gradient of a function with a scalar output in reverse mode
+    """
+    def __call__(self, *args):
+        names, out = self.trace(args)
+        inputs = {k: _as_input(a) for k, a in zip(names, args)}
+
+        y = out.propagate(inputs)
+        if np.ndim(y) != 0:
+            out.clear()
+            raise ValueError(f"grad needs a scalar output, found shape {np.shape(y)}. Use jacobian instead.")
+        grad = out.backward()
+        out.clear()
+
+        return y, self._each([np.broadcast_to(grad[k], np.shape(inputs[k])).copy() if k in grad
+                              else np.zeros_like(inputs[k]) for k in names])
+
+
+class Grad(ValueAndGrad):
+    """Transform computing the gradient of a function with a scalar output in reverse mode
+    """
+    def __call__(self, *args):
+        return super().__call__(*args)[1]
+
+
+class Jacobian(Transform):
+    """Transform computing the Jacobian of a function in forward mode, of shape output shape + input shape.
+    Functions built from elementwise operations only need a single forward pass per argument.
+    """
+    def _jacobian(self, out, inputs, name):
+        """Jacobian of the output with respect to one variable
+
+        :param out: output Expression
+        :param inputs: input dictionary
+        :param name: variable name
+        :return: np.array
+        """
+        seed = {k: 0. if np.ndim(v) == 0 else np.zeros_like(v, dtype=float) for k, v in inputs.items()}
+        x = inputs[name]
+        if np.ndim(x) == 0:
+            seed[name] = 1.
+            res = out.forward(inputs, seed)
+            out.clear()
+            return np.broadcast_to(res.dual, np.shape(res.real)).copy()
+
+        if out.is_elementwise():
+            seed[name] = np.ones_like(x, dtype=float)
+            res = out.forward(inputs, seed)
+            out.clear()
+            if np.shape(res.real) == np.shape(x):
+                return np.diag(np.reshape(res.dual, -1)).reshape(np.shape(x) * 2)
+
+        cols = []
+        for i in range(np.size(x)):
+            seed[name] = np.zeros_like(x, dtype=float)
+            seed[name].flat[i] = 1.
+            res = out.forward(inputs, seed)
+            out.clear()
+            cols.append(np.broadcast_to(res.dual, np.shape(res.real)))
+        return np.stack(cols, axis=-1).reshape(np.shape(cols[0]) + np.shape(x))
+
+    def __call__(self, *args):
+        names, out = self.trace(args)
+        inputs = {k: _as_input(a) for k, a in zip(names, args)}
+        argnums = [self.argnums] if isinstance(self.argnums, int) else self.argnums
+        jac = [self._jacobian(out, inputs, names[i]) if i in argnums else None for i in range(len(names))]
+        return self._each(jac)
+
+
+def grad(fn, argnums=0):
+    """Transform a Python function with a scalar output into the function computing its gradient
+
+    :param fn: Python function of one or more arguments, returning an Expression
+    :param argnums: int or tuple of int, arguments to differentiate with respect to
+    :return: Grad
+    """
+    return Grad(fn, argnums)
+
+
+def value_and_grad(fn, argnums=0):
+    """Transform a Python function with a scalar output into the function computing its value and gradient
+
+    :param fn: Python function of one or more arguments, returning an Expression
+    :param argnums: int or tuple of int, arguments to differentiate with respect to
+    :return: ValueAndGrad
+    """
+    return ValueAndGrad(fn, argnums)
+
+
+def jacobian(fn, argnums=0):
+    """Transform a Python function into the function computing its Jacobian
+
+    :param fn: Python function of one or more arguments, returning an Expression
+    :param argnums: int or tuple of int, arguments to differentiate with respect to
+    :return: Jacobian
+    """
+    return Jacobian(fn, argnums)
@@ -0,0 +1,3 @@
+from .integrate import ODE, ODEResult, solve_ivp
+
+__all__ = ['ODE', 'ODEResult', 'solve_ivp']
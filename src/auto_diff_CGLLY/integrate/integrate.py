@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : integrate.py
+# Description: explicit Runge-Kutta integrators with forward sensitivities
+# Copyright 2022 Harvard University. All Rights Reserved.
+import time
+
+import numpy as np
+
+from ..optimize import Layout
+
+"""
+This module integrates ordinary differential equations dy/dt = f(t, y, p), given by an Expression or a Compose of
+the state variables, the parameter variables and optionally the time variable, together with the sensitivities
+S = dy/dp of the state with respect to the parameters. They follow the variational equation
+dS/dt = df/dy S + df/dp, with S = 0 at the initial time.
+
+The state and its sensitivities are stored as one matrix Z = [y | S] of one row per state element, and every
+Runge-Kutta stage combines whole matrices. The right-hand side of Z comes from a forward pass on Dual numbers
+whose dual parts are the columns of S. When the right-hand side is elementwise, the variables are broadcast along
+a leading axis of one entry per parameter, so that all the columns are computed in a single vectorized pass;
+otherwise one forward pass is run per parameter. Variables of fewer dimensions than the state get axes of length 1
+after the leading axis, so that it never lines up with an axis of the state.
+"""
+
+# Dormand-Prince 5(4) tableau
+_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+_B5 = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_B4 = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+class ODE:
+    """Evaluator of the right-hand side of the state and of its sensitivities.
+    """
+    def __init__(self, rhs, y0, params=None, time_var='t'):
+        """Initialize the evaluator
+
+        :param rhs: Expression or Compose or list of Expressions, the derivative of the state is the
+                    concatenation of their flattened values, in the order of y0
+        :param y0: dictionary of state variable name and initial value
+        :param params: dictionary of parameter name and value
+        :param time_var: name of the time variable the right-hand side may depend on
+        """
+        self.funcs = list(rhs) if isinstance(rhs, (list, tuple)) or hasattr(rhs, 'funcs') else [rhs]
+        self.state = Layout(y0)
+        self.params = Layout(params or {})
+        self.values = dict(params or {})
+        self.time_var = time_var
+        self.batched = self.params.size > 0 and all(f.is_elementwise() for f in self.funcs)
+        self.ndim = max([len(shape) for _, shape in self.state.layout.values()] +
+                        [len(shape) for _, shape in self.params.layout.values()])
+        self.nfev = 0
+
+    def _inputs(self, t, y):
+        """Input dictionary of the right-hand side
+
+        :param t: time
+        :param y: flat state
+        :return: dictionary
+        """
+        return {**self.values, **self.state.inputs(y), self.time_var: t}
+
+    def _lead(self, v):
+        """Insert axes of length 1 after the leading axis of a batched value, up to the number of dimensions of the
+        variables, so that the value broadcasts against the others as without the leading axis
+
+        :param v: array of one entry per parameter along the first axis
+        :return: np.array
+        """
+        shape = np.shape(v)
+        return np.reshape(v, shape[:1] + (1,) * (self.ndim + 1 - len(shape)) + shape[1:])
+
+    def _seed(self, inputs, z, j=None):
+        """Seed dictionary of the tangents, the columns of S for the state and unit vectors for the parameters
+
+        :param inputs: input dictionary
+        :param z: matrix [y | S]
+        :param j: parameter column, or None for all the columns broadcast along a leading axis
+        :return: dictionary
+        """
+        p = self.params.size
+        seed = {}
+        for k, (index, shape) in self.state.layout.items():
+            s = z[index, 1:] if j is None else z[index, 1 + j]
+            seed[k] = self._lead(s.T.reshape((p,) + shape)) if j is None else \
+                (float(s[0]) if shape == () else s.reshape(shape))
+        for k, (index, shape) in self.params.layout.items():
+            if j is None:
+                unit = np.zeros((p, index.stop - index.start))
+                unit[index, :] = np.eye(index.stop - index.start)
+                seed[k] = self._lead(unit.reshape((p,) + shape))
+            else:
+                unit = np.zeros(index.stop - index.start)
+                if index.start <= j < index.stop:
+                    unit[j - index.start] = 1.
+                seed[k] = float(unit[0]) if shape == () else unit.reshape(shape)
+        seed[self.time_var] = self._lead(np.zeros(p)) if j is None else 0.
+        return seed
+
+    def __call__(self, t, z):
+        """Evaluate the derivative of the state and of the sensitivities
+
+        :param t: time
+        :param z: matrix [y | S] of shape (size of the state, 1 + number of parameters)
+        :return: matrix of the same shape
+        """
+        self.nfev += 1
+        inputs = self._inputs(t, z[:, 0])
+        dz = np.empty_like(z)
+        if self.params.size == 0:
+            dz[:, 0] = np.concatenate([np.reshape(f.value(inputs), -1) for f in self.funcs])
+            return dz
+
+        if self.batched:
+            p = self.params.size
+            seed = self._seed(inputs, z)
+            inputs = {k: self._lead(np.broadcast_to(v, (p,) + np.shape(v))) for k, v in inputs.items()}
+            row = 0
+            for f in self.funcs:
+                res = f.forward(inputs, seed)
+                f.clear()
+                real = np.broadcast_to(res.real, np.shape(res.dual))
+                size = real[0].size
+                dz[row:row + size, 0] = np.reshape(real[0], -1)
+                dz[row:row + size, 1:] = np.reshape(res.dual, (p, size)).T
+                row += size
+        else:
+            for j in range(self.params.size):
+                seed = self._seed(inputs, z, j)
+                row = 0
+                for f in self.funcs:
+                    res = f.forward(inputs, seed)
+                    f.clear()
+                    real = np.reshape(res.real, -1)
+                    dz[row:row + real.size, 0] = real
+                    dz[row:row + real.size, 1 + j] = np.reshape(np.broadcast_to(res.dual, np.shape(res.real)), -1)
+                    row += real.size
+        return dz
+
+
+class ODEResult:
+    """Result of an integration.
+    """
+    def __init__(self, t, y, sens, state, params, nfev, nstep, success, message, elapsed):
+        """Initialize the result
+
+        :param t: times, or final time
+        :param y: states of shape (number of times, size of the state), or final state
+        :param sens: sensitivities of shape (number of times, size of the state, number of parameters), or final
+                     sensitivities
+        :param state: Layout of the state variables in the flat state
+        :param params: Layout of the parameters in the columns of the sensitivities
+        :param nfev: number of right-hand side evaluations
+        :param nstep: number of accepted steps
+        :param success: whether the final time was reached
+        :param message: reason of the termination
+        :param elapsed: run time in seconds
+        """
+        self.t = t
+        self.y = y
+        self.sens = sens
+        self.state = state
+        self.params = params
+        self.nfev = nfev
+        self.nstep = nstep
+        self.success = success
+        self.message = message
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return f"ODEResult: {self.message} after {self.nstep} steps and {self.nfev} evaluations"
+
+
+def _rk4(ode, t, z, h):
+    """One classical Runge-Kutta step
+
+    :param ode: ODE
+    :param t: time
+    :param z: matrix [y | S]
+    :param h: step size
+    :return: matrix at t + h
+    """
+    k1 = ode(t, z)
+    k2 = ode(t + h / 2, z + h / 2 * k1)
+    k3 = ode(t + h / 2, z + h / 2 * k2)
+    k4 = ode(t + h, z + h * k3)
+    return z + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def _dopri(ode, t, z, h, k1):
+    """One Dormand-Prince step
+
+    :param ode: ODE
+    :param t: time
+    :param z: matrix [y | S]
+    :param h: step size
+    :param k1: derivative at (t, z)
+    :return: matrix at t + h, error estimate of the state, and derivative at t + h
+    """
+    k = [k1]
+    for i in range(1, 7):
+        zi = z + h * sum(a * kj for a, kj in zip(_A[i], k) if a != 0)
+        k.append(ode(t + _C[i] * h, zi))
+    z_new = z + h * sum(b * kj for b, kj in zip(_B5, k) if b != 0)
+    err = h * sum((b5 - b4) * kj[:, 0] for b5, b4, kj in zip(_B5, _B4, k))
+    return z_new, err, k[6]
+
+
+def solve_ivp(rhs, y0, t_span, params=None, method='rk45', n_steps=100, rtol=1e-6, atol=1e-9, h0=None,
+              max_steps=100000, trajectory=True, time_var='t'):
+    """Integrate dy/dt = f(t, y, p) and the sensitivities dy/dp from t_span[0] to t_span[1]
+
+    :param rhs: Expression or Compose or list of Expressions of the state, parameter and time variables, the
+                derivative of the state is the concatenation of their flattened values, in the order of y0
+    :param y0: dictionary of state variable name and initial value
+    :param t_span: initial and final time
+    :param params: dictionary of parameter name and value, the sensitivities are computed with respect to them
+    :param method: 'rk4' for n_steps classical Runge-Kutta steps, 'rk45' for adaptive Dormand-Prince steps
+    :param n_steps: number of steps of rk4
+    :param rtol: relative tolerance of rk45 on the state
+    :param atol: absolute tolerance of rk45 on the state
+    :param h0: initial step size of rk45, 1 / 100 of the interval by default
+    :param max_steps: maximum number of steps of rk45
+    :param trajectory: keep the state and sensitivities at every step, else only the final ones, in constant
+                       memory
+    :param time_var: name of the time variable
+    :return: ODEResult
+    """
+    if method not in ('rk4', 'rk45'):
+        raise ValueError(f"Unknown method {method}, choose 'rk4' or 'rk45'.")
+    start = time.perf_counter()
+    ode = ODE(rhs, y0, params, time_var)
+    t0, t1 = map(float, t_span)
+    z = np.zeros((ode.state.size, 1 + ode.params.size))
+    z[:, 0] = ode.state.pack(y0)
+    ts, zs = [t0], [z]
+    success, message, nstep = True, 'final time reached', 0
+
+    def record(t, z):
+        if trajectory:
+            ts.append(t)
+            zs.append(z)
+        else:
+            ts[0], zs[0] = t, z
+
+    if method == 'rk4':
+        h = (t1 - t0) / n_steps
+        for i in range(n_steps):
+            z = _rk4(ode, t0 + i * h, z, h)
+            record(t0 + (i + 1) * h, z)
+        nstep = n_steps
+    else:
+        t, h = t0, h0 or (t1 - t0) / 100
+        k1 = ode(t, z)
+        while (t1 - t) * np.sign(h) > 1e-12 * abs(t1 - t0):
+            if nstep >= max_steps:
+                success, message = False, 'maximum number of steps reached'
+                break
+            h = np.sign(h) * min(abs(h), abs(t1 - t))
+            z_new, err, k7 = _dopri(ode, t, z, h, k1)
+            scale = atol + rtol * np.maximum(np.abs(z[:, 0]), np.abs(z_new[:, 0]))
+            norm = np.sqrt(np.mean((err / scale) ** 2))
+            if norm <= 1:
+                t, z, k1 = t + h, z_new, k7
+                nstep += 1
+                record(t, z)
+            h *= min(5., max(0.2, 0.9 * norm ** -0.2)) if norm > 0 else 5.
+
+    if trajectory:
+        zs = np.stack(zs)
+        t_out, y, sens = np.array(ts), zs[:, :, 0], zs[:, :, 1:]
+    else:
+        t_out, y, sens = ts[0], zs[0][:, 0], zs[0][:, 1:]
+    return ODEResult(t_out, y, sens, ode.state, ode.params, ode.nfev, nstep, success, message,
+                     time.perf_counter() - start)
@@ -0,0 +1,11 @@
+from .optimize import Layout, Objective, OptimizeResult, Optimizer, GradientDescent, Momentum, Adam, LBFGS, minimize
+from .nonlinear import System, solve_nonlinear
+from .least_squares import LeastSquares, least_squares
+from .adapter import ScipyAdapter
+from .stream import StreamingObjective, accumulate, prefetch
+from .per_sample import per_sample_grad
+
+__all__ = ['Layout', 'Objective', 'OptimizeResult', 'Optimizer', 'GradientDescent', 'Momentum', 'Adam', 'LBFGS',
+           'minimize', 'System', 'solve_nonlinear', 'LeastSquares', 'least_squares',
+           'ScipyAdapter', 'StreamingObjective', 'accumulate', 'prefetch',
+           'per_sample_grad']
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : adapter.py
+# Description: scipy.optimize compatible objective adapter
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from .optimize import Objective
+
+"""
+This module adapts a scalar Expression to the calling convention of scipy.optimize: fun(x), jac(x) and
+hessp(x, p) of a flat parameter array x. The adapter remembers the last evaluated point, so that fun and jac at
+the same x share one forward and reverse sweep of the graph.
+"""
+
+
+class ScipyAdapter:
+    """Adapter of a scalar objective to scipy.optimize.minimize, e.g.
+
+        adapter = ScipyAdapter(f, {'x': 1., 'w': np.zeros(3)})
+        res = scipy.optimize.minimize(adapter.fun, adapter.x0, jac=adapter.jac, hessp=adapter.hessp)
+        adapter.unpack(res.x)
+    """
+    def __init__(self, f, x0):
+        """Initialize the adapter
+
+        :param f: scalar Expression in reverse mode, Python function or Objective
+        :param x0: initial guess, dictionary of variable name and value, or value of the only variable,
+                   which sets the layout of the variables in the flat array
+        """
+        self.objective = f if isinstance(f, Objective) else Objective(f, x0)
+        self.x0 = self.objective.pack(x0)
+        self._x = None
+        self._fun = None
+        self._grad = np.zeros(self.objective.size)
+
+    @property
+    def nsweep(self):
+        """Number of forward and reverse sweeps of the graph
+        """
+        return self.objective.nfev
+
+    def _evaluate(self, x):
+        """Evaluate the objective and its gradient, unless x is the last evaluated point
+
+        :param x: flat parameter array
+        """
+        x = np.asarray(x, dtype=float)
+        if self._x is None or not np.array_equal(x, self._x):
+            self._fun, grad = self.objective(x)
+            np.copyto(self._grad, grad)
+            self._x = x.copy()
+
+    def fun(self, x, *args):
+        """Objective value
+
+        :param x: flat parameter array
+        :return: float
+        """
+        self._evaluate(x)
+        return self._fun
+
+    def jac(self, x, *args):
+        """Objective gradient
+
+        :param x: flat parameter array
+        :return: np.array
+        """
+        self._evaluate(x)
+        return self._grad.copy()
+
+    def fun_and_jac(self, x, *args):
+        """Objective value and gradient, for scipy.optimize.minimize(..., jac=True)
+
+        :param x: flat parameter array
+        :return: float and np.array
+        """
+        self._evaluate(x)
+        return self._fun, self._grad.copy()
+
+    def hessp(self, x, p, *args):
+        """Product of the Hessian of the objective with a vector, by central difference of the exact gradients.
+        The last evaluated point is kept.
+
+        :param x: flat parameter array
+        :param p: flat direction array
+        :return: np.array
+        """
+        x, p = np.asarray(x, dtype=float), np.asarray(p, dtype=float)
+        norm = np.linalg.norm(p)
+        if norm == 0:
+            return np.zeros_like(x)
+        h = np.cbrt(np.finfo(float).eps) * (1 + np.linalg.norm(x)) / norm
+        grad = self.objective(x + h * p)[1].copy()
+        grad -= self.objective(x - h * p)[1]
+        return grad / (2 * h)
+
+    def unpack(self, x):
+        """Split a flat parameter array into the variables
+
+        :param x: flat parameter array
+        :return: dictionary of variable name and value, or the value of the only variable
+        """
+        return self.objective.unpack(x)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : least_squares.py
+# Description: Levenberg-Marquardt nonlinear least squares
+# Copyright 2022 Harvard University. All Rights Reserved.
+import time
+
+import numpy as np
+
+from .optimize import Layout, OptimizeResult
+
+"""
+This module fits parameters by nonlinear least squares: it minimizes 0.5 * ||r(p, data)||^2 for a residual
+Expression r of the parameters p and of a batch of data points, with Levenberg-Marquardt iterations.
+
+When the residual is elementwise over the data points and the parameters are scalars, the residual vector and the
+whole Jacobian are computed in a single vectorized reverse pass: the parameters are broadcast to the data shape,
+so that their adjoints keep one entry per data point instead of being summed. The forward values computed for the
+residual are cached in the graph and reused by the partial derivatives of the backward pass, and the graph
+propagated for the residual at a trial step is kept, so that only the backward pass is run when the step is
+accepted. Other residuals use one vectorized forward pass per parameter. No computation loops over the data
+points in Python.
+"""
+
+
+class LeastSquares(Layout):
+    """Evaluator of a residual Expression over a data batch and of its Jacobian with respect to the parameters.
+    """
+    def __init__(self, residual, x0, data=None):
+        """Initialize the evaluator
+
+        :param residual: Expression of the parameters and the data variables
+        :param x0: dictionary of parameter name and initial value
+        :param data: dictionary of data variable name and array
+        """
+        super().__init__(x0)
+        self.residual = residual
+        self.data = {k: np.asarray(v) for k, v in (data or {}).items()}
+        self.shape = np.broadcast_shapes(*[np.shape(v) for v in self.data.values()])
+        self.batched = residual.is_elementwise() and all(shape == () for index, shape in self.layout.values())
+        self.nfev = 0
+        self.njev = 0
+        # parameters at which the graph of a batched residual is propagated, and the residual there
+        self.kept = None
+        self.res = None
+
+    def value(self, x):
+        """Evaluate the residual. A batched residual is propagated in reverse mode and the graph is kept until the
+        next evaluation, so that the Jacobian at the same parameters only needs a backward pass
+
+        :param x: flat parameter array
+        :return: flat residual array
+        """
+        self.nfev += 1
+        f = self.residual
+        if not self.batched:
+            return np.reshape(f.value({**self.data, **self.inputs(x)}), -1)
+        self.clear()
+        inputs = {k: np.full(self.shape, v) for k, v in self.inputs(x).items()}
+        inputs.update(self.data)
+        self.res = np.asarray(f.propagate(inputs))
+        self.kept = x
+        return np.reshape(self.res, -1)
+
+    def jacobian(self, x):
+        """Evaluate the Jacobian. For a batched residual, the graph kept by the last evaluation of the residual is
+        reused when it was at the same parameters, else the residual is evaluated first
+
+        :param x: flat parameter array
+        :return: Jacobian of shape (residual size, number of parameters)
+        """
+        self.njev += 1
+        if not self.batched:
+            return self._forward(x)[1]
+        if self.kept is not x:
+            self.value(x)
+        f = self.residual
+        grad = f.backward()
+        self.clear()
+        jac = np.empty((self.res.size, self.size))
+        for k, (index, shape) in self.layout.items():
+            jac[:, index.start] = np.reshape(np.broadcast_to(grad[k], self.res.shape), -1) if k in grad else 0
+        return jac
+
+    def value_and_jacobian(self, x):
+        """Evaluate the residual and its Jacobian
+
+        :param x: flat parameter array
+        :return: flat residual array, and Jacobian of shape (residual size, number of parameters)
+        """
+        if self.batched:
+            res = self.value(x)
+            return res, self.jacobian(x)
+        self.nfev += 1
+        self.njev += 1
+        return self._forward(x)
+
+    def clear(self):
+        """Release the graph kept by the last evaluation of a batched residual
+        """
+        if self.kept is not None:
+            self.residual.clear()
+            self.kept = None
+
+    def _forward(self, x):
+        """Residual and Jacobian by one vectorized forward pass per parameter
+
+        :param x: flat parameter array
+        :return: flat residual array, and Jacobian of shape (residual size, number of parameters)
+        """
+        f = self.residual
+        inputs = {**self.data, **self.inputs(x)}
+        seed = {k: np.zeros_like(v, dtype=float) for k, v in self.data.items()}
+        seed.update({k: 0. if shape == () else np.zeros(shape) for k, (index, shape) in self.layout.items()})
+        cols = []
+        for k, (index, shape) in self.layout.items():
+            for i in range(index.stop - index.start):
+                if shape == ():
+                    seed[k] = 1.
+                else:
+                    seed[k].flat[i] = 1.
+                out = f.forward(inputs, seed)
+                f.clear()
+                res = np.asarray(out.real)
+                cols.append(np.reshape(np.broadcast_to(out.dual, res.shape), -1))
+                if shape == ():
+                    seed[k] = 0.
+                else:
+                    seed[k].flat[i] = 0.
+        return np.reshape(res, -1), np.stack(cols, axis=-1)
+
+
+def least_squares(residual, x0, data=None, max_iter=100, gtol=1e-10, xtol=1e-10, tau=1e-3, callback=None,
+                  verbose=False):
+    """Minimize 0.5 * ||r(p, data)||^2 over the parameters p with Levenberg-Marquardt iterations
+
+    :param residual: Expression of the parameters and the data variables, or LeastSquares
+    :param x0: dictionary of parameter name and initial value
+    :param data: dictionary of data variable name and array
+    :param max_iter: maximum number of iterations
+    :param gtol: stop when the largest absolute entry of the gradient J^T r is below gtol
+    :param xtol: stop when the step is small relative to the parameters
+    :param tau: initial damping, relative to the largest diagonal entry of J^T J
+    :param callback: function callback(x, cost, it) called after each accepted step with the flat parameters,
+                     stop when it returns True
+    :param verbose: print the result at the end
+    :return: OptimizeResult, fun is the cost 0.5 * ||r||^2, grad is J^T r, with the residual, the Jacobian jac and
+             the number of Jacobian evaluations njev
+    """
+    start = time.perf_counter()
+    problem = residual if isinstance(residual, LeastSquares) else LeastSquares(residual, x0, data)
+    x = problem.pack(x0)
+    res, jac = problem.value_and_jacobian(x)
+    cost = 0.5 * res @ res
+    hess, grad = jac.T @ jac, jac.T @ res
+    mu, nu = tau * np.max(np.diag(hess), initial=0), 2.
+    eye = np.eye(problem.size)
+
+    converged, message, nit = False, 'maximum number of iterations reached', 0
+    while True:
+        if np.max(np.abs(grad), initial=0) <= gtol:
+            converged, message = True, 'gradient below gtol'
+            break
+        if nit >= max_iter:
+            break
+        nit += 1
+
+        step = np.linalg.lstsq(hess + mu * eye, -grad, rcond=None)[0]
+        if np.linalg.norm(step) <= xtol * (np.linalg.norm(x) + xtol):
+            converged, message = True, 'step below xtol'
+            break
+
+        x_new = x + step
+        res_new = problem.value(x_new)
+        cost_new = 0.5 * res_new @ res_new
+        # gain ratio between the actual and the predicted decrease of the cost
+        predicted = 0.5 * step @ (mu * step - grad)
+        rho = (cost - cost_new) / predicted if predicted > 0 else -1.
+        if rho > 0:
+            x, res, cost = x_new, res_new, cost_new
+            jac = problem.jacobian(x)
+            hess, grad = jac.T @ jac, jac.T @ res
+            mu *= max(1 / 3, 1 - (2 * rho - 1) ** 3)
+            nu = 2.
+            if callback is not None and callback(x, cost, nit):
+                message = 'stopped by callback'
+                break
+        else:
+            mu *= nu
+            nu *= 2
+
+    problem.clear()
+    result = OptimizeResult(problem.unpack(x), cost, grad, nit, problem.nfev, converged, message,
+                            time.perf_counter() - start, residual=res, jac=jac, njev=problem.njev)
+    if verbose:
+        print(result)
+    return result
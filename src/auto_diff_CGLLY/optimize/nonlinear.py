@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : nonlinear.py
+# Description: Newton and Broyden solvers of nonlinear systems
+# Copyright 2022 Harvard University. All Rights Reserved.
+import time
+
+import numpy as np
+
+from ..dual import SparseSeed
+from .optimize import Layout, OptimizeResult
+
+"""
+This module solves square nonlinear systems F(x) = 0, where F is given by a Compose (or list) of Expressions.
+The Jacobian is computed in the cheapest mode available for each expression: one reverse pass for a scalar
+expression, a single forward pass with sparse tangents when all the variables are scalars, one forward pass per
+array variable of an elementwise expression, and one vectorized forward pass per array element otherwise. Newton
+iterations compute the Jacobian at every step, Broyden iterations compute it once and then apply rank-one updates
+to its inverse. Both use a damped backtracking line search on the residual norm.
+"""
+
+
+class System(Layout):
+    """Evaluator of the residual and the Jacobian of a nonlinear system as functions of a flat array.
+    """
+    def __init__(self, compose, x0):
+        """Initialize the evaluator
+
+        :param compose: Compose or list of Expressions, the residual is the concatenation of their flattened values
+        :param x0: dictionary of variable name and value, or value of the only variable
+        """
+        self.funcs = list(compose)
+        single = not isinstance(x0, dict)
+        if single:
+            names = set().union(*[f.varname for f in self.funcs])
+            assert len(names) == 1, 'Please provide a dictionary of initial values.'
+            x0 = {names.pop(): x0}
+        super().__init__(x0, single)
+        self.nfev = 0
+        self.njev = 0
+
+    def residual(self, x):
+        """Evaluate the residual
+
+        :param x: flat array
+        :return: flat residual array
+        """
+        self.nfev += 1
+        inputs = self.inputs(x)
+        return np.concatenate([np.reshape(f.value(inputs), -1) for f in self.funcs])
+
+    def _rows(self, f, inputs):
+        """Jacobian of one expression, one row for each element of its value
+
+        :param f: Expression
+        :param inputs: input dictionary
+        :return: np.array of shape (size of the value, number of parameters)
+        """
+        y = f.propagate(inputs)
+        if np.ndim(y) == 0:
+            grad = f.backward()
+            f.clear()
+            row = np.zeros((1, self.size))
+            for k, (index, shape) in self.layout.items():
+                if k in grad:
+                    row[0, index] = np.reshape(np.broadcast_to(grad[k], shape), -1)
+            return row
+        f.clear()
+
+        rows = np.zeros((np.size(y), self.size))
+        if all(shape == () for index, shape in self.layout.values()):
+            seed = SparseSeed(inputs)
+            jac = seed.jacobian(f.forward(inputs, seed))
+            f.clear()
+            for k, (index, shape) in self.layout.items():
+                rows[:, index] = jac[k]
+            return rows
+
+        elementwise = f.is_elementwise()
+        seed = {k: 0. if shape == () else np.zeros(shape) for k, (index, shape) in self.layout.items()}
+        for k, (index, shape) in self.layout.items():
+            if shape == () or elementwise and shape == np.shape(y):
+                seed[k] = 1. if shape == () else np.ones(shape)
+                dual = self._tangent(f, inputs, seed, y)
+                rows[:, index] = dual[:, None] if shape == () else np.diag(dual)
+            else:
+                for i in range(index.stop - index.start):
+                    seed[k].flat[i] = 1.
+                    rows[:, index.start + i] = self._tangent(f, inputs, seed, y)
+                    seed[k].flat[i] = 0.
+            seed[k] = 0. if shape == () else np.zeros(shape)
+        return rows
+
+    @staticmethod
+    def _tangent(f, inputs, seed, y):
+        """Forward pass of one seed
+
+        :param f: Expression
+        :param inputs: input dictionary
+        :param seed: seed dictionary
+        :param y: value of the expression
+        :return: flat dual part of the value
+        """
+        res = f.forward(inputs, seed)
+        f.clear()
+        return np.reshape(np.broadcast_to(res.dual, np.shape(y)), -1)
+
+    def jacobian(self, x):
+        """Evaluate the Jacobian
+
+        :param x: flat array
+        :return: np.array of shape (size of the residual, number of parameters)
+        """
+        self.njev += 1
+        inputs = self.inputs(x)
+        return np.vstack([self._rows(f, inputs) for f in self.funcs])
+
+
+def _newton_step(jac, res):
+    """Newton step, least squares step when the Jacobian is singular
+
+    :param jac: Jacobian
+    :param res: residual
+    :return: np.array
+    """
+    try:
+        return -np.linalg.solve(jac, res)
+    except np.linalg.LinAlgError:
+        return -np.linalg.lstsq(jac, res, rcond=None)[0]
+
+
+def solve_nonlinear(compose, x0, method='newton', tol=1e-10, max_iter=100, line_search=True, max_ls=30,
+                    callback=None, verbose=False):
+    """Solve the square nonlinear system F(x) = 0
+
+    :param compose: Compose or list of Expressions, F is the concatenation of their flattened values
+    :param x0: initial guess, dictionary of variable name and value, or value of the only variable
+    :param method: 'newton' to compute the Jacobian at every iteration, 'broyden' to compute it once and then
+                   update its inverse with rank-one corrections
+    :param tol: stop when the norm of the residual is below tol
+    :param max_iter: maximum number of iterations
+    :param line_search: halve the step until the residual norm decreases enough
+    :param max_ls: maximum number of line search steps
+    :param callback: function callback(x, residual, it) called after each iteration with the flat parameters,
+                     stop when it returns True
+    :param verbose: print the result at the end
+    :return: OptimizeResult, fun is the residual norm, with the residual and the number of Jacobian evaluations njev
+    """
+    if method not in ('newton', 'broyden'):
+        raise ValueError(f"Unknown method {method}, choose 'newton' or 'broyden'.")
+
+    start = time.perf_counter()
+    system = System(compose, x0)
+    x = system.pack(x0)
+    res = system.residual(x)
+    if res.size != system.size:
+        raise ValueError(f"The system is not square: {res.size} equations and {system.size} unknowns.")
+    norm = np.linalg.norm(res)
+
+    inv = None
+    converged, message, nit = False, 'maximum number of iterations reached', 0
+    while True:
+        if norm <= tol:
+            converged, message = True, 'residual below tol'
+            break
+        if nit >= max_iter:
+            break
+        nit += 1
+
+        fresh = method == 'newton' or inv is None
+        if method == 'newton':
+            step = _newton_step(system.jacobian(x), res)
+        else:
+            if inv is None:
+                inv = np.linalg.pinv(system.jacobian(x))
+            step = -inv @ res
+
+        t = 1.
+        for _ in range(max_ls if line_search else 1):
+            x_new = x + t * step
+            res_new = system.residual(x_new)
+            norm_new = np.linalg.norm(res_new)
+            if norm_new <= (1 - 1e-4 * t) * norm:
+                break
+            t *= 0.5
+        else:
+            if line_search and not fresh:
+                # the secant approximation went stale, start again from the exact Jacobian
+                inv = None
+                continue
+            if line_search:
+                message = 'line search failed'
+                break
+
+        if method == 'broyden':
+            s, y = x_new - x, res_new - res
+            hy = inv @ y
+            denom = s @ hy
+            if abs(denom) > 1e-14:
+                inv += np.outer(s - hy, s @ inv) / denom
+
+        x, res, norm = x_new, res_new, norm_new
+        if callback is not None and callback(x, res, nit):
+            message = 'stopped by callback'
+            break
+
+    result = OptimizeResult(system.unpack(x), norm, None, nit, system.nfev, converged, message,
+                            time.perf_counter() - start, residual=res, njev=system.njev)
+    if verbose:
+        print(result)
+    return result
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : optimize.py
+# Description: gradient based optimizers driven by reverse mode AutoDiff
+# Copyright 2022 Harvard University. All Rights Reserved.
+import abc
+import time
+
+import numpy as np
+
+from ..expression import Expression, value_and_grad
+
+"""
+This module provides gradient based minimization: gradient descent, momentum, Adam and L-BFGS.
+The objective is evaluated by an Objective, which builds the reverse mode graph once and then only replays it,
+reading the parameters from and writing the gradient to preallocated flat buffers. The optimizers update the
+parameters in place in their own preallocated state buffers.
+"""
+
+
+class Layout:
+    """Layout of the variables of a problem in a flat parameter array.
+    """
+    def __init__(self, x0, single=False):
+        """Initialize the layout
+
+        :param x0: dictionary of variable name and value
+        :param single: whether the parameters are given as the value of the only variable instead of a dictionary
+        """
+        self.single = single
+        self.layout = {}
+        start = 0
+        for k, v in x0.items():
+            shape = np.shape(v)
+            size = int(np.prod(shape))
+            self.layout[k] = (slice(start, start + size), shape)
+            start += size
+        self.size = start
+
+    def pack(self, values):
+        """Flatten the parameters into a new float array
+
+        :param values: parameters, structured as the initial guess
+        :return: np.array
+        """
+        if self.single:
+            values = {next(iter(self.layout)): values}
+        flat = np.zeros(self.size)
+        for k, (index, shape) in self.layout.items():
+            flat[index] = np.reshape(values[k], -1)
+        return flat
+
+    def unpack(self, flat):
+        """Split a flat parameter array into the variables, structured as the initial guess
+
+        :param flat: np.array
+        :return: dictionary of variable name and value, or the value of the only variable
+        """
+        res = {k: float(flat[index][0]) if shape == () else flat[index].reshape(shape).copy()
+               for k, (index, shape) in self.layout.items()}
+        if self.single:
+            return next(iter(res.values()))
+        return res
+
+    def inputs(self, flat):
+        """Input dictionary of views of a flat parameter array
+
+        :param flat: np.array
+        :return: dictionary of variable name and value
+        """
+        return {k: float(flat[index][0]) if shape == () else flat[index].reshape(shape)
+                for k, (index, shape) in self.layout.items()}
+
+
+class Objective(Layout):
+    """Reverse mode evaluator of a scalar objective as a function of a flat parameter array.
+    """
+    def __init__(self, f, x0):
+        """Initialize the evaluator
+
+        :param f: scalar Expression in reverse mode, or Python function of one array built from Expression
+                  operations, which is traced once (see value_and_grad)
+        :param x0: initial guess. For an Expression, dictionary of variable name and value, or value of its
+                   only variable (e.g. a ParameterVector). For a Python function, int, float or np.array
+        """
+        if isinstance(f, Expression):
+            assert f.mode == 'r', 'Please build the objective in reverse mode.'
+            single = not isinstance(x0, dict)
+            if single:
+                assert len(f.varname) == 1, 'Please provide a dictionary of initial values.'
+                x0 = {next(iter(f.varname)): x0}
+            self.expression, self.fn = f, None
+        else:
+            single = True
+            x0 = {'_arg0': x0}
+            self.expression, self.fn = None, value_and_grad(f)
+
+        super().__init__(x0, single)
+        self.x = np.zeros(self.size)
+        self.grad = np.zeros(self.size)
+        self.nfev = 0
+
+    def __call__(self, x):
+        """Evaluate the objective and its gradient
+
+        :param x: flat parameter array
+        :return: value and gradient. The gradient is the evaluator buffer, which is overwritten by the next call
+        """
+        self.nfev += 1
+        np.copyto(self.x, x)
+        inputs = self.inputs(self.x)
+
+        if self.fn is not None:
+            y, g = self.fn(inputs['_arg0'])
+            self.grad[:] = np.reshape(g, -1)
+            return float(y), self.grad
+
+        f = self.expression
+        y = f.propagate(inputs)
+        if np.ndim(y) != 0:
+            f.clear()
+            raise ValueError(f"The objective should be a scalar, found shape {np.shape(y)}.")
+        res = f.backward()
+        f.clear()
+        for k, (index, shape) in self.layout.items():
+            if k in res:
+                self.grad[index] = np.reshape(np.broadcast_to(res[k], shape), -1)
+            else:
+                self.grad[index] = 0
+        return float(y), self.grad
+
+
+class OptimizeResult:
+    """Result of a minimization.
+    """
+    def __init__(self, x, fun, grad, nit, nfev, converged, message, elapsed, **info):
+        """Initialize the result
+
+        :param x: solution, structured as the initial guess
+        :param fun: objective value at the solution
+        :param grad: flat gradient at the solution
+        :param nit: number of iterations
+        :param nfev: number of objective evaluations
+        :param converged: whether a convergence tolerance was reached
+        :param message: reason of the termination
+        :param elapsed: run time in seconds
+        :param info: additional results of the solver, set as attributes
+        """
+        self.x = x
+        self.fun = fun
+        self.grad = grad
+        self.nit = nit
+        self.nfev = nfev
+        self.converged = converged
+        self.message = message
+        self.elapsed = elapsed
+        self.it_per_sec = nit / elapsed if elapsed > 0 else float('inf')
+        for k, v in info.items():
+            setattr(self, k, v)
+
+    def __str__(self):
+        return f"OptimizeResult: {self.message} after {self.nit} iterations ({self.it_per_sec:.1f} it/s), " \
+               f"fun {self.fun}, x {self.x}"
+
+
+class Optimizer(abc.ABC):
+    """Base class of the optimizers. Subclasses implement the parameter update of one iteration.
+    """
+    def __init__(self, max_iter=1000, gtol=1e-8, tol=1e-12, callback=None, verbose=False):
+        """Initialize the optimizer
+
+        :param max_iter: maximum number of iterations
+        :param gtol: stop when the largest absolute gradient entry is below gtol
+        :param tol: stop when the norm of the parameter update is below tol
+        :param callback: function callback(x, fun, grad, it) called after each iteration with the flat
+                         parameters, stop when it returns True
+        :param verbose: print the iterations per second at the end
+        """
+        self.max_iter = max_iter
+        self.gtol = gtol
+        self.tol = tol
+        self.callback = callback
+        self.verbose = verbose
+
+    def reset(self, size):
+        """Allocate the state buffers of the optimizer
+
+        :param size: number of parameters
+        """
+        self.direction = np.zeros(size)
+        # reason to stop set by an iteration which cannot make progress, e.g. a failed line search
+        self.failure = None
+
+    @abc.abstractmethod
+    def step(self, objective, x, fun, grad):
+        """Run one iteration: update the parameters and the gradient in place
+
+        :param objective: Objective
+        :param x: flat parameters
+        :param fun: objective value at x
+        :param grad: gradient at x
+        :return: objective value at the new parameters and norm of the update
+        """
+
+    def minimize(self, f, x0):
+        """Minimize a scalar objective
+
+        :param f: scalar Expression in reverse mode, Python function or Objective
+        :param x0: initial guess, see Objective
+        :return: OptimizeResult
+        """
+        objective = f if isinstance(f, Objective) else Objective(f, x0)
+        x = objective.pack(x0)
+        self.reset(objective.size)
+        grad = np.zeros(objective.size)
+
+        start = time.perf_counter()
+        fun, g = objective(x)
+        np.copyto(grad, g)
+        converged, message, nit = False, 'maximum number of iterations reached', 0
+        while True:
+            if np.max(np.abs(grad), initial=0) <= self.gtol:
+                converged, message = True, 'gradient below gtol'
+                break
+            if nit >= self.max_iter:
+                break
+            nit += 1
+            fun, update = self.step(objective, x, fun, grad)
+            if self.failure is not None:
+                message = self.failure
+                break
+            if not np.isfinite(fun):
+                message = 'objective is not finite'
+                break
+            if self.callback is not None and self.callback(x, fun, grad, nit):
+                message = 'stopped by callback'
+                break
+            if update <= self.tol:
+                converged, message = True, 'update below tol'
+                break
+
+        res = OptimizeResult(objective.unpack(x), fun, grad, nit, objective.nfev, converged, message,
+                             time.perf_counter() - start)
+        if self.verbose:
+            print(res)
+        return res
+
+    def _move(self, objective, x, grad):
+        """Apply the update in self.direction and evaluate the objective at the new parameters
+
+        :param objective: Objective
+        :param x: flat parameters, updated in place
+        :param grad: gradient buffer, updated in place
+        :return: objective value at the new parameters and norm of the update
+        """
+        x += self.direction
+        fun, g = objective(x)
+        np.copyto(grad, g)
+        return fun, np.linalg.norm(self.direction)
+
+
+class GradientDescent(Optimizer):
+    """Gradient descent with a constant learning rate.
+    """
+    def __init__(self, lr=0.01, **kwargs):
+        """Initialize the optimizer
+
+        :param lr: learning rate
+        :param kwargs: see Optimizer
+        """
+        super().__init__(**kwargs)
+        self.lr = lr
+
+    def step(self, objective, x, fun, grad):
+        np.multiply(grad, -self.lr, out=self.direction)
+        return self._move(objective, x, grad)
+
+
+class Momentum(Optimizer):
+    """Gradient descent with heavy ball momentum.
+    """
+    def __init__(self, lr=0.01, beta=0.9, **kwargs):
+        """Initialize the optimizer
+
+        :param lr: learning rate
+        :param beta: momentum factor
+        :param kwargs: see Optimizer
+        """
+        super().__init__(**kwargs)
+        self.lr = lr
+        self.beta = beta
+
+    def step(self, objective, x, fun, grad):
+        self.direction *= self.beta
+        self.direction -= self.lr * grad
+        return self._move(objective, x, grad)
+
+
+class Adam(Optimizer):
+    """Adam optimizer, with bias corrected first and second moment estimates of the gradient.
+    """
+    def __init__(self, lr=0.001, beta1=0.9, beta2=0.999, eps=1e-8, **kwargs):
+        """Initialize the optimizer
+
+        :param lr: learning rate
+        :param beta1: decay rate of the first moment estimate
+        :param beta2: decay rate of the second moment estimate
+        :param eps: term added to the denominator for numerical stability
+        :param kwargs: see Optimizer
+        """
+        super().__init__(**kwargs)
+        self.lr = lr
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+
+    def reset(self, size):
+        super().reset(size)
+        self.m = np.zeros(size)
+        self.v = np.zeros(size)
+        self.t = 0
+
+    def step(self, objective, x, fun, grad):
+        self.t += 1
+        self.m *= self.beta1
+        self.m += (1 - self.beta1) * grad
+        self.v *= self.beta2
+        self.v += (1 - self.beta2) * grad * grad
+        lr = self.lr * np.sqrt(1 - self.beta2 ** self.t) / (1 - self.beta1 ** self.t)
+        np.sqrt(self.v, out=self.direction)
+        self.direction += self.eps
+        np.divide(self.m, self.direction, out=self.direction)
+        self.direction *= -lr
+        return self._move(objective, x, grad)
+
+
+class LBFGS(Optimizer):
+    """Limited memory BFGS with a backtracking line search satisfying the Armijo condition.
+    """
+    def __init__(self, m=10, c1=1e-4, shrink=0.5, max_ls=30, **kwargs):
+        """Initialize the optimizer
+
+        :param m: number of correction pairs kept
+        :param c1: sufficient decrease constant of the Armijo condition
+        :param shrink: step reduction factor of the line search
+        :param max_ls: maximum number of line search steps
+        :param kwargs: see Optimizer
+        """
+        super().__init__(**kwargs)
+        self.m = m
+        self.c1 = c1
+        self.shrink = shrink
+        self.max_ls = max_ls
+
+    def reset(self, size):
+        super().reset(size)
+        self.s = np.zeros((self.m, size))
+        self.y = np.zeros((self.m, size))
+        self.rho = np.zeros(self.m)
+        self.alpha = np.zeros(self.m)
+        self.x_prev = np.zeros(size)
+        self.g_prev = np.zeros(size)
+        self.k = 0
+
+    def _direction(self, grad):
+        """Two-loop recursion, writes minus the approximate inverse Hessian times the gradient in self.direction
+
+        :param grad: gradient
+        """
+        d = self.direction
+        np.negative(grad, out=d)
+        n = min(self.k, self.m)
+        order = [(self.k - 1 - i) % self.m for i in range(n)]
+        for i in order:
+            self.alpha[i] = self.rho[i] * np.dot(self.s[i], d)
+            d -= self.alpha[i] * self.y[i]
+        if n:
+            last = order[0]
+            d *= np.dot(self.s[last], self.y[last]) / np.dot(self.y[last], self.y[last])
+        else:
+            d /= max(1., np.linalg.norm(grad))
+        for i in reversed(order):
+            beta = self.rho[i] * np.dot(self.y[i], d)
+            d += (self.alpha[i] - beta) * self.s[i]
+
+    def _line_search(self, objective, x, fun, slope):
+        """Backtrack from a unit step along self.direction until the Armijo condition holds
+
+        :param objective: Objective
+        :param x: flat parameters, set to the accepted point
+        :param fun: objective value at self.x_prev
+        :param slope: directional derivative along self.direction
+        :return: step, objective value and gradient at the accepted point, or None when every trial fails
+        """
+        step = 1.
+        for _ in range(self.max_ls):
+            np.add(self.x_prev, step * self.direction, out=x)
+            fun_new, g = objective(x)
+            if fun_new <= fun + self.c1 * step * slope:
+                return step, fun_new, g
+            step *= self.shrink
+        return None
+
+    def step(self, objective, x, fun, grad):
+        self._direction(grad)
+        slope = np.dot(grad, self.direction)
+        if slope >= 0:
+            # not a descent direction, restart from steepest descent
+            self.k = 0
+            self._direction(grad)
+            slope = np.dot(grad, self.direction)
+
+        np.copyto(self.x_prev, x)
+        np.copyto(self.g_prev, grad)
+        found = self._line_search(objective, x, fun, slope)
+        if found is None and self.k:
+            # the curvature pairs went stale, restart from steepest descent
+            self.k = 0
+            self._direction(grad)
+            found = self._line_search(objective, x, fun, np.dot(grad, self.direction))
+        if found is None:
+            np.copyto(x, self.x_prev)
+            self.failure = 'line search failed'
+            return fun, 0.
+        step, fun_new, g = found
+        np.copyto(grad, g)
+
+        # keep the correction pair only when the curvature condition holds
+        s, y = np.subtract(x, self.x_prev, out=self.x_prev), np.subtract(grad, self.g_prev, out=self.g_prev)
+        sy = np.dot(s, y)
+        if sy > 1e-10:
+            i = self.k % self.m
+            np.copyto(self.s[i], s)
+            np.copyto(self.y[i], y)
+            self.rho[i] = 1 / sy
+            self.k += 1
+        return fun_new, step * np.linalg.norm(self.direction)
+
+
+_METHODS = {
+    'gd': GradientDescent,
+    'momentum': Momentum,
+    'adam': Adam,
+    'lbfgs': LBFGS,
+}
+
+
+def minimize(f, x0, method='lbfgs', **kwargs):
+    """Minimize a scalar objective
+
+    :param f: scalar Expression in reverse mode, Python function or Objective
+    :param x0: initial guess, see Objective
+    :param method: 'gd', 'momentum', 'adam' or 'lbfgs'
+    :param kwargs: parameters of the optimizer
+    :return: OptimizeResult
+    """
+    if method not in _METHODS:
+        raise ValueError(f"Unknown method {method}, choose one of {list(_METHODS)}.")
+    return _METHODS[method](**kwargs).minimize(f, x0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : per_sample.py
+# Description: per-sample gradients of a loss over a data batch
+# Copyright 2022 Harvard University. All Rights Reserved.
+import numpy as np
+
+from ..expression.chunked import _output
+from .optimize import Layout
+
+"""
+This module computes the gradient of a loss with respect to the parameters separately for each sample of a data
+batch, e.g. to clip the gradients per sample or to compute influence scores. The parameters are broadcast along
+the batch axis of the data, so that their adjoints keep one entry per sample instead of being summed: a single
+vectorized reverse pass over a chunk of samples gives the gradients of all the samples of the chunk. Axes of length
+1 are inserted after the batch axis, up to the number of dimensions of the data, so that the parameters broadcast
+against multi-feature data as without the batch axis.
+"""
+
+
+def _inputs(params, layout, lead, b):
+    """Broadcast the parameters along the batch axis, with axes of length 1 after it
+
+    :param params: dictionary of parameter name and value
+    :param layout: Layout of the parameters
+    :param lead: dictionary of parameter name and shape of the axes inserted after the batch axis
+    :param b: number of samples
+    :return: dictionary of parameter name and array of shape (b,) + lead + shape
+    """
+    return {k: np.broadcast_to(np.reshape(params[k], (1,) * len(lead[k]) + shape), (b,) + lead[k] + shape)
+            for k, (index, shape) in layout.layout.items()}
+
+
+def per_sample_grad(f, params, data, chunk_size=4096, out=None):
+    """Compute the gradient of the loss of each sample with respect to the parameters
+
+    :param f: Expression in reverse mode of the parameter and the data variables, giving one loss per sample.
+              Its value on a batch of b samples has shape (b,), the loss of sample i may only depend on row i of
+              the data and of the broadcast parameters, as with elementwise operations and sums over axis=-1.
+              The parameters may also be used after a sum over the feature axes, e.g. a bias added to a dot
+              product, in which case they are broadcast to (b,) + shape
+    :param params: dictionary of parameter name and value
+    :param data: dictionary of data variable name and array, with the samples along the first axis
+    :param chunk_size: number of samples evaluated in one pass, to bound the memory
+    :param out: None for a new array, path of a new .npy file to map, or preallocated array of shape (N, P)
+    :return: losses of shape (N,), and gradients of shape (N, P), the parameters flattened in the order of params
+    """
+    if f.mode != 'r':
+        raise ValueError('Please build the loss in reverse mode.')
+    layout = Layout(params)
+    data = {k: np.asarray(v) for k, v in data.items()}
+    n = len(next(iter(data.values())))
+    if any(len(v) != n for v in data.values()):
+        raise ValueError('The data arrays should have the same number of samples.')
+
+    ndim = max(v.ndim for v in data.values()) - 1
+    lead = {k: (1,) * max(ndim - len(shape), 0) for k, (index, shape) in layout.layout.items()}
+
+    losses = np.empty(n)
+    grads = _output(out, (n, layout.size), float)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        b = stop - start
+        batch = {k: v[start:stop] for k, v in data.items()}
+        y = f.propagate({**_inputs(params, layout, lead, b), **batch})
+        if np.shape(y) != (b,) and start == 0 and any(lead.values()):
+            # the parameters are used after a sum over the feature axes, keep them on the batch axis only
+            f.clear()
+            lead = {k: () for k in lead}
+            y = f.propagate({**_inputs(params, layout, lead, b), **batch})
+        if np.shape(y) != (b,):
+            f.clear()
+            raise ValueError(f"The loss of a chunk of {b} samples has shape {np.shape(y)}, expected ({b},).")
+        res = f.backward()
+        f.clear()
+
+        losses[start:stop] = y
+        for k, (index, shape) in layout.layout.items():
+            grads[start:stop, index] = np.reshape(np.broadcast_to(res[k], (b,) + lead[k] + shape), (b, -1)) \
+                if k in res else 0
+    if isinstance(grads, np.memmap):
+        grads.flush()
+    return losses, grads
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# Project    : AutoDiff
+# File       : stream.py
+# Description: streaming accumulation of objectives summed over data chunks
+# Copyright 2022 Harvard University. All Rights Reserved.
+import queue
+import threading
+
+import numpy as np
+
+from ..expression import Expression
+from .optimize import Objective
+
+"""
+This module evaluates objectives which are sums over data sets too large to fit in memory. The data is consumed
+as a stream of chunks, dictionaries of data variable name and array. Each chunk is evaluated in one vectorized
+forward and reverse pass of the graph, and the value and the parameter gradients are accumulated in place into
+preallocated buffers, so that the memory only depends on the chunk size. The next chunk can be loaded on a
+background thread while the current one is evaluated.
+"""
+
+
+class _End:
+    """Marker of the end of a prefetched stream
+    """
+
+
+def prefetch(chunks, size=1):
+    """Iterate over chunks loaded ahead of time on a background thread
+
+    :param chunks: iterable of chunks
+    :param size: number of chunks loaded ahead
+    :return: generator of the chunks, in order. An exception of the loading thread is raised again here
+    """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def load():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(_End)
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = buffer.get()
+            if chunk is _End:
+                return
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+class StreamingObjective(Objective):
+    """Reverse mode evaluator of an objective summed over a stream of data chunks, as a function of a flat
+    parameter array. It can be minimized by the optimizers like any Objective, e.g.
+
+        objective = StreamingObjective(loss, {'w': np.zeros(3)}, lambda: load_chunks(path), prefetch=True)
+        minimize(objective, {'w': np.zeros(3)})
+    """
+    def __init__(self, f, x0, chunks, prefetch=False):
+        """Initialize the evaluator
+
+        :param f: Expression in reverse mode of the parameters and the data variables. Its value on a chunk may
+                  be a scalar or an array, which is summed
+        :param x0: dictionary of parameter name and initial value
+        :param chunks: function returning a new iterable of chunks, or iterable of chunks which can be iterated
+                       several times (e.g. a list). A chunk is a dictionary of data variable name and array
+        :param prefetch: whether to load the next chunk on a background thread during the evaluation
+        """
+        if not isinstance(f, Expression):
+            raise TypeError(f"The streaming objective should be an Expression, found {type(f)}")
+        if not isinstance(x0, dict):
+            raise TypeError('Please provide a dictionary of initial parameter values.')
+        super().__init__(f, x0)
+        self.chunks = chunks
+        self.prefetch = prefetch
+        self.nchunk = 0
+
+    def _stream(self):
+        """Iterable of the chunks of one pass over the data
+
+        :return: iterable
+        """
+        chunks = self.chunks() if callable(self.chunks) else self.chunks
+        return prefetch(chunks) if self.prefetch else chunks
+
+    def __call__(self, x):
+        """Evaluate the objective and its gradient summed over all the chunks
+
+        :param x: flat parameter array
+        :return: value and gradient. The gradient is the evaluator buffer, which is overwritten by the next call
+        """
+        self.nfev += 1
+        np.copyto(self.x, x)
+        params = self.inputs(self.x)
+        self.grad[:] = 0
+        total = 0.
+
+        f = self.expression
+        for chunk in self._stream():
+            self.nchunk += 1
+            total += np.sum(f.propagate({**chunk, **params}))
+            res = f.backward()
+            f.clear()
+            for k, (index, shape) in self.layout.items():
+                if k in res:
+                    self.grad[index] += np.reshape(np.broadcast_to(res[k], shape), -1)
+        return float(total), self.grad
+
+
+def accumulate(f, params, chunks, prefetch=False):
+    """Evaluate an objective and its parameter gradients summed over a stream of data chunks
+
+    :param f: Expression in reverse mode of the parameters and the data variables
+    :param params: dictionary of parameter name and value
+    :param chunks: iterable of chunks, dictionaries of data variable name and array. It is iterated once,
+                   so it may be a generator
+    :param prefetch: whether to load the next chunk on a background thread during the evaluation
+    :return: value and dictionary of parameter name and gradient
+    """
+    objective = StreamingObjective(f, params, chunks, prefetch)
+    value, grad = objective(objective.pack(params))
+    return value, objective.unpack(grad)
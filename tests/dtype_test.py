@@ -0,0 +1,83 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY import Expression, Variable, Dual, get_dtype, set_dtype, precision
+from auto_diff_CGLLY.dual import DualVector
+from auto_diff_CGLLY.dtype import cast
+
+class TestDtype:
+
+    def teardown_method(self):
+        set_dtype(None)
+
+    def test_policy(self):
+        assert get_dtype() is None
+        set_dtype('float32')
+        assert get_dtype() == np.float32
+        with precision(np.float16):
+            assert get_dtype() == np.float16
+        assert get_dtype() == np.float32
+        with precision(None):
+            assert get_dtype() == np.float32
+        with pytest.raises(ValueError):
+            set_dtype(np.int32)
+
+    def test_cast(self):
+        a = np.ones(3, dtype=np.float32)
+        assert cast(a, np.dtype(np.float32)) is a
+        assert cast(np.ones(3), np.dtype(np.float32)).dtype == np.float32
+        assert type(cast(2, np.dtype(np.float32))) is np.float32
+        assert cast(a) is a and cast(2.) == 2.
+        assert cast(np.array(['a']), np.dtype(np.float32)).dtype.kind == 'U'
+
+    def test_dual_astype(self):
+        d = Dual(1., 2.).astype(np.dtype(np.float32))
+        assert type(d) is Dual and type(d.real) is np.float32 and type(d.dual) is np.float32
+        v = DualVector(np.ones(2, np.float32), np.zeros(2, np.float32))
+        assert v.astype(np.dtype(np.float32)) is v
+        assert v.astype(np.dtype(np.float64)).real.dtype == np.float64
+
+    def test_reverse_float32(self):
+        x, y = Variable.vars(['x', 'y'], 'r')
+        f = Expression.sum(Expression.exp(x * y) * np.arange(3.) + Expression.sin(x) / 2)
+        X = np.linspace(0, 1, 3)
+        val, grad = f({'x': X, 'y': 2.}, dtype=np.float32)
+        assert val.dtype == np.float32 and grad['x'].dtype == np.float32
+        assert np.asarray(grad['y']).dtype == np.float32
+        val64, grad64 = f({'x': X, 'y': 2.})
+        assert val64.dtype == np.float64 and get_dtype() is None
+        assert np.allclose(grad['x'], grad64['x'], rtol=1e-6)
+
+    def test_forward_float32(self):
+        x = Variable('x')
+        set_dtype(np.float32)
+        val, der = Expression.exp(x)({'x': np.linspace(0, 1, 4)}, diagonal=True)
+        assert np.asarray(val).dtype == np.float32 and np.asarray(der['x']).dtype == np.float32
+        assert x.value({'x': np.ones(2)}).dtype == np.float32
+
+    def test_no_copy(self):
+        x = Variable('x', mode='r')
+        X = np.ones(4, dtype=np.float32)
+        with precision(np.float32):
+            assert x.propagate({'x': X}) is X
+        x.clear()
+
+    def test_numpy_scalars(self):
+        x = Variable('x', mode='r')
+        val, grad = (x * x)({'x': np.float32(3)})
+        assert val == 9 and grad['x'] == 6
+        val, der = (Variable('x') * 2)({'x': np.int64(3)}, {'x': 1})
+        assert val == [6] and der == [2]
+
+    def test_numpy_scalars_default_seed(self):
+        x, y = Variable.vars(['x', 'y'])
+        val, der = (x * y + Expression.sin(x))({'x': np.float64(2.), 'y': np.int64(3)})
+        assert np.isclose(val[0], 6 + np.sin(2.))
+        assert np.isclose(der['x'][0], 3 + np.cos(2.)) and np.isclose(der['y'][0], 2.)
+        val, der = Expression.exp(x)(np.float32(1.))
+        assert np.isclose(val[0], np.e) and np.isclose(der['x'][0], np.e)
+        val, der = (Expression.sum(x) * y)({'x': np.ones(2), 'y': np.float32(2.)})
+        assert np.allclose(der['x'], [2., 2.]) and np.isclose(der['y'][0], 2.)
@@ -257,4 +257,96 @@ class TestDual:
     def test_dual_vector_add_vector(self):
         d1 = DualVector(real=[0, 1], dual=[0, 2], vec=None)
         d2 = DualVector(real=[0, 1], dual=[0, 2], vec=None)
-        assert d1 + d2 == DualVector(vec=[x1 + x2 for x1, x2 in zip(d1, d2)])
\ No newline at end of file
+        assert d1 + d2 == DualVector(vec=[x1 + x2 for x1, x2 in zip(d1, d2)])
+
+    def test_dual_vector_getitem(self):
+        x = DualVector(real=[0, 1, 2], dual=[0, 2, 4], vec=None)
+        assert x[1] == Dual(1, 2)
+        assert x[1:] == DualVector(real=[1, 2], dual=[2, 4], vec=None)
+
+    def test_dual_vector_mul_array(self):
+        x = DualVector(real=[1, 2], dual=[1, 1], vec=None)
+        assert x * np.array([2, 3]) == DualVector(real=[2, 6], dual=[2, 3], vec=None)
+        assert Dual(1, 1) * np.array([2, 3]) == DualVector(real=[2, 3], dual=[2, 3], vec=None)
+        with pytest.raises(TypeError):
+            x * "string"
+
+    def test_dual_vector_sequence(self):
+        x = DualVector(vec=[Dual(1, 1), Dual(2, 0)])
+        assert x + [1., 2.] == DualVector(real=[2, 4], dual=[1, 0], vec=None)
+        assert [1., 2.] - x == DualVector(real=[0, 0], dual=[-1, 0], vec=None)
+        assert x * (Dual(1, 1), 2) == DualVector(real=[1, 4], dual=[2, 0], vec=None)
+
+    def test_dual_pow_zero(self):
+        x = DualVector(real=[0., 1.], dual=[1., 1.], vec=None)
+        assert x ** 2 == DualVector(real=[0, 1], dual=[0, 2], vec=None)
+        assert Dual(2, 1) ** Dual(2, 1) == Dual(4, 4 + 4 * np.log(2))
+
+    def test_dual_numpy_scalar(self):
+        x = Dual(2., 1.)
+        for c in (np.float64(3), np.float32(3), np.int64(3)):
+            assert x + c == Dual(5, 1)
+            assert c - x == Dual(1, -1)
+            assert x * c == Dual(6, 3)
+            assert c / x == Dual(1.5, -0.75)
+            assert x ** c == Dual(8, 12)
+            assert c ** x == Dual(9, 9 * np.log(3))
+        assert np.float64(3) * x == Dual(6, 3)
+        with pytest.raises(TypeError):
+            x + "string"
+
+    def test_dual_slots(self):
+        with pytest.raises(AttributeError):
+            Dual(1, 1).other = 1
+        with pytest.raises(AttributeError):
+            DualVector(real=[1], dual=[1], vec=None).other = 1
+
+
+class TestDualNumpyProtocol:
+
+    def test_ufunc_unary(self):
+        x = DualVector(real=[0., 1.], dual=[1., 1.], vec=None)
+        assert np.exp(x) == DualVector(real=[1, np.e], dual=[1, np.e], vec=None)
+        assert np.sin(Dual(0, 2)) == Dual(0, 2)
+        assert np.sqrt(Dual(4, 1)) == Dual(2, 0.25)
+        assert -x == np.negative(x)
+
+    def test_ufunc_binary(self):
+        x = DualVector(real=[1., 2.], dual=[1., 1.], vec=None)
+        a = np.array([2., 4.])
+        assert np.add(a, x) == DualVector(real=[3, 6], dual=[1, 1], vec=None)
+        assert a - x == DualVector(real=[1, 2], dual=[-1, -1], vec=None)
+        assert a * x == DualVector(real=[2, 8], dual=[2, 4], vec=None)
+        assert a / x == DualVector(real=[2, 2], dual=[-2, -1], vec=None)
+        assert np.power(x, 2) == DualVector(real=[1, 4], dual=[2, 4], vec=None)
+        assert a @ x == Dual(10, 6)
+
+    def test_ufunc_object_array(self):
+        # NumPy evaluates the ufuncs of object arrays by calling the method of each element
+        x = np.array([Dual(1., 1.), Dual(2., 1.)], dtype=object)
+        res = np.sin(x)
+        assert res[0] == Dual(np.sin(1.), np.cos(1.)) and res[1] == Dual(np.sin(2.), np.cos(2.))
+        assert np.exp(x)[1] == Dual(np.exp(2.), np.exp(2.))
+        assert Dual(8., 1.).log_base(2) == Dual.log_base(Dual(8., 1.), 2)
+        assert DualVector(real=[1.], dual=[1.], vec=None) + x == DualVector(real=[2, 3], dual=[2, 2], vec=None)
+
+    def test_ufunc_not_supported(self):
+        with pytest.raises(TypeError):
+            np.floor(DualVector(real=[1.], dual=[1.], vec=None))
+
+    def test_array_function(self):
+        x = DualVector(real=[1., 2.], dual=[1., 0.], vec=None)
+        assert np.sum(x * x) == Dual(5, 2)
+        assert np.mean(x) == Dual(1.5, 0.5)
+        assert np.where(np.array([True, False]), x, 2 * x) == DualVector(real=[1, 4], dual=[1, 0], vec=None)
+        assert np.linalg.norm(DualVector(real=[3., 4.], dual=[1., 0.], vec=None)) == Dual(5, 0.6)
+        assert np.shape(x) == (2,)
+
+    def test_numpy_user_function(self):
+        def f(v):
+            return np.sum(np.tanh(v) * np.exp(-v ** 2))
+        x = np.linspace(-1, 1, 5)
+        res = f(DualVector(real=x, dual=np.ones(5), vec=None))
+        assert np.isclose(res.real, f(x))
+        dfdx = (1 - np.tanh(x) ** 2) * np.exp(-x ** 2) - 2 * x * np.tanh(x) * np.exp(-x ** 2)
+        assert np.isclose(res.dual, np.sum(dfdx))
@@ -0,0 +1,68 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+
+from auto_diff_CGLLY.dual import SparseDual, SparseSeed
+from auto_diff_CGLLY.dual import sparse
+import numpy as np
+import pytest
+
+class TestSparseDual:
+
+    def test_sparse_dual_variable(self):
+        assert SparseDual.variable(2., 3) == SparseDual(2., {3: 1.})
+        x = SparseDual.variable(np.array([1., 2.]), 1)
+        assert x.dtype == object and x.shape == (2,)
+        assert x[1] == SparseDual(2., {2: 1.})
+        # ndarray subclasses, e.g. np.memmap inputs, are arrays too
+        x = SparseDual.variable(np.array([1., 2.]).view(np.matrix))
+        assert x.dtype == object and x.shape == (1, 2)
+
+    def test_sparse_dual_merge(self):
+        x, y = SparseDual(2., {0: 1.}), SparseDual(3., {5: 1.})
+        assert x + y == SparseDual(5., {0: 1., 5: 1.})
+        assert x - y == SparseDual(-1., {0: 1., 5: -1.})
+        assert x * y == SparseDual(6., {0: 3., 5: 2.})
+        assert x / y == SparseDual(2 / 3, {0: 1 / 3, 5: -2 / 9})
+        assert x ** y == SparseDual(8., {0: 12., 5: 8 * np.log(2)})
+        assert (x * y - x * y).dual == {0: 0., 5: 0.}
+
+    def test_sparse_dual_const(self):
+        x = SparseDual(2., {0: 1.})
+        assert 1 + x == SparseDual(3., {0: 1.})
+        assert 1 - x == SparseDual(-1., {0: -1.})
+        assert np.float32(3) * x == SparseDual(6., {0: 3.})
+        assert 1 / x == SparseDual(0.5, {0: -0.25})
+        assert x ** 2 == SparseDual(4., {0: 4.})
+        assert 2 ** x == SparseDual(4., {0: 4 * np.log(2)})
+        assert -x == SparseDual(-2., {0: -1.})
+        with pytest.raises(TypeError):
+            x + "string"
+
+    def test_sparse_dual_numpy(self):
+        x = SparseDual.variable(np.array([0., 1.]))
+        assert np.exp(x[1]) == SparseDual(np.e, {1: np.e})
+        assert np.sin(x)[0] == SparseDual(0., {0: 1.})
+        assert np.sum(x * np.array([2., 3.])) == SparseDual(3., {0: 2., 1: 3.})
+
+    def test_sparse_seed_jacobian(self):
+        seed = SparseSeed({'x': 1., 'y': np.ones(2)})
+        assert seed == {'x': 0, 'y': 1} and seed.size == 3
+        res = np.array([SparseDual(0., {0: 1., 2: 2.}), SparseDual(0., {})], dtype=object)
+        jac = seed.jacobian(res)
+        assert isinstance(jac['x'], np.ndarray)
+        assert np.array_equal(jac['x'], [[1], [0]])
+        assert np.array_equal(jac['y'], [[0, 2], [0, 0]])
+
+    def test_sparse_seed_jacobian_csr(self):
+        sp = pytest.importorskip('scipy.sparse')
+        seed = SparseSeed({'x': np.ones(2)})
+        jac = seed.jacobian(SparseDual(0., {1: 3.}), sparse=True)
+        assert sp.isspmatrix_csr(jac['x']) and np.array_equal(jac['x'].toarray(), [[0, 3]])
+
+    def test_sparse_seed_jacobian_without_scipy(self, monkeypatch):
+        monkeypatch.setattr(sparse, '_sp', None)
+        seed = SparseSeed({'x': np.ones(2)})
+        assert np.array_equal(seed.jacobian(SparseDual(0., {1: 3.}))['x'], [[0, 3]])
+        with pytest.raises(ImportError):
+            seed.jacobian(SparseDual(0., {1: 3.}), sparse=True)
@@ -0,0 +1,80 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, Compose, ParameterVector, JacobianBlocks, \
+    jacobian_blocks, scan, custom_primitive
+from auto_diff_CGLLY.expression import blocks
+
+def system(mode):
+    x, y = Variable.vars(['x', 'y'], mode)
+    return Compose([Expression.sin(x) * y, Expression.sum(x * x) + y])
+
+X = np.array([0.1, 0.2, 0.3, 0.4, 0.5])
+EXPECTED = np.zeros((6, 6))
+EXPECTED[:5, :5] = np.diag(2 * np.cos(X))
+EXPECTED[:5, 5] = np.sin(X)
+EXPECTED[5, :5] = 2 * X
+EXPECTED[5, 5] = 1
+
+class TestJacobianBlocks:
+
+    @pytest.mark.parametrize('mode', ['f', 'r'])
+    def test_blocks(self, mode):
+        blocks = jacobian_blocks(system(mode), {'x': X, 'y': 2.}, block_size=4)
+        assert blocks.shape == (6, 6) and blocks.axis == (1 if mode == 'f' else 0)
+        parts = list(blocks)
+        assert [index for index, block in parts] == [slice(0, 4), slice(4, 6)]
+        jac = np.concatenate([block for index, block in parts], axis=blocks.axis)
+        assert np.allclose(jac, EXPECTED)
+
+    @pytest.mark.parametrize('mode', ['f', 'r'])
+    def test_write(self, mode, tmp_path):
+        blocks = JacobianBlocks(system(mode), {'x': X, 'y': 2.}, block_size=3)
+        assert np.allclose(blocks.write(), EXPECTED)
+        out = np.zeros((6, 6))
+        assert blocks.write(out) is out and np.allclose(out, EXPECTED)
+        jac = blocks.write(tmp_path / 'jac.npy')
+        assert isinstance(jac, np.memmap) and np.allclose(np.load(tmp_path / 'jac.npy'), EXPECTED)
+
+    @pytest.mark.parametrize('mode', ['f', 'r'])
+    def test_sparse(self, mode):
+        pytest.importorskip('scipy')
+        jac = JacobianBlocks(system(mode), {'x': X, 'y': 2.}, block_size=2).write(sparse=True)
+        assert jac.nnz == 16 and np.allclose(jac.toarray(), EXPECTED)
+
+    def test_sparse_without_scipy(self, monkeypatch):
+        monkeypatch.setattr(blocks, '_sparse', None)
+        with pytest.raises(ImportError):
+            JacobianBlocks(system('r'), {'x': X, 'y': 2.}).write(sparse=True)
+
+    @pytest.mark.parametrize('mode', ['f', 'r'])
+    def test_nodes_with_joint_vjp(self, mode):
+        # solve, scan and custom primitives compute the adjoints of their operands together in reverse mode
+        L = np.array([[2., 1.], [0., 3.]])
+        linear = custom_primitive('linear', lambda x: L @ x, jvp=lambda t, y, x: L @ t[0],
+                                  vjp=lambda g, y, x: (L.T @ g,))
+        cases = [(lambda x: Expression.solve(L, x), np.linalg.inv(L)),
+                 (lambda x: scan(lambda c: Expression.matmul(L, c), x, 3), L @ L @ L),
+                 (lambda x: linear(x), L)]
+        for build, expected in cases:
+            jac = JacobianBlocks(build(Variable('x', mode)), {'x': np.array([1., -2.])}, block_size=1).write()
+            assert np.allclose(jac, expected)
+
+    def test_scalar_and_parameter_vector(self):
+        pv = ParameterVector('p', {'a': 1, 'w': 2})
+        f = pv['a'] * Expression.sum(pv['w'] ** 2)
+        jac = JacobianBlocks(f, {'p': np.array([2., 1., 3.])}).write()
+        assert np.allclose(jac, [[10., 4., 12.]])
+
+    def test_reset_adjoint(self):
+        x = Variable('x', mode='r')
+        f = Expression.exp(x) * x
+        y = f.propagate({'x': np.array([1., 2.])})
+        g1 = f.backward(adjoint=np.array([1., 0.]))['x'].copy()
+        f.reset_adjoint()
+        g2 = f.backward(adjoint=np.array([0., 1.]))['x']
+        f.clear()
+        assert np.allclose(g1, [2 * np.e, 0]) and np.allclose(g2, [0, 3 * np.exp(2)])
@@ -0,0 +1,70 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, evaluate_chunked
+
+def model(mode='r'):
+    a, b, t = Variable.vars(['a', 'b', 't'], mode)
+    return a * Expression.sin(b * t)
+
+class TestMemmapInputs:
+
+    def test_variable_memmap(self, tmp_path):
+        path = tmp_path / 't.npy'
+        np.save(path, np.linspace(0, 1, 5))
+        t = np.load(path, mmap_mode='r')
+        x = Variable('x', mode='r')
+        y, grad = (x * x)({'x': t})
+        assert np.allclose(y, t ** 2) and np.allclose(grad['x'], 2 * t)
+        assert np.allclose(x.value({'x': str(path)}), t)
+
+    def test_forward_path(self, tmp_path):
+        path = tmp_path / 't.npy'
+        np.save(path, np.linspace(0, 1, 5))
+        x = Variable('x')
+        y, dy = Expression.exp(x)({'x': path})
+        assert np.allclose(y, np.exp(np.linspace(0, 1, 5)))
+        assert np.allclose(dy['x'], np.diag(np.exp(np.linspace(0, 1, 5))))
+
+class TestEvaluateChunked:
+
+    T = np.linspace(0, 3, 1001)
+
+    def test_value(self):
+        res = evaluate_chunked(model('f'), {'a': 2., 'b': 3., 't': self.T}, chunk_size=100)
+        assert np.allclose(res, 2 * np.sin(3 * self.T))
+
+    def test_gradients(self):
+        value, grad = evaluate_chunked(model(), {'a': 2., 'b': 3., 't': self.T}, chunk_size=128, grad=True)
+        assert np.allclose(value, 2 * np.sin(3 * self.T))
+        assert np.allclose(grad['t'], 6 * np.cos(3 * self.T))
+        assert np.isclose(grad['a'], np.sum(np.sin(3 * self.T)))
+        assert np.isclose(grad['b'], np.sum(2 * self.T * np.cos(3 * self.T)))
+
+    def test_memmap_files(self, tmp_path):
+        np.save(tmp_path / 't.npy', self.T)
+        value, grad = evaluate_chunked(model(), {'a': 2., 'b': 3., 't': str(tmp_path / 't.npy')}, chunk_size=100,
+                                       out=tmp_path / 'y.npy', grad=True, grad_out={'t': tmp_path / 'dt.npy'})
+        assert isinstance(value, np.memmap) and isinstance(grad['t'], np.memmap)
+        assert np.allclose(np.load(tmp_path / 'y.npy'), 2 * np.sin(3 * self.T))
+        assert np.allclose(np.load(tmp_path / 'dt.npy'), 6 * np.cos(3 * self.T))
+
+    def test_rows(self):
+        w, x = Variable.vars(['w', 'x'], 'r')
+        X = np.arange(12.).reshape(6, 2)
+        value, grad = evaluate_chunked(Expression.exp(x) * w, {'w': np.array([1., 2.]), 'x': X}, chunk_size=4,
+                                       data=['x'], out=np.zeros((6, 2)), grad=True)
+        assert np.allclose(value, np.exp(X) * [1, 2])
+        assert np.allclose(grad['x'], np.exp(X) * [1, 2]) and np.allclose(grad['w'], np.exp(X).sum(axis=0))
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            evaluate_chunked(model('f'), {'a': 2., 'b': 3., 't': self.T}, grad=True)
+        x = Variable('x', mode='r')
+        with pytest.raises(ValueError):
+            evaluate_chunked(Expression.sum(x), {'x': self.T}, chunk_size=10)
+        with pytest.raises(ValueError):
+            evaluate_chunked(x, {'x': self.T}, out=np.zeros(3))
@@ -0,0 +1,104 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.dual import Dual, DualVector
+from auto_diff_CGLLY.expression import Expression, Variable, CustomPrimitive, custom_primitive
+
+X = np.array([-1.5, 0., 0.7, 2.])
+
+def softplus_grad(x):
+    return 1 / (1 + np.exp(-x))
+
+softplus_jvp = custom_primitive('softplus', lambda x: np.log1p(np.exp(x)),
+                                jvp=lambda t, y, x: t[0] * (1 - np.exp(-y)), elementwise=True)
+softplus_vjp = custom_primitive('softplus', lambda x: np.log1p(np.exp(x)),
+                                vjp=lambda g, y, x: (g * (1 - np.exp(-y)),), elementwise=True)
+# weighted inner product <w * x, y>, not elementwise, with a constant weight in the middle
+wdot = custom_primitive('wdot', lambda x, w, y: np.sum(w * x * y),
+                        jvp=lambda t, r, x, w, y: np.sum(w * (t[0] * y + x * t[2])),
+                        vjp=lambda g, r, x, w, y: (g * w * y, None, g * w * x))
+
+class TestCustomPrimitive:
+
+    @pytest.mark.parametrize('op', [softplus_jvp, softplus_vjp])
+    def test_reverse(self, op):
+        x = Variable('x', 'r')
+        y, grad = Expression.sum(op(x) * 2) ({'x': X})
+        assert np.isclose(y, 2 * np.sum(np.log1p(np.exp(X))))
+        assert np.allclose(grad['x'], 2 * softplus_grad(X))
+
+    @pytest.mark.parametrize('op', [softplus_jvp, softplus_vjp])
+    def test_forward(self, op):
+        x = Variable('x')
+        res = op(x * 3).forward({'x': X}, {'x': np.ones(4)})
+        assert np.allclose(res.real, np.log1p(np.exp(3 * X)))
+        assert np.allclose(res.dual, 3 * softplus_grad(3 * X))
+
+    def test_dual(self):
+        assert softplus_jvp(Dual(0., 2.)) == Dual(np.log(2), 1.)
+        assert softplus_vjp(Dual(0., 2.)) == Dual(np.log(2), 1.)
+        res = softplus_jvp(DualVector(X, np.ones(4)))
+        assert isinstance(res, DualVector) and np.allclose(res.dual, softplus_grad(X))
+        assert np.isclose(softplus_jvp(0.), np.log(2))
+
+    def test_single_node(self):
+        x = Variable('x', 'r')
+        f = softplus_vjp(x)
+        assert f.e1 is x and f.e2 is None and f.is_elementwise()
+        assert not wdot(x, 2., x).is_elementwise()
+
+    def test_two_operands_and_constant(self):
+        w = np.array([1., 2., 3., 4.])
+        y0 = np.array([0.5, -1., 2., 1.])
+        x, y = Variable.vars(['x', 'y'], 'r')
+        val, grad = wdot(x, w, y) ({'x': X, 'y': y0})
+        assert np.isclose(val, np.sum(w * X * y0))
+        assert np.allclose(grad['x'], w * y0) and np.allclose(grad['y'], w * X)
+
+        x, y = Variable.vars(['x', 'y'])
+        res = wdot(x, w, y).forward({'x': X, 'y': y0}, {'x': np.ones(4), 'y': np.zeros(4)})
+        assert np.isclose(res.real, np.sum(w * X * y0)) and np.isclose(res.dual, np.sum(w * y0))
+
+    def test_vjp_once_per_adjoint(self):
+        calls = []
+
+        def vjp(g, r, x, y):
+            calls.append(1)
+            return g * y, g * x
+        mul = custom_primitive('mul', lambda x, y: x * y, vjp=vjp, elementwise=True)
+        x, y = Variable.vars(['x', 'y'], 'r')
+        val, grad = Expression.sum(mul(x, y)) ({'x': X, 'y': X + 1})
+        assert np.allclose(grad['x'], X + 1) and np.allclose(grad['y'], X)
+        assert len(calls) == 1
+
+    def test_reverse_reused_adjoint(self):
+        # a linear primitive, whose adjoint is sent on unchanged by the output node
+        L = np.array([[2., 1.], [0., 3.]])
+        linear = custom_primitive('linear', lambda x: L @ x, jvp=lambda t, y, x: L @ t[0],
+                                  vjp=lambda g, y, x: (L.T @ g,))
+        x = Variable('x', 'r')
+        f = linear(x)
+        f.propagate({'x': np.array([1., -2.])})
+        adjoint = np.array([1., 0.])
+        assert np.allclose(f.backward(adjoint=adjoint)['x'], L[0])
+        f.reset_adjoint()
+        adjoint[:] = [0., 1.]
+        assert np.allclose(f.backward(adjoint=adjoint)['x'], L[1])
+        f.clear()
+        y, grad = Expression.sum(softplus_vjp(x)) ({'x': X})
+        assert np.allclose(grad['x'], softplus_grad(X))
+        y, grad = Expression.sum(softplus_vjp(x)) ({'x': -X})
+        assert np.allclose(grad['x'], softplus_grad(-X))
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            custom_primitive('f', np.sin)
+        with pytest.raises(ValueError):
+            CustomPrimitive('f', np.sum, vjp=lambda g, y, x: (g * np.ones_like(x),))
+        x, y, z = Variable.vars(['x', 'y', 'z'], 'r')
+        with pytest.raises(ValueError):
+            custom_primitive('f', lambda a, b, c: a + b + c, jvp=lambda t, r, a, b, c: t[0] + t[1] + t[2],
+                             elementwise=True)(x, y, z)
@@ -78,3 +78,28 @@ class TestFunctionUnit:
         assert np.isclose(f_deriv['y'], -3.957432986493527)
 
 
+
+    def test_function_value(self):
+        x, y = Variable('x', mode='r'), Variable('y', mode='r')
+        f = Expression.sin(x * 4) + Expression.cos(y * 4)
+
+        assert np.isclose(f.value({'x': 1, 'y': 2}), -0.9023025291165417)
+        assert f.val is None
+        assert f.node.args == ()
+        assert x.node.n_child == 0
+
+    def test_function_value_array(self):
+        x = Variable('x')
+        f = x * x + x
+        assert np.allclose(f.value({'x': [1, 2]}), [2, 6])
+        assert np.isclose(f.value(2), 6)
+
+    def test_function_lazy_partials(self):
+        x = Variable('x', mode='r')
+        f = Expression.exp(x) * 2
+        f.propagate({'x': 0})
+        assert f.node.partial_val is None
+        assert f.e1.node.partial_val is None
+
+        assert f.backward() == {'x': 2}
+        assert f.e1.node.partial_val == [1]
@@ -1,7 +1,7 @@
 import sys
 sys.path.append('src/')
 sys.path.append('../../src')
-from auto_diff_CGLLY.dual import Dual
+from auto_diff_CGLLY.dual import Dual, DualVector
 from auto_diff_CGLLY.expression import ops
 
 import numpy as np
@@ -122,3 +122,28 @@ class TestOps:
         assert Dual.sqrt(x2) == Dual(2, 0.25)
         assert ops._sqrt(1.0) == 1
         assert ops._sqrt(1) == 1
+
+    def test_ops_sum(self):
+        assert ops._sum(np.array([1, 2])) == 3
+        assert ops._sum(DualVector([1, 2], [1, 0])) == Dual(3, 1)
+        assert ops._sum_vjp(2, np.zeros((2, 2)), axis=None).tolist() == [[2, 2], [2, 2]]
+
+    def test_ops_mean(self):
+        assert ops._mean(np.array([1, 2])) == 1.5
+        assert ops._mean(DualVector([1, 2], [1, 0])) == Dual(1.5, 0.5)
+
+    def test_ops_matmul(self):
+        a, b = np.array([[1., 2.], [3., 4.]]), np.array([1., 1.])
+        assert ops._matmul(a, b).tolist() == [3, 7]
+        assert ops._matmul(DualVector([1, 2], [1, 0]), b) == Dual(3, 1)
+        ga, gb = ops._matmul_vjp(np.array([1., 1.]), a, b)
+        assert ga.tolist() == [[1, 1], [1, 1]]
+        assert gb.tolist() == [4, 6]
+
+    def test_ops_norm(self):
+        assert ops._norm(np.array([3., 4.])) == 5
+        assert ops._norm(DualVector([3, 4], [1, 0])) == Dual(5, 0.6)
+        assert ops._norm_vjp(1, np.array([3., 4.]), 5).tolist() == [0.6, 0.8]
+        # zero subgradient at the origin instead of nan
+        assert ops._norm_vjp(1, np.zeros(2), 0).tolist() == [0., 0.]
+        assert ops._norm(DualVector([0., 0.], [1., 0.])) == Dual(0., 0.)
@@ -0,0 +1,72 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import pytest
+import numpy as np
+
+from auto_diff_CGLLY.dual import Dual
+from auto_diff_CGLLY.expression import Expression, Variable, ParameterVector
+
+class TestParameterVector:
+
+    def test_parameter_vector_init(self):
+        pv = ParameterVector('theta', {'w': 3, 'b': (), 'M': (2, 2)})
+        assert len(pv) == 8
+        assert pv.data.shape == (8,)
+        assert pv.grad.shape == (8,)
+        assert pv.slices['w'] == (slice(0, 3), (3,))
+        assert pv.slices['b'] == (3, ())
+
+    def test_parameter_vector_init_list(self):
+        pv = ParameterVector('theta', ['a', 'b'])
+        assert len(pv) == 2
+        with pytest.raises(Exception):
+            ParameterVector('theta', 1)
+
+    def test_parameter_vector_set_get(self):
+        pv = ParameterVector('theta', {'w': 2, 'M': (2, 2)})
+        pv.set({'w': [1, 2], 'M': [[3, 4], [5, 6]]})
+        assert np.array_equal(pv.data, [1, 2, 3, 4, 5, 6])
+        assert np.array_equal(pv.get('M'), [[3, 4], [5, 6]])
+        pv.set(np.zeros(6))
+        assert np.array_equal(pv.get('w'), [0, 0])
+
+    def test_parameter_vector_eq(self):
+        assert ParameterVector('theta', ['a']) == ParameterVector('theta', ['a'])
+        assert ParameterVector('theta', ['a']) != ParameterVector('theta', ['b'])
+        assert ParameterVector('theta', ['a']) != Variable('theta')
+
+    def test_parameter_vector_reverse(self):
+        pv = ParameterVector('theta', {'w': 3, 'b': ()})
+        pv.set({'w': [1, 2, 3], 'b': 0.5})
+        grad = pv.grad
+        f = pv['w'] * pv['b'] + pv['b'] * pv['b']
+
+        y, dy = f({})
+        assert np.allclose(y, [0.75, 1.25, 1.75])
+        assert dy['theta'] is grad
+        assert np.allclose(grad, [0.5, 0.5, 0.5, 7])
+
+        y, dy = f({'theta': np.array([1., 1, 1, 1])})
+        assert dy['theta'] is grad
+        assert np.allclose(grad, [1, 1, 1, 5])
+
+    def test_parameter_vector_reverse_with_variable(self):
+        pv = ParameterVector('theta', {'w': (2, 2)})
+        x = Variable('x', mode='r')
+        f = Expression.sin(pv['w'] * x)
+        y, dy = f({'theta': np.arange(4.), 'x': 2})
+
+        assert np.allclose(dy['theta'], 2 * np.cos(2 * np.arange(4.)))
+
+    def test_parameter_vector_forward(self):
+        pv = ParameterVector('theta', ['a', 'b'], mode='f')
+        f = pv['a'] * pv['b']
+        assert f.forward({'theta': np.array([2., 3.])}, {'theta': np.array([1., 0.])}) == Dual(6, 3)
+
+    def test_parameter_vector_value(self):
+        pv = ParameterVector('theta', ['a', 'b'])
+        pv.set([2., 3.])
+        assert (pv['a'] * pv['b']).value({}) == 6
+        with pytest.raises(Exception):
+            pv.value({'theta': np.zeros(3)})
@@ -0,0 +1,97 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.dual import Dual, DualVector, SparseDual
+from auto_diff_CGLLY.expression import Expression, Variable
+
+X = np.array([-2., 0., 0.5, 3.])
+Y = np.array([1., 0., 0.5, -1.])
+M = np.array([True, False, True, False])
+
+def evaluate(build, mode, inputs):
+    """Value and gradient, from the reverse mode, from the sparse forward mode or from the forward mode with a
+    unit seed of a"""
+    a, b, m = Variable.vars(['a', 'b', 'm'], 'f' if mode == 's' else mode)
+    f = build(a, b, m)
+    inputs = {k: v for k, v in inputs.items() if k in f.varname}
+    if mode == 'r':
+        return f(inputs)
+    if mode == 's':
+        pytest.importorskip('scipy')
+        y, jac = f(inputs, sparse=True)
+        jac = jac['a'].toarray()
+        return y, np.diag(jac)
+    return f.value(inputs), f.forward(inputs, {k: np.ones_like(v) * (k == 'a') for k, v in inputs.items()}).dual
+
+class TestPiecewise:
+
+    @pytest.mark.parametrize('mode', ['f', 'r', 's'])
+    @pytest.mark.parametrize('build, value, grad', [
+        (lambda a, b, m: abs(a), np.abs(X), [-1., 0., 1., 1.]),
+        (lambda a, b, m: Expression.relu(a), np.maximum(X, 0), [0., 0., 1., 1.]),
+        (lambda a, b, m: Expression.maximum(a, b), np.maximum(X, Y), [0., 0.5, 0.5, 1.]),
+        (lambda a, b, m: Expression.minimum(0.5, a), np.minimum(X, 0.5), [1., 1., 0.5, 0.]),
+        (lambda a, b, m: Expression.clip(a, -1, 0.5), np.clip(X, -1, 0.5), [0., 1., 1., 0.]),
+        (lambda a, b, m: Expression.clip(a, a_max=0.), np.minimum(X, 0.), [1., 1., 0., 0.]),
+        (lambda a, b, m: Expression.where(M, 2 * a, b), np.where(M, 2 * X, Y), [2., 0., 2., 0.]),
+        (lambda a, b, m: Expression.where(M, a, 7.), np.where(M, X, 7.), [1., 0., 1., 0.]),
+        (lambda a, b, m: Expression.where(m, a ** 2, b), np.where(M, X ** 2, Y), [-4., 0., 1., 0.]),
+        (lambda a, b, m: Expression.where(m, 1., a), np.where(M, 1., X), [0., 1., 0., 1.]),
+    ])
+    def test_value_and_derivative(self, mode, build, value, grad):
+        y, res = evaluate(build, mode, {'a': X, 'b': Y, 'm': M})
+        assert np.allclose(y, value)
+        assert np.allclose(res['a'] if mode == 'r' else res, grad)
+
+    def test_where_reverse_both_branches(self):
+        a, b = Variable.vars(['a', 'b'], 'r')
+        y, grad = Expression.sum(Expression.where(M, a * b, b)) ({'a': X, 'b': Y})
+        assert np.isclose(y, np.sum(np.where(M, X * Y, Y)))
+        assert np.allclose(grad['a'], np.where(M, Y, 0))
+        assert np.allclose(grad['b'], np.where(M, X, 1))
+
+    def test_where_masks_unselected_branch(self):
+        x = Variable('x', 'r')
+        # the log branch is nan for x < 0, which must not leak into the value and the derivative
+        with np.errstate(invalid='ignore'):
+            y, grad = Expression.sum(Expression.where(X > 0, Expression.log(x), x)) ({'x': X + 1e-3 * (X == 0)})
+        assert np.isclose(y, -2. + 1e-3 + np.log(0.5) + np.log(3.))
+        assert np.allclose(grad['x'], [1., 1., 2., 1 / 3])
+
+    def test_where_scalar_condition(self):
+        x = Variable('x', 'r')
+        y, grad = Expression.where(False, x * 2, x * 3) ({'x': 2.})
+        assert y == 6. and grad['x'] == 3.
+
+    def test_maximum_broadcast(self):
+        x, c = Variable.vars(['x', 'c'], 'r')
+        y, grad = Expression.sum(Expression.maximum(x, c)) ({'x': X, 'c': 0.})
+        assert np.isclose(y, np.maximum(X, 0).sum())
+        assert np.allclose(grad['x'], [0., 0.5, 1., 1.])
+        assert np.isclose(grad['c'], 1.5)
+
+    def test_dual(self):
+        assert abs(Dual(-2., 1.)) == Dual(2., -1.)
+        assert Dual.relu(Dual(0., 1.)) == Dual(0., 0.)
+        assert np.maximum(Dual(1., 1.), 1.) == Dual(1., 0.5)
+        assert np.minimum(Dual(1., 1.), Dual(2., 3.)) == Dual(1., 1.)
+        res = np.clip(DualVector(X, np.ones(4)), -1, 0.5)
+        assert np.allclose(res.real, [-1., 0., 0.5, 0.5]) and np.allclose(res.dual, [0., 1., 1., 0.])
+
+    def test_sparse_dual(self):
+        x, y = SparseDual.variable(-2., 0), SparseDual.variable(3., 1)
+        assert abs(x).real == 2. and abs(x).dual == {0: -1.}
+        assert x < y and y >= 1. and not x > 0.
+
+    def test_elementwise(self):
+        a, b, m = Variable.vars(['a', 'b', 'm'], 'r')
+        assert Expression.where(m, Expression.relu(a), Expression.clip(b, 0, 1)).is_elementwise()
+
+    def test_not_expression(self):
+        with pytest.raises(AssertionError):
+            Expression.relu(1.)
+        with pytest.raises(AssertionError):
+            Expression.where(M, 1., 2.)
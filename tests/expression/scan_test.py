@@ -0,0 +1,102 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, scan
+
+def step(c, q):
+    return c * q + Expression.sin(c) * 0.05
+
+def reference(x, p, n):
+    for _ in range(n):
+        x = x * p + np.sin(x) * 0.05
+    return x
+
+def central(fun, x, eps=1e-6):
+    return np.array([(fun(x + eps * e) - fun(x - eps * e)) / (2 * eps) for e in np.eye(len(x))])
+
+class TestScan:
+
+    X = np.array([0.3, 1.0])
+    P = np.array([0.9, 0.95])
+
+    def test_value(self):
+        x0, p = Variable.vars(['x0', 'p'], 'r')
+        f = scan(step, x0, 30, p)
+        assert np.allclose(f.value({'x0': self.X, 'p': self.P}), reference(self.X, self.P, 30))
+
+    @pytest.mark.parametrize('checkpoint', [None, 1, 7, 30, 64])
+    def test_reverse(self, checkpoint):
+        x0, p = Variable.vars(['x0', 'p'], 'r')
+        f = Expression.sum(scan(step, x0, 30, p, checkpoint=checkpoint))
+        y, grad = f({'x0': self.X, 'p': self.P})
+        assert np.isclose(y, reference(self.X, self.P, 30).sum())
+        assert np.allclose(grad['x0'], central(lambda x: reference(x, self.P, 30).sum(), self.X))
+        assert np.allclose(grad['p'], central(lambda p: reference(self.X, p, 30).sum(), self.P))
+
+    def test_reverse_reevaluated(self):
+        # the same adjoint object after a new evaluation, or mutated in place, gives the new vector-Jacobian product
+        x0, p = Variable.vars(['x0', 'p'], 'r')
+        f = scan(step, x0, 30, p)
+        g = np.array([1., 0.])
+        for x in (self.X, 2 * self.X):
+            f.propagate({'x0': x, 'p': self.P})
+            f.value({'x0': -x, 'p': self.P})
+            grad = f.backward(adjoint=g)
+            assert np.allclose(grad['x0'], central(lambda v: reference(v, self.P, 30)[0], x))
+            assert np.allclose(grad['p'], central(lambda q: reference(x, q, 30)[0], self.P))
+            f.reset_adjoint()
+            g[:] = [0., 1.]
+            grad = f.backward(adjoint=g)
+            assert np.allclose(grad['x0'], central(lambda v: reference(v, self.P, 30)[1], x))
+            f.clear()
+            g[:] = [1., 0.]
+
+    def test_forward(self):
+        x0, p = Variable.vars(['x0', 'p'])
+        f = scan(step, x0, 30, p)
+        res = f.forward({'x0': self.X, 'p': self.P}, {'x0': np.zeros(2), 'p': np.ones(2)})
+        f.clear()
+        assert np.allclose(res.real, reference(self.X, self.P, 30))
+        assert np.allclose(res.dual, np.diag(central(lambda p: reference(self.X, p, 30), self.P)))
+
+    def test_trajectory(self):
+        x0, p = Variable.vars(['x0', 'p'], 'r')
+        traj = scan(step, x0, 10, p, trajectory=True)
+        expected = np.stack([reference(self.X, self.P, n) for n in range(11)])
+        assert np.allclose(traj.value({'x0': self.X, 'p': self.P}), expected)
+
+        weights = np.arange(22.).reshape(11, 2)
+        total = lambda x, p: np.sum(weights * np.stack([reference(x, p, n) for n in range(11)]))
+        y, grad = Expression.sum(traj * weights)({'x0': self.X, 'p': self.P})
+        assert np.isclose(y, total(self.X, self.P))
+        assert np.allclose(grad['x0'], central(lambda x: total(x, self.P), self.X))
+        assert np.allclose(grad['p'], central(lambda p: total(self.X, p), self.P))
+
+        x0, p = Variable.vars(['x0', 'p'])
+        res = scan(step, x0, 10, p, trajectory=True).forward({'x0': self.X, 'p': self.P},
+                                                             {'x0': np.ones(2), 'p': np.zeros(2)})
+        assert res.real.shape == (11, 2) and np.allclose(res.real, expected)
+
+    def test_scalar_long_loop(self):
+        x = Variable('x', mode='r')
+        f = scan(lambda c: c - 1e-4 * c, x, 10 ** 4)
+        y, grad = f({'x': 2.})
+        assert np.isclose(y, 2 * (1 - 1e-4) ** 1e4) and np.isclose(grad['x'], (1 - 1e-4) ** 1e4)
+
+    def test_step_errors(self):
+        x, a = Variable.vars(['x', 'a'], 'r')
+        with pytest.raises(ValueError):
+            scan(lambda c: c * a, x, 3)
+        with pytest.raises(TypeError):
+            scan(lambda c: 1., x, 3)
+
+    def test_clear_shared_subexpressions(self):
+        x, k = Variable.vars(['x', 'k'], 'r')
+        h = x
+        for _ in range(200):
+            h = h - 1e-3 * k * h
+        y, grad = h({'x': 1., 'k': 1.})
+        assert np.isclose(y, (1 - 1e-3) ** 200) and h.val is None and x.val is None
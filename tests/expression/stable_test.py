@@ -0,0 +1,120 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.dual import Dual
+from auto_diff_CGLLY.expression import Expression, Variable
+
+X = np.array([[0.3, -1.2, 2.0], [1.5, 0.1, -0.4]])
+W = np.array([[1., -2., 0.5], [0.3, 1., -1.]])
+
+def reference_logsumexp(x, axis=None):
+    m = np.max(x, axis=axis, keepdims=True)
+    return np.squeeze(m + np.log(np.sum(np.exp(x - m), axis=axis, keepdims=True)), axis=axis)
+
+def reference_softmax(x, axis=-1):
+    ex = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return ex / np.sum(ex, axis=axis, keepdims=True)
+
+# builder of the expression and reference function of a scalar loss
+CASES = [
+    (lambda x: Expression.sum(Expression.log1p(x * x)), lambda x: np.sum(np.log1p(x * x))),
+    (lambda x: Expression.sum(Expression.expm1(x) * W), lambda x: np.sum(np.expm1(x) * W)),
+    (lambda x: Expression.sum(Expression.softplus(x) * W), lambda x: np.sum(np.log1p(np.exp(x)) * W)),
+    (lambda x: Expression.sum(Expression.log_sigmoid(x) * W), lambda x: np.sum(-np.log1p(np.exp(-x)) * W)),
+    (lambda x: Expression.logsumexp(x), lambda x: reference_logsumexp(x)),
+    (lambda x: Expression.sum(Expression.logsumexp(x, axis=0) * np.array([1., 2., 3.])),
+     lambda x: np.sum(reference_logsumexp(x, axis=0) * np.array([1., 2., 3.]))),
+    (lambda x: Expression.sum(Expression.softmax(x) * W), lambda x: np.sum(reference_softmax(x) * W)),
+    (lambda x: Expression.sum(Expression.softmax(x, axis=0) * W), lambda x: np.sum(reference_softmax(x, 0) * W)),
+    (lambda x: Expression.sum(Expression.softmax(x, axis=None) * W),
+     lambda x: np.sum(reference_softmax(x, None) * W)),
+]
+
+def central(fun, x, eps=1e-6):
+    grad = np.zeros_like(x)
+    for i in range(x.size):
+        e = np.zeros_like(x)
+        e.flat[i] = eps
+        grad.flat[i] = (fun(x + e) - fun(x - e)) / (2 * eps)
+    return grad
+
+class TestStable:
+
+    @pytest.mark.parametrize('build, reference', CASES)
+    def test_reverse(self, build, reference):
+        y, grad = build(Variable('x', 'r'))({'x': X})
+        assert np.isclose(y, reference(X))
+        assert np.allclose(grad['x'], central(reference, X), atol=1e-6)
+
+    @pytest.mark.parametrize('build, reference', CASES)
+    def test_forward(self, build, reference):
+        f = build(Variable('x'))
+        seed = np.array([[1., 0., -1.], [0.5, 2., 0.]])
+        res = f.forward({'x': X}, {'x': seed})
+        assert np.isclose(res.real, reference(X))
+        assert np.isclose(res.dual, np.sum(central(reference, X) * seed), atol=1e-6)
+
+    @pytest.mark.parametrize('build, reference', CASES)
+    def test_sparse(self, build, reference):
+        pytest.importorskip('scipy')
+        y, jac = build(Variable('x'))({'x': X}, sparse=True)
+        jac = jac['x'].toarray()
+        assert np.isclose(y[0], reference(X))
+        assert np.allclose(np.reshape(jac, X.shape), central(reference, X), atol=1e-6)
+
+    def test_value_between_passes(self):
+        # the derivatives belong to the input of the last propagate, not to the last value
+        x = Variable('x', 'r')
+        x0, x1 = np.zeros(2), np.array([-50., 0.])
+        for build, grad in [(Expression.softplus, [0.5, 0.5]), (Expression.log_sigmoid, [0.5, 0.5]),
+                            (Expression.logsumexp, [0.5, 0.5]),
+                            (lambda e: Expression.softmax(e) * np.array([1., 0.]), [0.25, -0.25])]:
+            f = Expression.sum(build(x))
+            f.propagate({'x': x0})
+            f.value({'x': x1})
+            assert np.allclose(f.backward()['x'], grad)
+            f.clear()
+
+    def test_no_overflow(self):
+        big = np.array([1000., -1000., 0.])
+        x = Variable('x', 'r')
+        y, grad = Expression.sum(Expression.softplus(x))({'x': big})
+        assert np.isclose(y, 1000 + np.log(2)) and np.allclose(grad['x'], [1., 0., 0.5])
+        y, grad = Expression.sum(Expression.log_sigmoid(x))({'x': big})
+        assert np.isclose(y, -1000 - np.log(2)) and np.allclose(grad['x'], [0., 1., 0.5])
+        y, grad = Expression.logsumexp(x)({'x': big})
+        assert np.isclose(y, 1000) and np.allclose(grad['x'], [1., 0., 0.])
+        y, grad = Expression.sum(Expression.softmax(x) * np.array([1., 2., 3.]))({'x': big})
+        assert np.isclose(y, 1.) and np.allclose(grad['x'], 0.)
+
+    def test_small_inputs(self):
+        x = Variable('x', 'r')
+        y, grad = Expression.log1p(x)({'x': 1e-12})
+        assert y == pytest.approx(1e-12, rel=1e-10) and grad['x'] == pytest.approx(1.)
+        y, grad = Expression.expm1(x)({'x': 1e-12})
+        assert y == pytest.approx(1e-12, rel=1e-10) and grad['x'] == pytest.approx(1.)
+
+    def test_scalar(self):
+        x = Variable('x', 'r')
+        y, grad = Expression.softplus(x)({'x': 0.})
+        assert np.isclose(y, np.log(2)) and np.isclose(grad['x'], 0.5)
+        y, grad = Expression.softmax(x)({'x': 3.})
+        assert y == 1. and grad['x'] == 0.
+        y, grad = Expression.logsumexp(x)({'x': 3.})
+        assert y == 3. and grad['x'] == 1.
+
+    def test_dual(self):
+        assert np.log1p(Dual(1., 2.)) == Dual(np.log(2), 1.)
+        assert np.expm1(Dual(0., 2.)) == Dual(0., 2.)
+
+    def test_single_node(self):
+        x = Variable('x', 'r')
+        for f in (Expression.softplus(x), Expression.log_sigmoid(x), Expression.logsumexp(x), Expression.softmax(x)):
+            assert f.e1 is x and f.e2 is None
+        assert Expression.softplus(x).is_elementwise() and not Expression.softmax(x).is_elementwise()
+        # the Cache of a node is the parameter marked by its primitive, other nodes have none
+        f = Expression.logsumexp(x, 0)
+        assert f.node.cache is f.params[-1] and (x * 2).node.cache is None
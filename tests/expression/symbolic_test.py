@@ -0,0 +1,154 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, ParameterVector, custom_primitive, diff, gradient_graph
+
+X = np.array([0.3, -1.2, 2.0])
+Y = np.array([1.5, 2.0, -0.7])
+A = np.array([[1., 2., 0.], [0.5, -1., 3.]])
+B = np.array([[0.2, 1.], [-1., 0.5], [0.3, 0.3]])
+
+# expressions of x and y covering every derivative rule
+CASES = [
+    lambda x, y: Expression.sum(x + y - 2 * x * y + x / y - 3 / y + 1 - x - (-y)),
+    lambda x, y: Expression.sum(Expression.abs(x) ** y + 2 ** x + (x * x + 1) ** 1.5 + x / 2),
+    lambda x, y: Expression.sum(Expression.sin(x) * Expression.cos(y) + Expression.tan(x * 0.3)),
+    lambda x, y: Expression.sum(Expression.arcsin(x * 0.2) + Expression.arccos(y * 0.2) + Expression.arctan(x)),
+    lambda x, y: Expression.sum(Expression.sinh(x) + Expression.cosh(y) + Expression.tanh(x * y)),
+    lambda x, y: Expression.sum(Expression.sigmoid(x) + Expression.exp(y) + Expression.log(y * y) +
+                                Expression.log_base(x * x + 1, 2) + Expression.sqrt(x * x + 1)),
+    lambda x, y: Expression.sum(Expression.log1p(x * x) + Expression.expm1(y) + Expression.softplus(x) +
+                                Expression.log_sigmoid(y)),
+    lambda x, y: Expression.sum(Expression.abs(x - y) + Expression.relu(x) + Expression.maximum(x, y) +
+                                Expression.minimum(x, 0.5) + Expression.clip(y, -1, 1)),
+    lambda x, y: Expression.sum(Expression.where(X > 0, x * y, y) + Expression.where(X > 0, x, 1.) +
+                                Expression.where(X > 0, 1., y * y)),
+    lambda x, y: Expression.mean(x * y) * Expression.sum(x) + Expression.norm(x - y) + Expression.mean(x),
+    lambda x, y: Expression.logsumexp(A @ x) + Expression.sum(Expression.softmax(x * y) * Y),
+    lambda x, y: Expression.sum((A @ x) * (y @ B)) + (x @ y) + Expression.sum(Expression.matmul(A @ x, x @ B)),
+    lambda x, y: Expression.sum(x * Expression.sum(y) + Expression.sum(x) * y),
+    lambda x, y: Expression.trace(Expression.sin(x @ y) * (A @ B)) + Expression.trace((x * A) @ B),
+]
+
+def numeric_grad(build, inputs, name, eps=1e-6):
+    x, y = Variable.vars(['x', 'y'], 'r')
+    f = build(x, y)
+    grad = np.zeros_like(inputs[name])
+    for i in range(grad.size):
+        plus, minus = dict(inputs), dict(inputs)
+        plus[name] = inputs[name] + eps * np.eye(grad.size)[i]
+        minus[name] = inputs[name] - eps * np.eye(grad.size)[i]
+        grad[i] = (f.value(plus) - f.value(minus)) / (2 * eps)
+    return grad
+
+class TestSymbolic:
+
+    @pytest.mark.parametrize('build', CASES)
+    def test_gradient_graph(self, build):
+        x, y = Variable.vars(['x', 'y'], 'r')
+        f = build(x, y)
+        inputs = {'x': X, 'y': Y}
+        graphs = f.gradient_graph()
+        _, grad = f(inputs)
+        for name in ('x', 'y'):
+            assert isinstance(graphs[name], Expression)
+            assert np.allclose(graphs[name].value(inputs), grad[name])
+            assert np.allclose(graphs[name].value(inputs), numeric_grad(build, inputs, name), atol=1e-5)
+
+    @pytest.mark.parametrize('build', CASES)
+    def test_second_order(self, build):
+        # the Hessian-vector product, by the forward mode on the derivative graph and by differences of it
+        x, y = Variable.vars(['x', 'y'])
+        g = build(x, y).diff('x')
+        v = np.array([0.5, -1., 0.25])
+        res = g.forward({'x': X, 'y': Y}, {'x': v, 'y': np.zeros(3)})
+        eps = 1e-6
+        fd = (g.value({'x': X + eps * v, 'y': Y}) - g.value({'x': X - eps * v, 'y': Y})) / (2 * eps)
+        assert np.allclose(np.broadcast_to(res.dual, np.shape(fd)), fd, atol=1e-5)
+
+    def test_higher_order(self):
+        x = Variable('x', 'r')
+        f = Expression.sin(x) * Expression.exp(x)
+        d1, d2, d3 = f.diff('x'), f.diff('x').diff('x'), f.diff('x').diff('x').diff('x')
+        assert np.allclose(d1.value({'x': X}), np.exp(X) * (np.sin(X) + np.cos(X)))
+        assert np.allclose(d2.value({'x': X}), 2 * np.exp(X) * np.cos(X))
+        assert np.allclose(d3.value({'x': X}), 2 * np.exp(X) * (np.cos(X) - np.sin(X)))
+        # the derivative graph is also differentiated by the reverse mode
+        _, grad = Expression.sum(d2)({'x': X})
+        assert np.allclose(grad['x'], d3.value({'x': X}))
+
+    def test_hessian_matmul(self):
+        c = B @ np.ones(2)
+        hessian = 2 * A.T @ A + 2 * np.outer(c, X) + 2 * np.outer(X, c) + 2 * (X @ c) * np.eye(3)
+        x = Variable('x', 'r')
+        f = Expression.sum((A @ x) ** 2) + (x @ c) * (x @ x)
+        # the derivative of the gradient is the sum of the rows of the Hessian
+        assert np.allclose(f.diff('x').diff('x').value({'x': X}), hessian.sum(axis=0))
+        x = Variable('x')
+        g = (Expression.sum((A @ x) ** 2) + (x @ c) * (x @ x)).diff('x')
+        for e in np.eye(3):
+            assert np.allclose(g.forward({'x': X}, {'x': e}).dual, hessian @ e)
+            g.clear()
+
+    def test_broadcast(self):
+        x, s = Variable.vars(['x', 's'], 'r')
+        f = Expression.sum(x * s + s)
+        graphs = f.gradient_graph()
+        inputs = {'x': X, 's': 2.}
+        assert np.allclose(graphs['x'].value(inputs), [2., 2., 2.])
+        assert np.isclose(graphs['s'].value(inputs), X.sum() + 3)
+
+    def test_shared_nodes(self):
+        x = Variable('x', 'r')
+        e = Expression.exp(x)
+        g = (e * e).diff('x')
+        assert np.allclose(g.value({'x': X}), 2 * np.exp(2 * X))
+
+    def test_variable_and_zero(self):
+        x, m = Variable.vars(['x', 'm'], 'r')
+        assert np.allclose(x.diff('x').value({'x': X}), 1.)
+        g = Expression.where(m, x, 0.).gradient_graph()
+        assert np.allclose(g['m'].value({'x': X, 'm': X > 0}), 0.)
+        assert np.allclose(diff(x * 2, 'x').value({'x': X}), 2.)
+        assert set(gradient_graph(x * x + m)) == {'x', 'm'}
+
+    def test_parameter_vector(self):
+        p = ParameterVector('p', {'a': 1, 'w': 2}, mode='r')
+        f = p['a'] * Expression.sum(p['w'] ** 2)
+        inputs = {'p': np.array([2., 1., 3.])}
+        g = f.diff('p')
+        assert np.allclose(g.value(inputs), [10., 4., 12.])
+        # the sum of the rows of the Hessian, the derivative of the take being a scatter into the vector
+        assert np.allclose(g.diff('p').value(inputs), [8., 6., 10.])
+        _, grad = Expression.sum(g)(inputs)
+        assert np.allclose(grad['p'], [8., 6., 10.])
+
+    def test_piecewise_second_order(self):
+        x = Variable('x', 'r')
+        g = Expression.sum(Expression.abs(x) * x).diff('x').diff('x')
+        assert np.allclose(g.value({'x': X}), 2 * np.sign(X))
+
+    def test_norm_at_zero(self):
+        x = Variable('x', 'r')
+        g = Expression.norm(x).diff('x')
+        with np.errstate(invalid='ignore'):
+            assert g.value({'x': np.zeros(3)}).tolist() == [0., 0., 0.]
+        assert np.allclose(g.value({'x': X}), X / np.linalg.norm(X))
+
+    def test_errors(self):
+        x, y = Variable.vars(['x', 'y'], 'r')
+        with pytest.raises(ValueError):
+            (x * 2).diff('y')
+        for unsupported in (Expression.inv(x), Expression.logdet(x), Expression.cholesky(x), Expression.solve(x, y)):
+            with pytest.raises(NotImplementedError):
+                Expression.sum(unsupported).diff('x')
+        op = custom_primitive('double', lambda a: 2 * a, jvp=lambda t, r, a: 2 * t[0], elementwise=True)
+        with pytest.raises(NotImplementedError):
+            op(x).diff('x')
+        # a custom primitive does not take the rule of the builtin primitive of the same name
+        op = custom_primitive('mul', lambda a, b: a * b, jvp=lambda t, r, a, b: t[0] * b + a * t[1], elementwise=True)
+        with pytest.raises(NotImplementedError):
+            op(x, y).diff('x')
@@ -0,0 +1,67 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, grad, value_and_grad, jacobian
+
+class TestTransform:
+
+    def test_grad(self):
+        f = grad(lambda x, y: Expression.sum(Expression.sin(x) * y) + Expression.sum(x * x), argnums=(0, 1))
+        x, y = np.array([1., 2.]), np.array([3., 4.])
+        gx, gy = f(x, y)
+        assert np.allclose(gx, np.cos(x) * y + 2 * x)
+        assert np.allclose(gy, np.sin(x))
+
+    def test_grad_scalar(self):
+        f = grad(lambda x, y: x * x + 3 * x)
+        assert np.isclose(f(2., 5.), 7)
+        assert f(2., 5.).shape == ()
+
+    def test_grad_unused_argument(self):
+        f = grad(lambda x, y: x * 2., argnums=1)
+        assert f(2., np.ones(2)).tolist() == [0, 0]
+
+    def test_grad_not_scalar(self):
+        f = grad(lambda x: x * 2)
+        with pytest.raises(ValueError):
+            f(np.ones(2))
+        assert f(3.) == 2
+
+    def test_value_and_grad(self):
+        f = value_and_grad(lambda x: Expression.exp(x) * 2)
+        val, dval = f(0.)
+        assert val == 2 and dval == 2
+
+    def test_trace_cache(self):
+        calls = []
+        def fn(x):
+            calls.append(1)
+            return Expression.sum(x * x)
+        f = grad(fn)
+        assert np.allclose(f(np.array([1., 2.])), [2, 4])
+        assert np.allclose(f(np.array([3., 4.])), [6, 8])
+        assert len(calls) == 1
+        f(np.array([1., 2., 3.]))
+        f(np.array([1., 2.], dtype=np.float32))
+        assert len(calls) == 3 and len(f.cache) == 3
+        assert f.__name__ == 'fn'
+
+    def test_trace_not_expression(self):
+        with pytest.raises(TypeError):
+            grad(lambda x: 1.)(2.)
+
+    def test_jacobian_elementwise(self):
+        x = np.array([1., 2.])
+        jac = jacobian(lambda a: Expression.exp(a) * 2)(x)
+        assert np.allclose(jac, np.diag(2 * np.exp(x)))
+
+    def test_jacobian(self):
+        M, x = np.array([[1., 2.], [3., 4.], [5., 6.]]), np.array([1., 2.])
+        jac_a, jac_m = jacobian(lambda a, m: Expression.matmul(m, a), argnums=(0, 1))(x, M)
+        assert np.allclose(jac_a, M)
+        assert jac_m.shape == (3, 3, 2)
+        assert np.allclose(jac_m[1, 1], x) and np.allclose(jac_m[0, 1], 0)
+        assert np.allclose(jacobian(lambda a, b: a * b, argnums=1)(x, 2.), x)
@@ -62,3 +62,11 @@ class TestVariable:
         v1 = Variable('a')
         with pytest.raises(Exception):
             v1.forward("", None)
+
+    def test_variable_value(self):
+        v1 = Variable('a')
+        assert v1.value({'a': 1}) == 1
+        assert v1.value(2) == 2
+        assert v1.val is None
+        with pytest.raises(Exception):
+            v1.value({'a': ""})
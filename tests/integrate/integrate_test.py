@@ -0,0 +1,98 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, Compose
+from auto_diff_CGLLY.integrate import ODE, solve_ivp
+
+def lotka_volterra():
+    x, z, a, b, c, d = Variable.vars(['x', 'z', 'a', 'b', 'c', 'd'])
+    return Compose([a * x - b * x * z, -c * z + d * x * z])
+
+class TestIntegrate:
+
+    P = {'a': 1.5, 'b': 1., 'c': 3., 'd': 1.}
+
+    @pytest.mark.parametrize('method', ['rk4', 'rk45'])
+    def test_decay(self, method):
+        y, k = Variable.vars(['y', 'k'])
+        res = solve_ivp(-k * y, {'y': 2.}, (0, 3), {'k': 0.7}, method=method, n_steps=200, rtol=1e-9, atol=1e-12)
+        assert res.success and res.t[-1] == pytest.approx(3)
+        assert np.allclose(res.y[:, 0], 2 * np.exp(-0.7 * res.t), rtol=1e-6)
+        assert np.allclose(res.sens[:, 0, 0], -2 * res.t * np.exp(-0.7 * res.t), rtol=1e-6, atol=1e-9)
+
+    def test_time_dependent(self):
+        y, t = Variable.vars(['y', 't'])
+        res = solve_ivp(Expression.cos(t) + 0 * y, {'y': 0.}, (0, 2), method='rk4', n_steps=50,
+                        trajectory=False)
+        assert res.t == pytest.approx(2) and np.isclose(res.y[0], np.sin(2), rtol=1e-6)
+        assert res.sens.shape == (1, 0)
+
+    def test_sensitivities_finite_differences(self):
+        res = solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), self.P, method='rk4', n_steps=40)
+        assert ODE(lotka_volterra(), {'x': 1., 'z': 1.}, self.P).batched
+        eps, fd = 1e-6, []
+        for k in self.P:
+            plus, minus = dict(self.P), dict(self.P)
+            plus[k] += eps
+            minus[k] -= eps
+            fd.append((solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), plus, method='rk4', n_steps=40,
+                                 trajectory=False).y -
+                       solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), minus, method='rk4', n_steps=40,
+                                 trajectory=False).y) / (2 * eps))
+        assert np.allclose(res.sens[-1], np.array(fd).T, rtol=1e-6)
+
+    def test_adaptive_matches_fixed(self):
+        fixed = solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), self.P, method='rk4', n_steps=400,
+                          trajectory=False)
+        adaptive = solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), self.P, rtol=1e-10, atol=1e-12,
+                             trajectory=False)
+        assert adaptive.nstep < 400
+        assert np.allclose(adaptive.y, fixed.y, rtol=1e-7) and np.allclose(adaptive.sens, fixed.sens, rtol=1e-6)
+
+    def test_final_state_only(self):
+        full = solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), self.P, method='rk4', n_steps=100)
+        last = solve_ivp(lotka_volterra(), {'x': 1., 'z': 1.}, (0, 2), self.P, method='rk4', n_steps=100,
+                         trajectory=False)
+        assert full.y.shape == (101, 2) and full.sens.shape == (101, 2, 4)
+        assert last.y.shape == (2,) and last.sens.shape == (2, 4)
+        assert np.allclose(last.y, full.y[-1]) and np.allclose(last.sens, full.sens[-1])
+
+    def test_not_elementwise(self):
+        linalg = pytest.importorskip('scipy.linalg')
+        M = np.array([[1., 0.5], [0.2, 2.]])
+        y, k = Variable.vars(['y', 'k'])
+        rhs = -k * Expression.matmul(M, y)
+        assert not ODE(rhs, {'y': np.ones(2)}, {'k': 0.5}).batched
+        res = solve_ivp(rhs, {'y': np.ones(2)}, (0, 1), {'k': 0.5}, rtol=1e-10, atol=1e-12, trajectory=False)
+        expm = linalg.expm(-0.5 * M)
+        assert np.allclose(res.y, expm @ np.ones(2), rtol=1e-8)
+        assert np.allclose(res.sens[:, 0], -M @ expm @ np.ones(2), rtol=1e-6)
+
+    def test_vector_parameter(self):
+        y, w = Variable.vars(['y', 'w'])
+        res = solve_ivp(-w * y, {'y': np.ones(3)}, (0, 1), {'w': np.array([0.5, 1., 2.])}, method='rk4',
+                        trajectory=False)
+        assert np.allclose(res.y, np.exp(-np.array([0.5, 1., 2.])), rtol=1e-8)
+        assert np.allclose(res.sens, np.diag(-np.exp(-np.array([0.5, 1., 2.]))), rtol=1e-7)
+
+    def test_errors(self):
+        y = Variable('y')
+        with pytest.raises(ValueError):
+            solve_ivp(-y, {'y': 1.}, (0, 1), method='euler')
+        res = solve_ivp(-y, {'y': 1.}, (0, 1), h0=1e-3, max_steps=3)
+        assert not res.success
+
+    @pytest.mark.parametrize('y0', [np.array([1., 2.]), np.array([1., 2., -0.5]), np.array([[1., 2.], [0., 3.]])])
+    def test_vector_state_scalar_parameters(self, y0):
+        y, a, b, t = Variable.vars(['y', 'a', 'b', 't'])
+        rhs = -a * y + b * Expression.cos(0 * t)
+        assert ODE(rhs, {'y': y0}, {'a': 0.8, 'b': 1.5}).batched
+        res = solve_ivp(rhs, {'y': y0}, (0, 1), {'a': 0.8, 'b': 1.5}, method='rk4', trajectory=False)
+        decay = np.exp(-0.8)
+        assert np.allclose(res.y, 1.5 / 0.8 + (y0.ravel() - 1.5 / 0.8) * decay, rtol=1e-8)
+        da = -1.5 / 0.8 ** 2 * (1 - decay) - (y0.ravel() - 1.5 / 0.8) * decay
+        db = np.full(y0.size, (1 - decay) / 0.8)
+        assert np.allclose(res.sens, np.stack([da, db], axis=1), rtol=1e-7)
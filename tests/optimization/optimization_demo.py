@@ -23,3 +23,10 @@ for i in range(iter_count):
     position += diff
 print("The minimum for f = x^2 is", position)
  
+
+''' The same minimization with the optimize module, which reuses the graph and preallocated buffers'''
+
+from auto_diff_CGLLY.optimize import GradientDescent
+
+result = GradientDescent(lr=learning_rate, tol=tol, max_iter=iter_count).minimize(f, float(initial_guess))
+print("The minimum for f = x^2 is", result.x, f"({result.it_per_sec:.0f} iterations per second)")
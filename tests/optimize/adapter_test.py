@@ -0,0 +1,57 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable
+from auto_diff_CGLLY.optimize import ScipyAdapter
+
+optimize = pytest.importorskip('scipy.optimize')
+
+def rosenbrock():
+    x, y = Variable.vars(['x', 'y'], 'r')
+    return (1 - x) ** 2 + 100 * (y - x * x) ** 2
+
+class TestScipyAdapter:
+
+    def test_shared_sweep(self):
+        adapter = ScipyAdapter(rosenbrock(), {'x': -1.2, 'y': 1.})
+        x = np.array([-1.2, 1.])
+        assert np.isclose(adapter.fun(x), 24.2)
+        assert np.allclose(adapter.jac(x), [-215.6, -88.])
+        assert adapter.nsweep == 1
+        f, g = adapter.fun_and_jac(x.copy())
+        assert np.isclose(f, 24.2) and adapter.nsweep == 1
+        adapter.jac(np.array([1., 1.]))
+        assert adapter.nsweep == 2
+
+    def test_jac_returns_copy(self):
+        adapter = ScipyAdapter(rosenbrock(), {'x': -1.2, 'y': 1.})
+        g = adapter.jac(np.array([-1.2, 1.]))
+        g[:] = 0
+        assert np.allclose(adapter.jac(np.array([-1.2, 1.])), [-215.6, -88.])
+
+    def test_hessp(self):
+        adapter = ScipyAdapter(rosenbrock(), {'x': -1.2, 'y': 1.})
+        x = np.array([-1.2, 1.])
+        hess = np.array([[1200 * x[0] ** 2 - 400 * x[1] + 2, -400 * x[0]], [-400 * x[0], 200]])
+        for p in (np.array([1., 0.]), np.array([0.3, -2.])):
+            assert np.allclose(adapter.hessp(x, p), hess @ p, rtol=1e-6)
+        assert np.allclose(adapter.hessp(x, np.zeros(2)), 0)
+
+    @pytest.mark.parametrize('method', ['BFGS', 'L-BFGS-B', 'Newton-CG', 'trust-ncg'])
+    def test_minimize(self, method):
+        adapter = ScipyAdapter(rosenbrock(), {'x': -1.2, 'y': 1.})
+        kwargs = {'hessp': adapter.hessp} if method in ('Newton-CG', 'trust-ncg') else {}
+        res = optimize.minimize(adapter.fun, adapter.x0, jac=adapter.jac, method=method, **kwargs)
+        x = adapter.unpack(res.x)
+        assert np.isclose(x['x'], 1, atol=1e-3) and np.isclose(x['y'], 1, atol=1e-3)
+
+    def test_vector_variables(self):
+        x, w = Variable.vars(['x', 'w'], 'r')
+        f = (x - 3) ** 2 + Expression.sum((w - np.arange(3.)) ** 2)
+        adapter = ScipyAdapter(f, {'x': 0., 'w': np.zeros(3)})
+        res = optimize.minimize(adapter.fun_and_jac, adapter.x0, jac=True, method='BFGS')
+        sol = adapter.unpack(res.x)
+        assert np.isclose(sol['x'], 3) and np.allclose(sol['w'], [0, 1, 2])
@@ -0,0 +1,59 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, ParameterVector
+from auto_diff_CGLLY.optimize import LeastSquares, least_squares
+
+def exponential_decay():
+    a, b, c, t, y = Variable.vars(['a', 'b', 'c', 't', 'y'])
+    return a * Expression.exp(-b * t) + c - y
+
+class TestLeastSquares:
+
+    def test_jacobian_batched(self):
+        T = np.linspace(0, 5, 7)
+        problem = LeastSquares(exponential_decay(), {'a': 1., 'b': 1., 'c': 0.}, {'t': T, 'y': np.sin(T)})
+        assert problem.batched
+        res, jac = problem.value_and_jacobian(np.array([1., 2., 3.]))
+        assert np.allclose(res, np.exp(-2 * T) + 3 - np.sin(T))
+        assert np.allclose(jac, np.stack([np.exp(-2 * T), -T * np.exp(-2 * T), np.ones(7)], axis=1))
+
+        problem.batched = False
+        res_forward, jac_forward = problem.value_and_jacobian(np.array([1., 2., 3.]))
+        assert np.allclose(res, res_forward) and np.allclose(jac, jac_forward)
+        assert problem.njev == 2
+
+    def test_fit(self):
+        rng = np.random.default_rng(0)
+        T = np.linspace(0, 5, 10000)
+        Y = 2.5 * np.exp(-1.3 * T) + 0.5 + 0.01 * rng.standard_normal(T.size)
+        res = least_squares(exponential_decay(), {'a': 1., 'b': 1., 'c': 0.}, {'t': T, 'y': Y})
+        assert res.converged
+        assert np.allclose([res.x['a'], res.x['b'], res.x['c']], [2.5, 1.3, 0.5], atol=1e-2)
+        assert res.jac.shape == (10000, 3) and res.residual.shape == (10000,)
+        assert np.isclose(res.fun, 0.5 * res.residual @ res.residual)
+
+    def test_evaluation_counts(self):
+        # the residual is evaluated once per trial step, and the Jacobian of an accepted step reuses its graph
+        T, accepted = np.linspace(0, 5, 50), []
+        res = least_squares(exponential_decay(), {'a': 1., 'b': 1., 'c': 0.}, {'t': T, 'y': 2.5 * np.exp(-1.3 * T)},
+                            max_iter=30, xtol=0., callback=lambda x, cost, it: accepted.append(it) and False)
+        assert res.nfev == res.nit + 1
+        assert res.njev == len(accepted) + 1 <= res.nfev
+
+    def test_fit_not_elementwise(self):
+        pv = ParameterVector('p', {'w': 2}, mode='f')
+        X, Y = np.array([[1., 0.], [0., 1.], [1., 1.]]), np.array([1., 2., 3.])
+        problem = LeastSquares(Expression.matmul(X, pv) - Variable('y'), {'p': np.zeros(2)}, {'y': Y})
+        assert not problem.batched
+        res = least_squares(problem, {'p': np.zeros(2)})
+        assert np.allclose(res.x['p'], [1, 2])
+
+    def test_callback(self):
+        T, history = np.linspace(0, 5, 100), []
+        res = least_squares(exponential_decay(), {'a': 1., 'b': 1., 'c': 0.}, {'t': T, 'y': 2 * np.exp(-3 * T)},
+                            callback=lambda x, cost, it: history.append(cost) is None)
+        assert len(history) == 1 and res.message == 'stopped by callback'
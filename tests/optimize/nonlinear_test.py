@@ -0,0 +1,73 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, Compose
+from auto_diff_CGLLY.optimize import System, solve_nonlinear
+
+def circle_system():
+    x, y = Variable.vars(['x', 'y'])
+    return Compose([x * x + y * y - 4, Expression.exp(x) + y - 1])
+
+class TestSystem:
+
+    def test_system_jacobian_scalar(self):
+        system = System(circle_system(), {'x': 1., 'y': 1.})
+        x = system.pack({'x': 0., 'y': 2.})
+        assert np.allclose(system.residual(x), [0, 2])
+        assert np.allclose(system.jacobian(x), [[0, 4], [1, 1]])
+
+    def test_system_jacobian_vector(self):
+        v = Variable('v')
+        system = System(Compose([v * v * 2, Expression.sum(v * v)]), np.ones(3))
+        assert np.allclose(system.jacobian(np.array([1., 2., 3.])),
+                           [[4, 0, 0], [0, 8, 0], [0, 0, 12], [2, 4, 6]])
+        A = np.array([[1., 2.], [3., 4.]])
+        system = System(Compose([Expression.matmul(A, v) + v]), np.ones(2))
+        assert np.allclose(system.jacobian(np.ones(2)), A + np.eye(2))
+        assert system.njev == 1
+
+class TestSolveNonlinear:
+
+    @pytest.mark.parametrize('method', ['newton', 'broyden'])
+    def test_solve_scalar_variables(self, method):
+        res = solve_nonlinear(circle_system(), {'x': 1., 'y': 1.}, method=method)
+        assert res.converged
+        x, y = res.x['x'], res.x['y']
+        assert np.isclose(x * x + y * y, 4) and np.isclose(np.exp(x) + y, 1)
+        assert np.allclose(res.residual, 0, atol=1e-9)
+
+    @pytest.mark.parametrize('method', ['newton', 'broyden'])
+    def test_solve_vector(self, method):
+        v = Variable('v')
+        n = 20
+        A = np.random.default_rng(0).random((n, n)) / n + np.eye(n)
+        res = solve_nonlinear(Compose([Expression.matmul(A, v) + Expression.tanh(v) - 1]), np.zeros(n),
+                              method=method)
+        assert res.converged
+        assert np.allclose(A @ res.x + np.tanh(res.x), 1)
+
+    def test_broyden_fewer_jacobians(self):
+        newton = solve_nonlinear(circle_system(), {'x': 1., 'y': 1.})
+        broyden = solve_nonlinear(circle_system(), {'x': 1., 'y': 1.}, method='broyden')
+        assert broyden.njev < newton.njev == newton.nit
+
+    def test_line_search(self):
+        x = Variable('x')
+        system = Compose([Expression.arctan(x)])
+        assert not solve_nonlinear(system, 3., line_search=False, max_iter=10).converged
+        res = solve_nonlinear(system, 3.)
+        assert res.converged and abs(res.x) < 1e-10
+
+    def test_callback(self):
+        res = solve_nonlinear(circle_system(), {'x': 1., 'y': 1.}, callback=lambda x, r, it: it == 2)
+        assert res.nit == 2 and res.message == 'stopped by callback'
+
+    def test_not_square(self):
+        x, y = Variable.vars(['x', 'y'])
+        with pytest.raises(ValueError):
+            solve_nonlinear(Compose([x + y]), {'x': 1., 'y': 1.})
+        with pytest.raises(ValueError):
+            solve_nonlinear(circle_system(), {'x': 1., 'y': 1.}, method='secant')
@@ -0,0 +1,93 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable, ParameterVector
+from auto_diff_CGLLY.optimize import Objective, Optimizer, GradientDescent, Momentum, Adam, LBFGS, minimize
+
+def rosenbrock():
+    x, y = Variable.vars(['x', 'y'], 'r')
+    return (1 - x) ** 2 + 100 * (y - x * x) ** 2
+
+class TestObjective:
+
+    def test_objective_dict(self):
+        x, y = Variable.vars(['x', 'y'], 'r')
+        obj = Objective(Expression.sum(x * x) * y, {'x': np.ones(2), 'y': 2.})
+        flat = obj.pack({'x': [1., 2.], 'y': 3.})
+        assert flat.tolist() == [1, 2, 3]
+        fun, grad = obj(flat)
+        assert fun == 15 and grad.tolist() == [6, 12, 5]
+        assert obj.unpack(flat)['y'] == 3.
+        assert obj.nfev == 1
+
+    def test_objective_buffer(self):
+        x = Variable('x', 'r')
+        obj = Objective(Expression.sum(x * x), np.ones(2))
+        _, g1 = obj(np.ones(2))
+        _, g2 = obj(np.zeros(2))
+        assert g1 is g2 is obj.grad
+
+    def test_objective_not_scalar(self):
+        x = Variable('x', 'r')
+        with pytest.raises(ValueError):
+            Objective(x * 2, np.ones(2))(np.ones(2))
+
+class TestOptimizer:
+
+    @pytest.mark.parametrize('optimizer', [LBFGS(), Momentum(lr=1e-3, max_iter=20000),
+                                           Adam(lr=0.02, max_iter=20000)])
+    def test_rosenbrock(self, optimizer):
+        res = optimizer.minimize(rosenbrock(), {'x': -1.2, 'y': 1.})
+        assert res.converged
+        assert np.isclose(res.x['x'], 1, atol=1e-5) and np.isclose(res.x['y'], 1, atol=1e-5)
+        assert res.it_per_sec > 0
+
+    def test_gradient_descent(self):
+        x = Variable('x', 'r')
+        res = GradientDescent(lr=0.2).minimize(x ** 2, 10.)
+        assert res.converged and abs(res.x) < 1e-6
+        assert res.nfev == res.nit + 1
+
+    def test_python_function(self):
+        res = minimize(lambda v: Expression.sum((v - np.arange(5.)) ** 2), np.zeros(5))
+        assert np.allclose(res.x, np.arange(5.))
+
+    def test_parameter_vector(self):
+        pv = ParameterVector('p', {'w': 3, 'b': ()})
+        X = np.random.default_rng(0).random((50, 3))
+        t = X @ np.array([1., 2., 3.]) + 0.5
+        loss = Expression.mean((Expression.matmul(X, pv['w']) + pv['b'] - t) ** 2)
+        res = minimize(loss, np.zeros(4), gtol=1e-10)
+        assert np.allclose(res.x, [1, 2, 3, 0.5], atol=1e-6)
+
+    def test_tolerance_and_callback(self):
+        history = []
+        res = GradientDescent(lr=0.1, gtol=0, tol=1e-3).minimize(rosenbrock() * 0 + Variable('x', 'r') ** 2,
+                                                                 {'x': 1., 'y': 0.})
+        assert res.converged and res.message == 'update below tol'
+
+        res = minimize(rosenbrock(), {'x': -1.2, 'y': 1.},
+                       callback=lambda x, fun, grad, it: history.append(fun) or it == 3)
+        assert res.nit == 3 and len(history) == 3 and not res.converged
+
+    def test_line_search_failed(self):
+        # close to the kink of abs, every trial step overshoots and increases the objective
+        x = Variable('x', 'r')
+        res = LBFGS(max_ls=20).minimize(Expression.abs(x), 1e-12)
+        assert not res.converged and res.message == 'line search failed'
+        assert res.x == 1e-12 and res.fun == 1e-12 and res.nit == 1
+
+    def test_abstract_step(self):
+        class Incomplete(Optimizer):
+            pass
+        with pytest.raises(TypeError):
+            Incomplete()
+        with pytest.raises(TypeError):
+            Optimizer()
+
+    def test_unknown_method(self):
+        with pytest.raises(ValueError):
+            minimize(rosenbrock(), {'x': 0., 'y': 0.}, method='newton')
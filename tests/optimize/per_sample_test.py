@@ -0,0 +1,73 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable
+from auto_diff_CGLLY.optimize import per_sample_grad
+
+def logistic_loss():
+    w, b, x, y = Variable.vars(['w', 'b', 'x', 'y'], 'r')
+    z = Expression.sum(w * x, axis=-1) + b
+    return Expression.log(1 + Expression.exp(-y * z))
+
+class TestPerSampleGrad:
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((50, 3))
+    Y = np.sign(rng.standard_normal(50))
+    params = {'w': np.array([0.5, -1., 2.]), 'b': 0.3}
+
+    def expected(self):
+        z = self.X @ self.params['w'] + self.params['b']
+        s = -self.Y / (1 + np.exp(self.Y * z))
+        return np.log(1 + np.exp(-self.Y * z)), np.column_stack([s[:, None] * self.X, s])
+
+    @pytest.mark.parametrize('chunk_size', [7, 50, 1000])
+    def test_logistic(self, chunk_size):
+        losses, grads = per_sample_grad(logistic_loss(), self.params, {'x': self.X, 'y': self.Y}, chunk_size)
+        loss, grad = self.expected()
+        assert grads.shape == (50, 4)
+        assert np.allclose(losses, loss) and np.allclose(grads, grad)
+
+    def test_matches_single_samples(self):
+        f = logistic_loss()
+        losses, grads = per_sample_grad(f, self.params, {'x': self.X, 'y': self.Y})
+        for i in (0, 17):
+            y, grad = f({**self.params, 'x': self.X[i], 'y': float(self.Y[i])})
+            assert np.isclose(y, losses[i])
+            assert np.allclose(np.append(grad['w'], grad['b']), grads[i])
+
+    def test_multi_feature(self):
+        # scalar and vector parameters against samples of shape (3,) and (2, 3)
+        mu, s, w, x = Variable.vars(['mu', 's', 'w', 'x'], 'r')
+        f = Expression.sum((x - mu) ** 2 * s, axis=-1)
+        losses, grads = per_sample_grad(f, {'mu': 0.5, 's': 2.}, {'x': self.X}, chunk_size=16)
+        d = self.X - 0.5
+        assert np.allclose(losses, 2 * np.sum(d ** 2, axis=-1))
+        assert np.allclose(grads, np.column_stack([-4 * np.sum(d, axis=-1), np.sum(d ** 2, axis=-1)]))
+
+        X = self.X.reshape(25, 2, 3)
+        W = np.array([0.5, -1., 2.])
+        f = Expression.sum(Expression.sum(w * x, axis=-1) ** 2, axis=-1)
+        losses, grads = per_sample_grad(f, {'w': W}, {'x': X})
+        z = X @ W
+        assert np.allclose(losses, np.sum(z ** 2, axis=-1))
+        assert np.allclose(grads, np.einsum('ij,ijk->ik', 2 * z, X))
+
+    def test_out(self, tmp_path):
+        grads = per_sample_grad(logistic_loss(), self.params, {'x': self.X, 'y': self.Y}, chunk_size=16,
+                                out=tmp_path / 'grads.npy')[1]
+        assert isinstance(grads, np.memmap)
+        assert np.allclose(np.load(tmp_path / 'grads.npy'), self.expected()[1])
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            w, x = Variable.vars(['w', 'x'])
+            per_sample_grad(w * x, {'w': 1.}, {'x': self.Y})
+        w, x = Variable.vars(['w', 'x'], 'r')
+        with pytest.raises(ValueError):
+            per_sample_grad(Expression.sum(w * x), {'w': 1.}, {'x': self.Y})
+        with pytest.raises(ValueError):
+            per_sample_grad(w * x, {'w': 1.}, {'x': self.Y, 'y': self.X[:3]})
@@ -0,0 +1,63 @@
+import sys
+sys.path.append('src/')
+sys.path.append('../../src')
+import numpy as np
+import pytest
+
+from auto_diff_CGLLY.expression import Expression, Variable
+from auto_diff_CGLLY.optimize import StreamingObjective, accumulate, prefetch, minimize
+
+def squared_error():
+    a, b, t, y = Variable.vars(['a', 'b', 't', 'y'], 'r')
+    return (a * t + b - y) ** 2
+
+def chunks(T, Y, size):
+    for start in range(0, T.size, size):
+        yield {'t': T[start:start + size], 'y': Y[start:start + size]}
+
+class TestStream:
+
+    T = np.linspace(0, 1, 1000)
+    Y = 3 * T - 1
+
+    def test_prefetch(self):
+        assert list(prefetch(iter(range(10)), size=2)) == list(range(10))
+        it = prefetch(iter(range(100)))
+        assert next(it) == 0
+        it.close()
+
+    def test_prefetch_error(self):
+        def failing():
+            yield 1
+            raise RuntimeError('broken chunk')
+        with pytest.raises(RuntimeError, match='broken chunk'):
+            list(prefetch(failing()))
+
+    @pytest.mark.parametrize('use_prefetch', [False, True])
+    def test_accumulate(self, use_prefetch):
+        value, grad = accumulate(squared_error(), {'a': 1., 'b': 0.}, chunks(self.T, self.Y, 64), use_prefetch)
+        r = self.T - self.Y
+        assert np.isclose(value, r @ r)
+        assert np.isclose(grad['a'], 2 * r @ self.T) and np.isclose(grad['b'], 2 * r.sum())
+
+    def test_vector_parameters(self):
+        w, x = Variable.vars(['w', 'x'], 'r')
+        f = Expression.sum(w * x)
+        X = np.arange(12.).reshape(4, 3)
+        value, grad = accumulate(f, {'w': np.ones(3)}, ({'x': row} for row in X))
+        assert np.isclose(value, X.sum())
+        assert np.allclose(grad['w'], X.sum(axis=0))
+
+    def test_reiterable(self):
+        objective = StreamingObjective(squared_error(), {'a': 0., 'b': 0.}, lambda: chunks(self.T, self.Y, 100),
+                                       prefetch=True)
+        res = minimize(objective, {'a': 0., 'b': 0.}, method='lbfgs')
+        assert res.converged
+        assert np.isclose(res.x['a'], 3) and np.isclose(res.x['b'], -1)
+        assert objective.nchunk == 10 * objective.nfev
+
+    def test_errors(self):
+        with pytest.raises(TypeError):
+            StreamingObjective(lambda x: x, {'a': 0.}, [])
+        with pytest.raises(TypeError):
+            StreamingObjective(squared_error(), 0., [])
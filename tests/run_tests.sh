@@ -7,12 +7,30 @@ set -e
 # list of test cases you want to run
 tests=(
     # test_other_things_on_root_level.py
+    dtype_test.py
     dual/dual_test.py
+    dual/sparse_test.py
     expression/expression_test.py
     expression/variable_test.py
     expression/function_test.py
     expression/ops_test.py
     expression/compose_test.py
+    expression/parameter_vector_test.py
+    expression/transform_test.py
+    expression/chunked_test.py
+    expression/blocks_test.py
+    expression/scan_test.py
+    expression/piecewise_test.py
+    expression/custom_test.py
+    expression/stable_test.py
+    expression/symbolic_test.py
+    optimize/optimize_test.py
+    optimize/nonlinear_test.py
+    optimize/least_squares_test.py
+    optimize/adapter_test.py
+    optimize/stream_test.py
+    optimize/per_sample_test.py
+    integrate/integrate_test.py
 )
 
 # Must add the module source path because we use `import cs107_package` in